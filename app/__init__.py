@@ -3,28 +3,49 @@ from flask_cors import CORS
 from flask_login import LoginManager
 from flask_mail import Mail
 from app.config import Config
-from database.conexion import db
+from database.conexion import db, opciones_engine
+from app.utils.cache import cache
+from app.utils.trabajos import trabajos
 
 mail = Mail()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    from app.utils import logs
+    logs.init_app(app)
     CORS(app)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **opciones_engine(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
     db.init_app(app)
     
     mail.init_app(app)
+    from app.utils.correo import correo
+    correo.init_app(app)
+    from app.utils.agrupacion_alertas import agrupador_alertas
+    agrupador_alertas.init_app(app)
+    cache.init_app(app)
+    trabajos.init_app(app)
+    from app.utils.recomendaciones import recomendaciones
+    recomendaciones.init_app(app)
+    from app.utils import respuestas_http
+    respuestas_http.init_app(app)
+    from app.utils import medicion_sql
+    medicion_sql.init_app(app)
+    from app.utils import metricas
+    metricas.init_app(app)
 
     from app import models
-    from app.models import Usuario
 
     login_manager = LoginManager(app)
     login_manager.login_view = 'web_login.login'
     login_manager.login_message = "Por favor, inicia sesión para acceder al panel."
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return Usuario.query.get(int(user_id))
+    # Sin consulta a la base en cada petición autenticada (ver app/utils/usuarios_sesion.py)
+    from app.utils.usuarios_sesion import usuarios_sesion
+    usuarios_sesion.init_app(app)
+    login_manager.user_loader(usuarios_sesion.cargar)
     
     from app.routes.auth import auth_bp
     from app.routes.vehiculos import vehiculos_bp
@@ -35,6 +56,8 @@ def create_app():
     from app.routes.admin_sesiones import admin_sesiones_bp
     from app.routes.conductor import conductor_bp
     from app.routes.admin_vehiculos import admin_vehiculos_bp
+    from app.routes.metricas import metricas_bp
+    from app.routes.telemetria import telemetria_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(vehiculos_bp)
@@ -45,7 +68,12 @@ def create_app():
     app.register_blueprint(admin_sesiones_bp)
     app.register_blueprint(conductor_bp)
     app.register_blueprint(admin_vehiculos_bp)
+    app.register_blueprint(metricas_bp)
+    app.register_blueprint(telemetria_bp)
     
+    from app.comandos import registrar_comandos
+    registrar_comandos(app)
+
     @app.route('/')
     def home():
         return {"message": "Servidor Flask funcionando correctamente"}
@@ -0,0 +1,72 @@
+# app/comandos.py
+"""
+Comandos de mantenimiento para `flask --app main <comando>`.
+Pensados para ejecutarse desde cron / Programador de tareas.
+
+Cada comando corre en su propio proceso: la caché de respuestas del servidor
+(app/utils/cache.py) vive en el proceso del servidor, así que se le pide por
+HTTP que la invalide (SERVIDOR_URL + CACHE_TOKEN). Sin token, o si el servidor
+no responde, se avisa: los datos en caché siguen sirviéndose hasta CACHE_TTL
+segundos o hasta reiniciar el servidor.
+"""
+import click
+from database.conexion import db
+
+
+def registrar_comandos(app):
+
+    def invalidar_cache_servidor(*temas):
+        import requests
+        token = app.config.get('CACHE_TOKEN')
+        aviso = (f"el servidor seguirá sirviendo {', '.join(temas)} en caché hasta "
+                 f"{app.config.get('CACHE_TTL')} s o hasta reiniciarlo")
+        if not token:
+            click.echo(f"Aviso: CACHE_TOKEN no está configurado; {aviso}.", err=True)
+            return False
+        try:
+            r = requests.post(f"{app.config['SERVIDOR_URL'].rstrip('/')}/api/admin/cache/invalidar",
+                              json={'temas': list(temas)}, headers={'Authorization': f'Bearer {token}'},
+                              timeout=10)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            click.echo(f"Aviso: no se pudo invalidar la caché del servidor ({e}); {aviso}.", err=True)
+            return False
+        click.echo(f"Caché del servidor invalidada: {', '.join(temas)}.")
+        return True
+
+    @app.cli.command('inicializar-base')
+    def inicializar_base_cmd():
+        """Crea las tablas que falten y aplica las migraciones pendientes."""
+        from database.migraciones import inicializar_base
+        inicializar_base()
+        click.echo("Base de datos inicializada.")
+
+    @app.cli.command('archivar-alertas')
+    @click.option('--meses', type=int, default=None,
+                  help='Antigüedad mínima en meses (por defecto ALERTAS_RETENCION_MESES).')
+    def archivar_alertas_cmd(meses):
+        """Exporta a Parquet las alertas antiguas y las elimina de la base."""
+        from database.particiones import archivar_alertas, asegurar_particiones
+        meses = meses if meses is not None else app.config['ALERTAS_RETENCION_MESES']
+        directorio = app.config['ARCHIVO_ALERTAS_DIR']
+        with db.engine.begin() as conn:
+            asegurar_particiones(conn)
+            archivados = archivar_alertas(conn, directorio, meses)
+        invalidar_cache_servidor('alertas')
+        click.echo(f"Meses archivados: {', '.join(f'{m:%Y-%m}' for m in archivados) or 'ninguno'}")
+
+    @app.cli.command('reconstruir-agregados')
+    def reconstruir_agregados_cmd():
+        """Recalcula las tablas de agregados del dashboard desde cero."""
+        from app.utils.agregados import reconstruir_agregados
+        dias = reconstruir_agregados()
+        invalidar_cache_servidor('alertas', 'sesiones')
+        click.echo(f"Agregados reconstruidos ({dias} filas de conducción diaria).")
+
+    @app.cli.command('reconstruir-resumenes')
+    def reconstruir_resumenes_cmd():
+        """Recalcula el resumen precalculado de todas las sesiones."""
+        from app.utils.resumen_sesion import reconstruir_resumenes
+        total = reconstruir_resumenes()
+        invalidar_cache_servidor('sesiones')
+        click.echo(f"Resúmenes reconstruidos: {total} sesiones.")
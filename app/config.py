@@ -9,6 +9,18 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Servidor de producción (wsgi.py, waitress): hilos que atienden peticiones.
+    # Cada navegador viendo /video_feed ocupa un hilo mientras mira.
+    WSGI_HILOS = int(os.getenv('WSGI_HILOS', 8))
+    WSGI_CONEXIONES_MAX = int(os.getenv('WSGI_CONEXIONES_MAX', 100))
+    # Pool de conexiones a PostgreSQL (database.conexion.opciones_engine).
+    # DB_POOL_SIZE vacío = WSGI_HILOS + TRABAJOS_MAX_WORKERS + 1
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE')) if os.getenv('DB_POOL_SIZE') else None
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
     
     MAIL_SERVER = os.getenv('MAIL_SERVER')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
@@ -17,6 +29,75 @@ class Config:
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     
     ADMIN_EMAIL = os.getenv('ADMIN_EMAIL')
+    # Correos de alertas críticas (app/utils/correo.py): pendientes en disco,
+    # resumen de las alertas que llegan dentro de la ventana y conexión SMTP persistente
+    CORREO_PENDIENTES_DIR = os.getenv('CORREO_PENDIENTES_DIR', os.path.join(basedir, '..', 'archivo', 'correo_pendiente'))
+    CORREO_VENTANA_DIGEST = float(os.getenv('CORREO_VENTANA_DIGEST', 60))
+    CORREO_MAX_ALERTAS = int(os.getenv('CORREO_MAX_ALERTAS', 20))
+    CORREO_INACTIVIDAD = float(os.getenv('CORREO_INACTIVIDAD', 120))
+    CORREO_REINTENTO = float(os.getenv('CORREO_REINTENTO', 30))
+    CORREO_MAX_COLA = int(os.getenv('CORREO_MAX_COLA', 1000))
+    # Alertas de la misma sesión y nivel dentro de esta ventana (segundos) se fusionan
+    # en la primera (app/utils/agrupacion_alertas.py). 0 = sin agrupar
+    ALERTAS_VENTANA_AGRUPACION = float(os.getenv('ALERTAS_VENTANA_AGRUPACION', 30))
     UPLOAD_FOLDER = os.path.join(basedir, 'static/evidencia')
+    # POST /api/telemetria: tope del cuerpo ya descomprimido y de minutos por lote
+    TELEMETRIA_MAX_BYTES = int(os.getenv('TELEMETRIA_MAX_BYTES', 1024 * 1024))
+    TELEMETRIA_MAX_MINUTOS = int(os.getenv('TELEMETRIA_MAX_MINUTOS', 240))
+    # Trazas EAR crudas que graba el detector (ia_module/traza.py)
+    TRAZAS_DIR = os.getenv('DETECTOR_TRAZAS_DIR', os.path.join(basedir, '..', 'archivo', 'trazas'))
+
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODELO = os.getenv('GEMINI_MODELO', 'gemini-2.5-pro-latest')
+    # Proveedor de IA: 'gemini', 'local' (stub sin red) o ruta 'modulo.Clase'
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+    LLM_TIMEOUT = int(os.getenv('LLM_TIMEOUT', 20))
+    LLM_STUB_LATENCIA = float(os.getenv('LLM_STUB_LATENCIA', 0.0))
+    # Recomendaciones en caché por foto de métricas (LRU con TTL)
+    RECOMENDACIONES_MAX_ITEMS = int(os.getenv('RECOMENDACIONES_MAX_ITEMS', 512))
+    RECOMENDACIONES_TTL = int(os.getenv('RECOMENDACIONES_TTL', 86400))
+
+    # Retención de alertas: meses en la base antes de pasar al archivo Parquet
+    ALERTAS_RETENCION_MESES = int(os.getenv('ALERTAS_RETENCION_MESES', 12))
+    ARCHIVO_ALERTAS_DIR = os.getenv('ARCHIVO_ALERTAS_DIR', os.path.join(basedir, '..', 'archivo', 'alertas'))
+
+    # Caché de respuestas ('memoria' o ruta 'modulo.Clase' de un backend propio)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memoria')
+    CACHE_MAX_ITEMS = int(os.getenv('CACHE_MAX_ITEMS', 256))
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 30))
+    # Los comandos de mantenimiento piden al servidor en ejecución que invalide su caché
+    # (POST /api/admin/cache/invalidar con "Authorization: Bearer <CACHE_TOKEN>")
+    SERVIDOR_URL = os.getenv('SERVIDOR_URL', 'http://127.0.0.1:5000')
+    CACHE_TOKEN = os.getenv('CACHE_TOKEN')
+
+    # Compresión gzip de respuestas JSON/HTML
+    COMPRESION_MIN_BYTES = int(os.getenv('COMPRESION_MIN_BYTES', 1024))
+    COMPRESION_NIVEL = int(os.getenv('COMPRESION_NIVEL', 6))
+
+    # Medición de SQL por petición (app/utils/medicion_sql.py)
+    SQL_SERVER_TIMING = os.getenv('SQL_SERVER_TIMING', 'True').lower() == 'true'
+    SQL_LENTA_MS = float(os.getenv('SQL_LENTA_MS', 200))
+    SQL_AVISO_CONSULTAS = int(os.getenv('SQL_AVISO_CONSULTAS', 30))
+    # Solo para pruebas: una petición con más consultas lanza AssertionError
+    SQL_MAX_CONSULTAS = int(os.getenv('SQL_MAX_CONSULTAS')) if os.getenv('SQL_MAX_CONSULTAS') else None
+
+    # Usuario autenticado en caché para el user_loader (app/utils/usuarios_sesion.py)
+    USUARIOS_CACHE_MAX_ITEMS = int(os.getenv('USUARIOS_CACHE_MAX_ITEMS', 1024))
+    USUARIOS_CACHE_TTL = int(os.getenv('USUARIOS_CACHE_TTL', 60))
+
+    # Logging en cola (app/utils/logs.py): nivel general y por módulo ("logger=NIVEL,...")
+    LOG_NIVEL = os.getenv('LOG_NIVEL', 'INFO')
+    LOG_NIVELES = os.getenv('LOG_NIVELES', '')
+    # Un mismo mensaje se emite como máximo una vez por ventana (segundos; 0 = sin supresión)
+    LOG_VENTANA_REPETICIONES = float(os.getenv('LOG_VENTANA_REPETICIONES', 60))
+    LOG_COLA_MAX = int(os.getenv('LOG_COLA_MAX', 10000))
+
+    # GET /metrics (Prometheus); vacío = sin autenticación
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
 
-    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
\ No newline at end of file
+    # Trabajos en segundo plano y exportaciones
+    TRABAJOS_MAX_WORKERS = int(os.getenv('TRABAJOS_MAX_WORKERS', 2))
+    TRABAJOS_TTL = int(os.getenv('TRABAJOS_TTL', 3600))
+    EXPORTACIONES_DIR = os.getenv('EXPORTACIONES_DIR', os.path.join(basedir, '..', 'archivo', 'exportaciones'))
+    # Hasta este número de alertas el Excel se genera dentro de la petición
+    EXPORTACION_MAX_FILAS_SINCRONA = int(os.getenv('EXPORTACION_MAX_FILAS_SINCRONA', 20000))
@@ -16,6 +16,15 @@ class Usuario(db.Model, UserMixin):
     vehiculos = db.relationship('Vehiculo', backref='usuario', lazy=True)
     sesiones = db.relationship('SesionConduccion', backref='usuario', lazy=True)
 
+    __table_args__ = (
+        # Orden por nombre (keyset) y búsqueda por prefijo sin distinguir mayúsculas
+        db.Index('ix_usuarios_nombre_id', 'nombre', 'id'),
+        db.Index('ix_usuarios_nombre_lower', db.func.lower(nombre).label('nombre_lower'),
+                 postgresql_ops={'nombre_lower': 'text_pattern_ops'}),
+        db.Index('ix_usuarios_username_lower', db.func.lower(username).label('username_lower'),
+                 postgresql_ops={'username_lower': 'text_pattern_ops'}),
+    )
+
     def get_id(self):
         return str(self.id)
 
@@ -37,6 +46,13 @@ class Vehiculo(db.Model):
     alertas = db.relationship('Alerta', backref='vehiculo', lazy=True)
     sesiones = db.relationship('SesionConduccion', backref='vehiculo', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_vehiculos_codigo_lower', db.func.lower(codigo).label('codigo_lower'),
+                 postgresql_ops={'codigo_lower': 'text_pattern_ops'}),
+        db.Index('ix_vehiculos_placa_lower', db.func.lower(placa).label('placa_lower'),
+                 postgresql_ops={'placa_lower': 'text_pattern_ops'}),
+    )
+
     def __repr__(self):
         return f'<Vehiculo {self.codigo}>'
 class Alerta(db.Model):
@@ -45,13 +61,23 @@ class Alerta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
     id_vehiculo = db.Column(db.Integer, db.ForeignKey('vehiculos.id'))
-    id_sesion = db.Column(db.Integer, db.ForeignKey('sesiones_conduccion.id'))
+    id_sesion = db.Column(db.Integer, db.ForeignKey('sesiones_conduccion.id'), index=True)
     fecha = db.Column(db.Date, default=datetime.now)
     hora = db.Column(db.Time, default=lambda: datetime.now().time())
+    timestamp = db.Column(db.DateTime, default=datetime.now, index=True)
     duracion = db.Column(db.Float)
     nota = db.Column(db.String(255))
     nivel_somnolencia = db.Column(db.String(20))
     evidencia_url = db.Column(db.String(255), nullable=True)
+    # Alertas de la misma sesión y nivel fusionadas en esta (app.utils.agrupacion_alertas):
+    # duracion es la suma, duracion_max la más larga y ultima_ocurrencia la hora de la última
+    ocurrencias = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    duracion_max = db.Column(db.Float, nullable=True)
+    ultima_ocurrencia = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_alertas_usuario_timestamp', 'id_usuario', 'timestamp'),
+    )
     
     def __repr__(self):
         return f'<Alerta {self.id} - Usuario {self.id_usuario}>'
@@ -65,9 +91,73 @@ class SesionConduccion(db.Model):
     fecha_fin = db.Column(db.DateTime, nullable=True)
     estado = db.Column(db.String(20), default='activa')
 
+    __table_args__ = (
+        db.Index('ix_sesiones_usuario_id', 'id_usuario', 'id'),
+        db.Index('ix_sesiones_fecha_inicio_id', 'fecha_inicio', 'id'),
+    )
+
     def finalizar(self):
         self.fecha_fin = datetime.now()
         self.estado = 'finalizada'
 
     def __repr__(self):
-        return f'<Sesion {self.id} - Usuario {self.id_usuario}>'
\ No newline at end of file
+        return f'<Sesion {self.id} - Usuario {self.id_usuario}>'
+class AgregadoAlertasHora(db.Model):
+    """Conteo de alertas por hora, conductor, vehículo y nivel (mantenido por app.utils.agregados)."""
+    __tablename__ = 'agregado_alertas_hora'
+
+    bucket = db.Column(db.DateTime, primary_key=True)
+    id_usuario = db.Column(db.Integer, primary_key=True)
+    id_vehiculo = db.Column(db.Integer, primary_key=True)
+    nivel_somnolencia = db.Column(db.String(20), primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+
+class AgregadoConduccionDia(db.Model):
+    """Segundos conducidos por conductor y día, solo de sesiones finalizadas."""
+    __tablename__ = 'agregado_conduccion_dia'
+
+    dia = db.Column(db.Date, primary_key=True)
+    id_usuario = db.Column(db.Integer, primary_key=True)
+    segundos = db.Column(db.Float, nullable=False, default=0.0)
+
+class ResumenSesion(db.Model):
+    """Resumen por sesión, actualizado al llegar cada alerta y cerrado al finalizar la sesión."""
+    __tablename__ = 'resumen_sesiones'
+
+    id_sesion = db.Column(db.Integer, db.ForeignKey('sesiones_conduccion.id', ondelete='CASCADE'), primary_key=True)
+    alertas_total = db.Column(db.Integer, nullable=False, default=0)
+    alertas_bajo = db.Column(db.Integer, nullable=False, default=0)
+    alertas_medio = db.Column(db.Integer, nullable=False, default=0)
+    alertas_alto = db.Column(db.Integer, nullable=False, default=0)
+    alertas_critico = db.Column(db.Integer, nullable=False, default=0)
+    segundos_somnolencia = db.Column(db.Float, nullable=False, default=0.0)
+    episodio_mas_largo = db.Column(db.Float, nullable=False, default=0.0)
+    segundos_conducidos = db.Column(db.Float, nullable=True)  # NULL mientras la sesión está activa
+
+    sesion = db.relationship(
+        'SesionConduccion',
+        backref=db.backref('resumen', uselist=False, lazy=True, cascade='all, delete-orphan')
+    )
+class TelemetriaMinuto(db.Model):
+    """Resumen por minuto que sube el detector (ver ia_module/telemetria.py y /api/telemetria)."""
+    __tablename__ = 'telemetria_minutos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    id_vehiculo = db.Column(db.Integer, db.ForeignKey('vehiculos.id'))
+    id_sesion = db.Column(db.Integer, db.ForeignKey('sesiones_conduccion.id', ondelete='SET NULL'))
+    minuto = db.Column(db.DateTime, nullable=False)
+    ear_media = db.Column(db.Float)
+    ear_min = db.Column(db.Float)
+    ear_p10 = db.Column(db.Float)
+    rostro = db.Column(db.Float)
+    cierres = db.Column(db.Integer)
+    fps = db.Column(db.Float)
+    cpu = db.Column(db.Float)
+    perclos = db.Column(db.Float)
+
+    __table_args__ = (
+        # Un reintento del detector no duplica minutos
+        db.UniqueConstraint('id_usuario', 'minuto', name='uq_telemetria_usuario_minuto'),
+        db.Index('ix_telemetria_sesion_minuto', 'id_sesion', 'minuto'),
+    )
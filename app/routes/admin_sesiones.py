@@ -1,11 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from database.conexion import db
 from app.models import SesionConduccion, Usuario, Vehiculo
 from datetime import datetime
+from sqlalchemy import select, or_
+from sqlalchemy.orm import joinedload
+from app.utils import agregados, resumen_sesion
+from app.utils.cache import cache
+from app.utils.agrupacion_alertas import agrupador_alertas
+from app.utils.paginacion import paginar, filtro_prefijo
 
 admin_sesiones_bp = Blueprint('admin_sesiones', __name__)
 
+COLUMNAS_ORDEN_SESIONES = {'id': SesionConduccion.id, 'inicio': SesionConduccion.fecha_inicio}
+
 @admin_sesiones_bp.route('/dashboard/sesiones')
 @login_required
 def listar_sesiones():
@@ -13,13 +21,19 @@ def listar_sesiones():
         flash('Acceso denegado: solo administradores.', 'danger')
         return redirect(url_for('web_login.login'))
 
-    sesiones = (
-        db.session.query(SesionConduccion, Usuario.nombre, Vehiculo.codigo)
-        .join(Usuario, SesionConduccion.id_usuario == Usuario.id, isouter=True)
-        .join(Vehiculo, SesionConduccion.id_vehiculo == Vehiculo.id, isouter=True)
-        .order_by(SesionConduccion.id.desc())
-        .all()
+    # Usuario y vehículo de cada fila en la misma consulta (sin carga perezosa por fila)
+    query = SesionConduccion.query.options(
+        joinedload(SesionConduccion.usuario),
+        joinedload(SesionConduccion.vehiculo),
     )
+    q = (request.args.get('q') or '').strip()
+    if q:
+        # Búsqueda por prefijo en los índices de usuarios/vehículos, sin recorrer sesiones
+        query = query.filter(or_(
+            SesionConduccion.id_usuario.in_(select(Usuario.id).where(filtro_prefijo(q, Usuario.nombre))),
+            SesionConduccion.id_vehiculo.in_(select(Vehiculo.id).where(filtro_prefijo(q, Vehiculo.codigo))),
+        ))
+    sesiones = paginar(query, COLUMNAS_ORDEN_SESIONES, SesionConduccion.id, request.args, 'id', 'desc')
     return render_template('admin_sesiones.html', sesiones=sesiones)
 
 @admin_sesiones_bp.route('/dashboard/sesiones/<int:id>/toggle', methods=['POST'])
@@ -32,15 +46,22 @@ def toggle_sesion(id):
     sesion = SesionConduccion.query.get_or_404(id)
 
     if sesion.estado == 'activa':
+        agrupador_alertas.vaciar(sesion.id)
         sesion.estado = 'finalizada'
         sesion.fecha_fin = datetime.now()
+        agregados.registrar_sesion_finalizada(sesion)
+        resumen_sesion.cerrar_sesion(sesion)
         flash(f'Sesión {id} finalizada.', 'success')
     else:
+        # Al reactivar, su tiempo vuelve a contarse como sesión activa
+        agregados.revertir_sesion_finalizada(sesion)
+        resumen_sesion.reabrir_sesion(sesion)
         sesion.estado = 'activa'
         sesion.fecha_fin = None
         flash(f'Sesión {id} activada.', 'warning')
 
     db.session.commit()
+    cache.invalidar('sesiones', f'conductor:{sesion.id_usuario}')
     return redirect(url_for('admin_sesiones.listar_sesiones'))
 
 @admin_sesiones_bp.route('/dashboard/sesiones/<int:id>/eliminar', methods=['POST'])
@@ -51,7 +72,41 @@ def eliminar_sesion(id):
         return redirect(url_for('web_login.login'))
 
     sesion = SesionConduccion.query.get_or_404(id)
+    id_usuario = sesion.id_usuario
+    agrupador_alertas.vaciar(sesion.id)
+    agregados.revertir_sesion_finalizada(sesion)
     db.session.delete(sesion)
     db.session.commit()
+    cache.invalidar('sesiones', f'conductor:{id_usuario}')
     flash(f'Sesión {id} eliminada.', 'info')
     return redirect(url_for('admin_sesiones.listar_sesiones'))
+
+
+@admin_sesiones_bp.route('/dashboard/sesiones/<int:id>/traza')
+@login_required
+def traza_sesion(id):
+    """
+    Señal EAR cruda de la sesión (JSON), reducida a `max_puntos` tomando el
+    mínimo de cada tramo para no perder los cierres. Sin rostro -> null.
+    """
+    if current_user.rol != 'admin':
+        return jsonify({"error": "No autorizado"}), 403
+    sesion = SesionConduccion.query.get_or_404(id)
+    # numpy solo al pedir la traza, no al arrancar la app
+    import numpy as np
+    from ia_module.traza import leer_traza
+
+    t, ear, rostro = leer_traza(current_app.config['TRAZAS_DIR'], sesion.id_usuario,
+                                sesion.fecha_inicio, sesion.fecha_fin)
+    max_puntos = max(10, min(request.args.get('max_puntos', 2000, type=int), 20000))
+    if len(t) > max_puntos:
+        cortes = np.linspace(0, len(t), max_puntos, endpoint=False).astype(np.int64)
+        ear = np.minimum.reduceat(np.where(rostro, ear, np.inf), cortes)
+        t = t[cortes]
+        rostro = np.isfinite(ear)
+    return jsonify({
+        'sesion': sesion.id,
+        'muestras': int(len(t)),
+        't': np.round(t, 3).tolist(),
+        'ear': [round(float(e), 4) if r else None for e, r in zip(ear, rostro)],
+    }), 200
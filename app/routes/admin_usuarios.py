@@ -1,13 +1,17 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
-from flask import jsonify, current_app 
+from flask import jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
-from sqlalchemy import func, desc 
+from sqlalchemy import func
 from database.conexion import db
 from app.models import Usuario, Alerta, SesionConduccion, Vehiculo
-import pandas as pd
-import io
-import requests 
+from app.utils.cache import cache
+from app.utils.usuarios_sesion import usuarios_sesion
+from app.utils import exportador
+from app.utils.trabajos import trabajos, estado_exportacion_dict, TIPOS_DESCARGABLES
+from app.utils.recomendaciones import recomendaciones
+from app.utils.paginacion import paginar, filtro_prefijo
+import os
 from datetime import datetime
 
 admin_usuarios_bp = Blueprint('admin_usuarios', __name__)
@@ -18,12 +22,18 @@ def _solo_admin():
         return False
     return True
 
+COLUMNAS_ORDEN_USUARIOS = {'id': Usuario.id, 'nombre': Usuario.nombre, 'username': Usuario.username}
+
 @admin_usuarios_bp.route('/dashboard/usuarios', methods=['GET'])
 @login_required
 def listar_usuarios():
     if not _solo_admin():
         return redirect(url_for('web_login.perfil_redirect'))
-    usuarios = Usuario.query.order_by(Usuario.id.desc()).all()
+    query = Usuario.query
+    q = (request.args.get('q') or '').strip()
+    if q:
+        query = query.filter(filtro_prefijo(q, Usuario.nombre, Usuario.username))
+    usuarios = paginar(query, COLUMNAS_ORDEN_USUARIOS, Usuario.id, request.args, 'id', 'desc')
     return render_template('admin_usuarios.html', usuarios=usuarios)
 
 @admin_usuarios_bp.route('/dashboard/usuarios/crear', methods=['POST'])
@@ -49,6 +59,7 @@ def crear_usuario():
         password_hash=generate_password_hash(password), rol=rol
     )
     db.session.add(user); db.session.commit()
+    cache.invalidar('usuarios')
     flash(f'Usuario {username} creado correctamente.', 'success')
     return redirect(url_for('admin_usuarios.listar_usuarios'))
 
@@ -67,6 +78,8 @@ def cambiar_rol(id):
         return redirect(url_for('admin_usuarios.listar_usuarios'))
     u.rol = nuevo_rol
     db.session.commit()
+    cache.invalidar('usuarios')
+    usuarios_sesion.invalidar(u.id)
     flash(f'Rol de {u.username} cambiado a {nuevo_rol}.', 'success')
     return redirect(url_for('admin_usuarios.listar_usuarios'))
 
@@ -84,6 +97,8 @@ def toggle_estado(id):
     else:
         u.rol = 'inactivo'; estado_txt = 'desactivado'
     db.session.commit()
+    cache.invalidar('usuarios')
+    usuarios_sesion.invalidar(u.id)
     flash(f'Usuario {u.username} {estado_txt}.', 'success')
     return redirect(url_for('admin_usuarios.listar_usuarios'))
 
@@ -101,7 +116,7 @@ def ver_usuario(id):
         .filter(SesionConduccion.id_usuario == u.id).scalar() or 0
 
     # Total de alertas
-    total_alertas = db.session.query(func.count(Alerta.id)) \
+    total_alertas = db.session.query(func.sum(Alerta.ocurrencias)) \
         .filter(Alerta.id_usuario == u.id).scalar() or 0
 
     # Vehículos más usados por el conductor
@@ -117,7 +132,7 @@ def ver_usuario(id):
 
     # Alertas agrupadas por nivel (bajo, medio, alto)
     nivel_counts = (
-        db.session.query(Alerta.nivel_somnolencia, func.count(Alerta.id))
+        db.session.query(Alerta.nivel_somnolencia, func.sum(Alerta.ocurrencias))
         .filter(Alerta.id_usuario == u.id)
         .group_by(Alerta.nivel_somnolencia)
         .all()
@@ -141,210 +156,151 @@ def ver_usuario(id):
         ultimas_alertas=ultimas_alertas
     )
     
+def _preparar_exportacion(u):
+    """Devuelve (desde, hasta, clave, ruta) para el rango pedido en el query string."""
+    desde, hasta = exportador.rango_desde_texto(request.args.get('desde'), request.args.get('hasta'))
+    huella = exportador.huella_datos(u.id, desde, hasta)
+    clave = exportador.clave_exportacion(u.id, desde, hasta, huella)
+    ruta = exportador.ruta_exportacion(current_app.config['EXPORTACIONES_DIR'], u.id, desde, hasta, clave)
+    return desde, hasta, huella, clave, ruta
+
+def _enviar_excel(u, ruta):
+    fecha_hoy = datetime.now().strftime('%Y-%m-%d')
+    return send_file(
+        ruta,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f"reporte_usuario_{u.username}_{fecha_hoy}.xlsx"
+    )
+
+def _trabajo_exportacion(id_usuario, desde, hasta, ruta, reportar):
+    u = db.session.get(Usuario, id_usuario)
+    return exportador.escribir_excel_usuario(u, desde, hasta, ruta, reportar=reportar)
+
 @admin_usuarios_bp.route('/dashboard/usuarios/<int:id>/exportar_excel')
 @login_required
 def exportar_excel(id):
     if not _solo_admin():
         return redirect(url_for('web_login.perfil_redirect'))
+    u = Usuario.query.get_or_404(id)
     try:
-        u = Usuario.query.get_or_404(id)
-        # ... (código de excel omitido por brevedad) ...
-        # Total de sesiones
-        total_sesiones = db.session.query(func.count(SesionConduccion.id)) \
-            .filter(SesionConduccion.id_usuario == u.id).scalar() or 0
-        # Total de alertas
-        total_alertas = db.session.query(func.count(Alerta.id)) \
-            .filter(Alerta.id_usuario == u.id).scalar() or 0
-        # Vehículos más usados por el conductor
-        vehiculos_top = (
-            db.session.query(Vehiculo.codigo, func.count(SesionConduccion.id))
-            .join(SesionConduccion, Vehiculo.id == SesionConduccion.id_vehiculo)
-            .filter(SesionConduccion.id_usuario == u.id)
-            .group_by(Vehiculo.codigo)
-            .order_by(func.count(SesionConduccion.id).desc())
-            .all()
-        )
-        # Alertas agrupadas por nivel
-        nivel_counts = (
-            db.session.query(Alerta.nivel_somnolencia, func.count(Alerta.id))
-            .filter(Alerta.id_usuario == u.id)
-            .group_by(Alerta.nivel_somnolencia)
-            .all()
-        )
-        niveles = {(nivel or 'N/A').lower(): count for nivel, count in nivel_counts}
-        # Últimas alertas registradas
-        todas_las_alertas = (
-            Alerta.query.filter_by(id_usuario=u.id)
-            .order_by(Alerta.id.desc())
-            .all()
-        )
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Pestaña 1: Resumen
-            df_resumen = pd.DataFrame([
-                ("Usuario", u.nombre),
-                ("Username", u.username),
-                ("Total de Sesiones", total_sesiones),
-                ("Total de Alertas", total_alertas)
-            ], columns=["Métrica", "Valor"])
-            df_resumen.to_excel(writer, sheet_name='Resumen', index=False)
-            # Pestaña 2: Alertas por Nivel
-            if niveles:
-                df_niveles = pd.DataFrame(list(niveles.items()), columns=['Nivel', 'Cantidad'])
-            else:
-                df_niveles = pd.DataFrame(columns=['Nivel', 'Cantidad'])
-            df_niveles.to_excel(writer, sheet_name='Alertas por Nivel', index=False)
-            # Pestaña 3: Vehículos Usados
-            if vehiculos_top:
-                df_vehiculos = pd.DataFrame(vehiculos_top, columns=['Vehículo', 'Sesiones'])
-            else:
-                df_vehiculos = pd.DataFrame(columns=['Vehículo', 'Sesiones'])
-            df_vehiculos.to_excel(writer, sheet_name='Vehículos Usados', index=False)
-            # Pestaña 4: Historial de Alertas
-            if todas_las_alertas:
-                alertas_data = [
-                    {
-                        "ID": a.id,
-                        "Fecha": a.fecha.strftime('%d/%m/%Y') if a.fecha else None,
-                        "Hora": a.hora.strftime('%H:%M:%S') if a.hora else None,
-                        "Nivel": a.nivel_somnolencia,
-                        "Nota": a.nota,
-                        "ID Vehículo": a.id_vehiculo
-                    } for a in todas_las_alertas
-                ]
-                df_alertas = pd.DataFrame(alertas_data)
-            else:
-                df_alertas = pd.DataFrame(columns=["ID", "Fecha", "Hora", "Nivel", "Nota", "ID Vehículo"])
-            
-            df_alertas.to_excel(writer, sheet_name='Historial de Alertas', index=False)
-            
-        output.seek(0)
-        fecha_hoy = datetime.now().strftime('%Y-%m-%d')
-        filename = f"reporte_usuario_{u.username}_{fecha_hoy}.xlsx"
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
-    except Exception as e:
-        flash(f'Error al generar el archivo Excel: {e}', 'danger')
+        desde, hasta, huella, clave, ruta = _preparar_exportacion(u)
+    except ValueError:
+        flash('Rango de fechas inválido (usar AAAA-MM-DD).', 'warning')
         return redirect(url_for('admin_usuarios.ver_usuario', id=id))
 
-def _call_gemini_api(prompt_text):
-    """
-    Llama a la API REST de Gemini. No usa la librería de Python para evitar conflictos.
-    """
-    api_key = current_app.config.get('GEMINI_API_KEY')
-    if not api_key:
-        return "Error: GEMINI_API_KEY no está configurada en el servidor."
-
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-pro-latest:generateContent?key={api_key}"
-    
-    headers = {"Content-Type": "application/json"}
-    
-    data = {
-        "contents": [{
-            "parts": [{"text": prompt_text}]
-        }]
-    }
+    # Mismo usuario, rango y datos: se reutiliza el archivo ya generado
+    if os.path.exists(ruta):
+        return _enviar_excel(u, ruta)
 
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=20)
-        response.raise_for_status() # Lanza un error si la respuesta es 4xx o 5xx
-        
-        # Extraer el texto de la respuesta
-        result = response.json()
-        return result['candidates'][0]['content']['parts'][0]['text']
-        
-    except requests.exceptions.RequestException as e:
-        print(f"[Gemini API] Error en la solicitud: {e}")
-        return f"Error al contactar la API de Gemini: {e}"
-    except (KeyError, IndexError) as e:
-        print(f"[Gemini API] Error al parsear la respuesta: {e}")
-        print(f"[Gemini API] Respuesta recibida: {response.text}")
-        return "Error: La API de IA devolvió una respuesta inesperada."
+        total_alertas = huella[0]
+        if total_alertas <= current_app.config['EXPORTACION_MAX_FILAS_SINCRONA']:
+            exportador.escribir_excel_usuario(u, desde, hasta, ruta)
+            return _enviar_excel(u, ruta)
+    except Exception as e:
+        flash(f'Error al generar el archivo Excel: {e}', 'danger')
+        return redirect(url_for('admin_usuarios.ver_usuario', id=id))
 
+    # Historial grande: se genera en segundo plano y no bloquea el worker
+    trabajos.enviar(f"exportacion:{clave}", 'exportacion', _trabajo_exportacion, u.id, desde, hasta, ruta)
+    flash(f'El reporte tiene {total_alertas} alertas y se está generando en segundo plano. '
+          'Vuelve a presionar "Exportar" en unos momentos para descargarlo.', 'info')
+    return redirect(url_for('admin_usuarios.ver_usuario', id=id))
 
-@admin_usuarios_bp.route('/api/usuario/<int:id>/generar_recomendacion', methods=['GET'])
+@admin_usuarios_bp.route('/dashboard/usuarios/<int:id>/exportar_csv')
 @login_required
-def generar_recomendacion(id):
+def exportar_csv(id):
     if not _solo_admin():
-        return jsonify({"error": "No autorizado"}), 403
-
+        return redirect(url_for('web_login.perfil_redirect'))
     u = Usuario.query.get_or_404(id)
-    
-    # Métricas de tarjetas
-    total_sesiones = db.session.query(func.count(SesionConduccion.id)) \
-        .filter(SesionConduccion.id_usuario == u.id).scalar() or 0
-    total_alertas = db.session.query(func.count(Alerta.id)) \
-        .filter(Alerta.id_usuario == u.id).scalar() or 0
-
-    # Alertas por nivel
-    nivel_counts = (
-        db.session.query(Alerta.nivel_somnolencia, func.count(Alerta.id))
-        .filter(Alerta.id_usuario == u.id)
-        .group_by(Alerta.nivel_somnolencia)
-        .all()
-    )
-    # Convertir a un string legible
-    niveles_str = ", ".join([f"{count} {nivel}" for nivel, count in nivel_counts]) or "Ninguna"
-
-    # Alertas por hora (similar a dashboard.py, pero para un usuario)
-    hora_col = func.extract('hour', Alerta.hora)
-    alertas_por_hora_db = (
-        db.session.query(
-            hora_col.label('hora'), 
-            func.count(Alerta.id).label('cantidad')
-        )
-        .filter(Alerta.id_usuario == u.id)
-        .group_by(hora_col)
-        .order_by(desc('cantidad'))
-        .limit(3) # Top 3 horas de mayor riesgo
-        .all()
+    try:
+        desde, hasta = exportador.rango_desde_texto(request.args.get('desde'), request.args.get('hasta'))
+    except ValueError:
+        flash('Rango de fechas inválido (usar AAAA-MM-DD).', 'warning')
+        return redirect(url_for('admin_usuarios.ver_usuario', id=id))
+    filename = f"alertas_{u.username}_{datetime.now().strftime('%Y-%m-%d')}.csv"
+    return Response(
+        stream_with_context(exportador.generar_csv_usuario(u.id, desde, hasta)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
     )
-    horas_riesgo_str = ", ".join([f"{int(h.cantidad)} alertas a las {int(h.hora):02d}:00" for h in alertas_por_hora_db]) or "Sin patrón claro"
 
-    # Tasa de Riesgo (Alertas por Hora)
-    total_horas = (
-        db.session.query(
-            (func.sum(
-                func.extract('epoch', func.coalesce(SesionConduccion.fecha_fin, func.now())) - 
-                func.extract('epoch', SesionConduccion.fecha_inicio)
-            ) / 3600.0)
-        )
-        .filter(SesionConduccion.id_usuario == u.id)
-        .scalar() or 0.0
-    )
-    tasa_riesgo = (total_alertas / total_horas) if total_horas > 0 else 0
-    
-    # --- Prompt ---
-    prompt = f"""
-    Eres un analista experto en seguridad de flotas de transporte pesado.
-    Tu trabajo es analizar los datos de un conductor y generar una recomendación clara y accionable para un administrador.
-    
-    Responde en español y usa Markdown para formatear tu respuesta. 
-    Tu respuesta debe ser un análisis profesional en 3 secciones:
-    1.  **Diagnóstico General:** Un resumen del perfil de riesgo del conductor.
-    2.  **Puntos Clave de Riesgo:** 2 o 3 viñetas identificando los patrones peligrosos.
-    3.  **Recomendación Accionable:** 1 o 2 acciones claras que el administrador debe tomar.
+# ==========================
+# EXPORTACIONES EN SEGUNDO PLANO (API)
+# ==========================
+@admin_usuarios_bp.route('/api/usuario/<int:id>/exportaciones', methods=['POST'])
+@login_required
+def crear_exportacion(id):
+    if not _solo_admin():
+        return jsonify({"error": "No autorizado"}), 403
+    u = Usuario.query.get_or_404(id)
+    try:
+        desde, hasta, huella, clave, ruta = _preparar_exportacion(u)
+    except ValueError:
+        return jsonify({"error": "Rango de fechas inválido (usar AAAA-MM-DD)"}), 400
+    if os.path.exists(ruta):
+        trabajo = trabajos.enviar(f"exportacion:{clave}", 'exportacion', lambda reportar: ruta)
+    else:
+        trabajo = trabajos.enviar(f"exportacion:{clave}", 'exportacion', _trabajo_exportacion,
+                                  u.id, desde, hasta, ruta)
+    return jsonify(estado_exportacion_dict(trabajo)), 202
 
-    Aquí están los datos del conductor '{u.nombre}':
+@admin_usuarios_bp.route('/api/exportaciones/<id_trabajo>', methods=['GET'])
+@login_required
+def estado_exportacion(id_trabajo):
+    if not _solo_admin():
+        return jsonify({"error": "No autorizado"}), 403
+    trabajo = trabajos.obtener(id_trabajo)
+    if trabajo is None or trabajo.tipo not in TIPOS_DESCARGABLES:
+        return jsonify({"error": "Exportación no encontrada"}), 404
+    return jsonify(estado_exportacion_dict(trabajo))
 
-    --- DATOS DE RENDIMIENTO ---
-    - Tasa de Riesgo (Alertas por Hora): {tasa_riesgo:.2f}
-    - Total de Jornadas Conducidas: {total_sesiones}
-    - Total de Alertas Acumuladas: {total_alertas}
-    - Desglose de Alertas por Nivel: {niveles_str}
-    - Horas de Mayor Riesgo (Patrones): {horas_riesgo_str}
-    --- FIN DE DATOS ---
+@admin_usuarios_bp.route('/api/exportaciones/<id_trabajo>/descargar', methods=['GET'])
+@login_required
+def descargar_exportacion(id_trabajo):
+    if not _solo_admin():
+        return jsonify({"error": "No autorizado"}), 403
+    trabajo = trabajos.obtener(id_trabajo)
+    if trabajo is None or trabajo.tipo not in TIPOS_DESCARGABLES or trabajo.estado != 'terminado':
+        return jsonify({"error": "La exportación no está lista"}), 404
+    return send_file(trabajo.resultado, as_attachment=True,
+                     download_name=os.path.basename(trabajo.resultado))
 
-    Genera el análisis.
+# ==========================
+# RECOMENDACIÓN DE IA (ASÍNCRONA Y EN CACHÉ)
+# ==========================
+@admin_usuarios_bp.route('/api/usuario/<int:id>/generar_recomendacion', methods=['GET'])
+@login_required
+def generar_recomendacion(id):
     """
-
-    # --- 3. Llamar a la API y devolver la respuesta ---
+    200 con la recomendación si está en caché para las métricas actuales;
+    si no, 202 con el trabajo que la genera (consultar url_estado).
+    """
+    if not _solo_admin():
+        return jsonify({"error": "No autorizado"}), 403
+    u = Usuario.query.get_or_404(id)
     try:
-        recomendacion = _call_gemini_api(prompt)
-        return jsonify({'recomendacion': recomendacion})
+        texto, trabajo = recomendaciones.solicitar(u)
     except Exception as e:
-        return jsonify({"error": f"Error al generar la recomendación: {e}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Error al generar la recomendación: {e}"}), 500
+    if texto is not None:
+        return jsonify({'estado': 'terminado', 'recomendacion': texto})
+    return jsonify(_estado_recomendacion(trabajo)), 202
+
+@admin_usuarios_bp.route('/api/recomendaciones/<id_trabajo>', methods=['GET'])
+@login_required
+def estado_recomendacion(id_trabajo):
+    if not _solo_admin():
+        return jsonify({"error": "No autorizado"}), 403
+    trabajo = trabajos.obtener(id_trabajo)
+    if trabajo is None or trabajo.tipo != 'recomendacion':
+        return jsonify({"error": "Recomendación no encontrada"}), 404
+    return jsonify(_estado_recomendacion(trabajo))
+
+def _estado_recomendacion(trabajo):
+    estado = trabajo.a_dict()
+    estado['url_estado'] = url_for('admin_usuarios.estado_recomendacion', id_trabajo=trabajo.id)
+    if trabajo.estado == 'terminado':
+        estado['recomendacion'] = trabajo.resultado
+    return estado
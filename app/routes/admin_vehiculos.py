@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from database.conexion import db
 from app.models import Vehiculo, Usuario
+from app.utils.cache import cache
+from app.utils.paginacion import paginar, filtro_prefijo
 
 admin_vehiculos_bp = Blueprint('admin_vehiculos', __name__)
 
@@ -14,14 +16,26 @@ def _solo_admin():
 
 
 # ==============LISTAR VEHÍCULOS==================
+COLUMNAS_ORDEN_VEHICULOS = {'id': Vehiculo.id, 'codigo': Vehiculo.codigo}
+
 @admin_vehiculos_bp.route('/dashboard/vehiculos')
 @login_required
 def listar_vehiculos():
     if not _solo_admin():
         return redirect(url_for('web_login.perfil_redirect'))
 
-    vehiculos = Vehiculo.query.order_by(Vehiculo.id.desc()).all()
-    conductores = Usuario.query.filter_by(rol='conductor').order_by(Usuario.nombre.asc()).all()
+    query = Vehiculo.query
+    q = (request.args.get('q') or '').strip()
+    if q:
+        query = query.filter(filtro_prefijo(q, Vehiculo.codigo, Vehiculo.placa))
+    vehiculos = paginar(query, COLUMNAS_ORDEN_VEHICULOS, Vehiculo.id, request.args, 'id', 'desc')
+    # Lista para los selectores de asignación (solo id, nombre y username)
+    conductores = (
+        db.session.query(Usuario.id, Usuario.nombre, Usuario.username)
+        .filter(Usuario.rol == 'conductor')
+        .order_by(Usuario.nombre.asc())
+        .all()
+    )
 
     return render_template(
         'admin_vehiculos.html',
@@ -76,6 +90,7 @@ def crear_vehiculo():
 
     db.session.add(v)
     db.session.commit()
+    cache.invalidar('vehiculos')
 
     flash(f'Vehículo {codigo} creado correctamente.', 'success')
     return redirect(url_for('admin_vehiculos.listar_vehiculos'))
@@ -91,6 +106,7 @@ def toggle_vehiculo(id):
     v = Vehiculo.query.get_or_404(id)
     v.estado = 'inactivo' if (v.estado or '').lower() == 'activo' else 'activo'
     db.session.commit()
+    cache.invalidar('vehiculos')
 
     flash(f'Vehículo {v.codigo} ahora está {v.estado}.', 'success')
     return redirect(url_for('admin_vehiculos.listar_vehiculos'))
@@ -107,6 +123,7 @@ def eliminar_vehiculo(id):
     codigo = v.codigo
     db.session.delete(v)
     db.session.commit()
+    cache.invalidar('vehiculos')
     flash(f'Vehículo {codigo} eliminado.', 'success')
     return redirect(url_for('admin_vehiculos.listar_vehiculos'))
 
@@ -129,10 +146,12 @@ def asignar_vehiculo(id):
 
         v.id_usuario = id_usuario
         db.session.commit()
+        cache.invalidar('vehiculos')
         flash(f'Vehículo {v.codigo} asignado a {conductor.nombre}.', 'success')
     else:
         v.id_usuario = None
         db.session.commit()
+        cache.invalidar('vehiculos')
         flash(f'Asignación removida del vehículo {v.codigo}.', 'info')
 
     return redirect(url_for('admin_vehiculos.listar_vehiculos'))
@@ -1,69 +1,25 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from database.conexion import db
 from app.models import Alerta, Usuario, Vehiculo, SesionConduccion
 from datetime import datetime
-from threading import Thread
-from flask_mail import Message
 import os
+import json
+import logging
 import uuid
+from itertools import islice
 from werkzeug.utils import secure_filename
+from app.utils import agregados, resumen_sesion
+from app.utils.resumen_sesion import NIVELES
+from app.utils.cache import cache
+from app.utils.respuestas_http import respuesta_condicional
+from app.utils.metricas import alertas_recibidas
+from app.utils.correo import correo
+from app.utils.agrupacion_alertas import agrupador_alertas
 from flask_login import login_required, current_user # <-- NUEVO IMPORT
 
 alertas_bp = Blueprint('alertas', __name__)
+log = logging.getLogger(__name__)
 
-# ... (tus funciones _send_async_email, enviar_email_alerta_critica, y crear_alerta no cambian) ...
-def _send_async_email(app, msg):
-    with app.app_context():
-        from app import mail 
-        try:
-            mail.send(msg)
-            print("[API] Email de alerta enviado exitosamente.")
-        except Exception as e:
-            print(f"[API] ERROR al enviar email: {e}")
-            
-def enviar_email_alerta_critica(app, alerta, usuario, vehiculo, evidencia_path=None):
-    admin_email = app.config.get('ADMIN_EMAIL')
-    sender_email = app.config.get('MAIL_USERNAME')
-    if not admin_email:
-        print("[API] ERROR: ADMIN_EMAIL no está configurado en .env. No se puede enviar email.")
-        return
-    if not sender_email:
-        print("[API] ERROR: MAIL_USERNAME no está configurado en .env. No se puede enviar email.")
-        return
-    subject = f"ALERTA CRÍTICA: Conductor {usuario.nombre}"
-    body = f"""
-    Se ha detectado una alerta de somnolencia Nivel CRÍTICO.
-    Por favor, contacte al conductor de inmediato.
-
-    --- DETALLES DE LA ALERTA ---
-    Conductor: {usuario.nombre} (ID: {usuario.id})
-    Vehículo: {vehiculo.codigo} (Placa: {vehiculo.placa or 'N/A'})
-    
-    Fecha: {alerta.fecha.strftime('%d/%m/%Y')}
-    Hora: {alerta.hora.strftime('%H:%M:%S')}
-    Duración del evento: {alerta.duracion} segundos
-    Nota: {alerta.nota or 'Alerta automática del detector.'}
-    
-    Se adjunta imagen de evidencia.
-    """
-    msg = Message(subject, sender=sender_email, recipients=[admin_email])
-    msg.body = body
-    if evidencia_path and os.path.exists(evidencia_path):
-        try:
-            with open(evidencia_path, 'rb') as fp:
-                msg.attach(
-                    filename=os.path.basename(evidencia_path),
-                    content_type='image/jpeg',
-                    data=fp.read()
-                )
-            print(f"[API] Adjuntando evidencia: {evidencia_path}")
-        except Exception as e:
-            print(f"[API] ERROR al adjuntar imagen al email: {e}")
-    elif evidencia_path:
-        print(f"[API] ADVERTENCIA: Se esperaba evidencia pero no se encontró en {evidencia_path}")
-    thr = Thread(target=_send_async_email, args=[app, msg])
-    thr.start()
-    
 @alertas_bp.route('/api/alertas', methods=['POST'])
 def crear_alerta():
     data = request.form.to_dict() or {}
@@ -74,30 +30,16 @@ def crear_alerta():
     except (TypeError, ValueError):
         return jsonify({'error': 'Faltan campos obligatorios o tienen formato incorrecto'}), 400
     nota = data.get('nota')
-    nivel_somnolencia = data.get('nivel_somnolencia', 'bajo').lower()
+    nivel_somnolencia = (data.get('nivel_somnolencia') or 'bajo').lower()
+    if nivel_somnolencia not in NIVELES:
+        # También es etiqueta de métricas: valores libres crearían series sin límite
+        return jsonify({'error': f'nivel_somnolencia debe ser uno de: {", ".join(NIVELES)}'}), 400
     usuario = db.session.get(Usuario, id_usuario)
     vehiculo = db.session.get(Vehiculo, id_vehiculo)
     if not usuario:
         return jsonify({'error': f'El usuario ID {id_usuario} no existe'}), 404
     if not vehiculo:
         return jsonify({'error': 'El vehículo no existe'}), 404
-    evidencia_filename = None
-    evidencia_path_para_email = None
-    if 'evidencia_img' in request.files:
-        file = request.files['evidencia_img']
-        if file and file.filename != '':
-            try:
-                ext = os.path.splitext(secure_filename(file.filename))[1]
-                evidencia_filename = f"{uuid.uuid4().hex}{ext}"
-                upload_folder = current_app.config['UPLOAD_FOLDER']
-                os.makedirs(upload_folder, exist_ok=True)
-                evidencia_path_para_email = os.path.join(upload_folder, evidencia_filename)
-                file.save(evidencia_path_para_email)
-                print(f"[API] Imagen de evidencia guardada en: {evidencia_path_para_email}")
-            except Exception as e:
-                print(f"[API] ERROR al guardar la imagen: {e}")
-                evidencia_filename = None
-                evidencia_path_para_email = None
     sesion_activa = (
         db.session.query(SesionConduccion)
         .filter_by(id_usuario=id_usuario, estado='activa')
@@ -112,49 +54,173 @@ def crear_alerta():
         )
         db.session.add(sesion_activa)
         db.session.commit() 
-        print(f"[API] Nueva sesión creada automáticamente para usuario {id_usuario}")
+        cache.invalidar('sesiones', f'conductor:{id_usuario}')
+        log.info("Nueva sesión creada automáticamente para usuario %s", id_usuario)
+    ahora = datetime.now()
+    file = request.files.get('evidencia_img')
+    con_evidencia = bool(file and file.filename)
+    # Repetición de una alerta reciente de la misma sesión, nivel y nota: se suma a esa
+    # alerta en memoria y se aplica al cerrar la ventana (ver app/utils/agrupacion_alertas.py).
+    # Con foto de evidencia se inserta siempre, para no perderla.
+    id_agrupada = None if con_evidencia else \
+        agrupador_alertas.agregar(sesion_activa.id, nivel_somnolencia, nota, duracion, ahora)
+    if id_agrupada is not None:
+        alertas_recibidas.inc(nivel=nivel_somnolencia)
+        log.info("Alerta agrupada en la alerta %s (sesión %s)", id_agrupada, sesion_activa.id)
+        return jsonify({'message': 'Alerta registrada correctamente', 'agrupada_en': id_agrupada}), 201
+    evidencia_filename = None
+    evidencia_path_para_email = None
+    if con_evidencia:
+        try:
+            ext = os.path.splitext(secure_filename(file.filename))[1]
+            evidencia_filename = f"{uuid.uuid4().hex}{ext}"
+            upload_folder = current_app.config['UPLOAD_FOLDER']
+            os.makedirs(upload_folder, exist_ok=True)
+            evidencia_path_para_email = os.path.join(upload_folder, evidencia_filename)
+            file.save(evidencia_path_para_email)
+            log.debug("Imagen de evidencia guardada en: %s", evidencia_path_para_email)
+        except Exception as e:
+            log.error("Error al guardar la imagen: %s", e)
+            evidencia_filename = None
+            evidencia_path_para_email = None
     nueva_alerta = Alerta(
         id_usuario=id_usuario,
         id_vehiculo=id_vehiculo,
         id_sesion=sesion_activa.id,
-        fecha=datetime.now().date(),
-        hora=datetime.now().time(),
+        fecha=ahora.date(),
+        hora=ahora.time(),
+        timestamp=ahora,
         duracion=duracion,
+        duracion_max=duracion,
+        ultima_ocurrencia=ahora,
         nota=nota,
         nivel_somnolencia=nivel_somnolencia,
         evidencia_url=evidencia_filename
     )
     db.session.add(nueva_alerta)
+    agregados.registrar_alerta(nueva_alerta)
+    resumen_sesion.registrar_alerta(nueva_alerta)
     db.session.commit()
+    cache.invalidar('alertas', f'conductor:{id_usuario}')
+    agrupador_alertas.abrir(nueva_alerta)
+    alertas_recibidas.inc(nivel=nivel_somnolencia)
     if nueva_alerta.nivel_somnolencia == 'critico':
-        print(f"[API] Alerta CRÍTICA (ID: {nueva_alerta.id}) detectada. Preparando email...")
-        app = current_app._get_current_object() 
-        enviar_email_alerta_critica(
-            app, nueva_alerta, usuario, vehiculo, evidencia_path_para_email
-        )
-    print(f"[API] Alerta registrada correctamente (sesión {sesion_activa.id})")
+        log.info("Alerta CRÍTICA (ID: %s) detectada. Preparando email...", nueva_alerta.id)
+        # Lo envía el hilo de correo (resumen si llegan varias seguidas)
+        correo.encolar_alerta(nueva_alerta, usuario, vehiculo, evidencia_path_para_email)
+    log.info("Alerta registrada correctamente (sesión %s)", sesion_activa.id)
     return jsonify({'message': 'Alerta registrada correctamente'}), 201
 
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+def _alerta_a_dict(a):
+    return {
+        'id': a.id, 'usuario': a.id_usuario, 'vehiculo': a.id_vehiculo,
+        'sesion': a.id_sesion, 'fecha': a.fecha.strftime('%Y-%m-%d') if a.fecha else None,
+        'hora': a.hora.strftime('%H:%M:%S') if a.hora else None, 'duracion': a.duracion,
+        'nota': a.nota, 'nivel_somnolencia': a.nivel_somnolencia,
+        'evidencia_url': a.evidencia_url, 'ocurrencias': a.ocurrencias,
+        'duracion_max': a.duracion_max,
+        'ultima_ocurrencia': a.ultima_ocurrencia.isoformat(timespec='seconds') if a.ultima_ocurrencia else None
+    }
+
+def _archivada_a_dict(r):
+    return {
+        'id': r['id'], 'usuario': r['id_usuario'], 'vehiculo': r['id_vehiculo'],
+        'sesion': r['id_sesion'], 'fecha': r['timestamp'].strftime('%Y-%m-%d'),
+        'hora': r['timestamp'].strftime('%H:%M:%S'), 'duracion': r['duracion'],
+        'nota': r['nota'], 'nivel_somnolencia': r['nivel_somnolencia'],
+        'evidencia_url': r['evidencia_url'],
+        # Los meses archivados antes de la agrupación no tienen estas columnas
+        'ocurrencias': int(r.get('ocurrencias') or 1), 'duracion_max': r.get('duracion_max'),
+        'ultima_ocurrencia': r['ultima_ocurrencia'].isoformat(timespec='seconds')
+        if r.get('ultima_ocurrencia') is not None else None
+    }
+
+def _leer_filtros(args):
+    """Lee filtros del query string. Lanza ValueError si alguno es inválido."""
+    filtros = {
+        'id_usuario': args.get('id_usuario', type=int),
+        'id_vehiculo': args.get('id_vehiculo', type=int),
+        'id_sesion': args.get('id_sesion', type=int),
+        'nivel_somnolencia': (args.get('nivel') or '').lower() or None,
+    }
+    desde = args.get('desde')
+    hasta = args.get('hasta')
+    desde = datetime.fromisoformat(desde) if desde else None
+    hasta = datetime.fromisoformat(hasta) if hasta else None
+    return filtros, desde, hasta
+
 @alertas_bp.route('/api/alertas', methods=['GET'])
 def obtener_alertas():
-    # ... (tu código existente aquí, no necesita cambios) ...
-    alertas = db.session.query(Alerta).all()
-    lista = []
-    for a in alertas:
-        lista.append({
-            'id': a.id, 'usuario': a.id_usuario, 'vehiculo': a.id_vehiculo,
-            'sesion': a.id_sesion, 'fecha': a.fecha.strftime('%Y-%m-%d'),
-            'hora': a.hora.strftime('%H:%M:%S'), 'duracion': a.duracion,
-            'nota': a.nota, 'nivel_somnolencia': a.nivel_somnolencia,
-            'evidencia_url': a.evidencia_url
-        })
-    return jsonify(lista), 200
+    """
+    Lista alertas de la más nueva a la más antigua, con paginación por cursor (keyset sobre id).
+    Query params:
+      id_usuario, id_vehiculo, id_sesion, nivel, desde, hasta (ISO 8601)
+      cursor: devolver alertas con id < cursor (usar 'siguiente_cursor' de la página anterior)
+      limite: tamaño de página (máx. 1000)
+      formato=ndjson: transmite todas las alertas filtradas, una por línea, en memoria constante
+      incluir_archivo=1: continúa con las alertas archivadas en Parquet
+    """
+    try:
+        filtros, desde, hasta = _leer_filtros(request.args)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido en desde/hasta (usar ISO 8601)'}), 400
+    cursor = request.args.get('cursor', type=int)
+    limite = max(1, min(request.args.get('limite', LIMITE_POR_DEFECTO, type=int), LIMITE_MAXIMO))
+    incluir_archivo = bool(request.args.get('incluir_archivo', type=int))
+
+    query = db.session.query(Alerta)
+    for columna, valor in filtros.items():
+        if valor is not None:
+            query = query.filter(getattr(Alerta, columna) == valor)
+    if desde:
+        query = query.filter(Alerta.timestamp >= desde)
+    if hasta:
+        query = query.filter(Alerta.timestamp <= hasta)
+    if cursor:
+        query = query.filter(Alerta.id < cursor)
+    query = query.order_by(Alerta.id.desc())
+
+    def _archivadas(antes_de_id):
+        from database.particiones import leer_alertas_archivadas
+        return leer_alertas_archivadas(
+            current_app.config['ARCHIVO_ALERTAS_DIR'], desde=desde, hasta=hasta,
+            antes_de_id=antes_de_id, **filtros
+        )
+
+    if request.args.get('formato') == 'ndjson':
+        def generar():
+            ultimo_id = cursor
+            # yield_per usa un cursor del lado del servidor: no se carga la tabla completa
+            for a in query.yield_per(500):
+                ultimo_id = a.id
+                yield json.dumps(_alerta_a_dict(a), ensure_ascii=False) + '\n'
+            if incluir_archivo:
+                for r in _archivadas(ultimo_id):
+                    yield json.dumps(_archivada_a_dict(r), ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
+    lista = [_alerta_a_dict(a) for a in query.limit(limite).all()]
+    if incluir_archivo and len(lista) < limite:
+        antes_de_id = lista[-1]['id'] if lista else cursor
+        lista.extend(_archivada_a_dict(r) for r in islice(_archivadas(antes_de_id), limite - len(lista)))
+    siguiente_cursor = lista[-1]['id'] if len(lista) == limite else None
+    return jsonify({'alertas': lista, 'siguiente_cursor': siguiente_cursor}), 200
 
 # =========================================================
 # === INICIO: NUEVA RUTA PARA NOTIFICACIONES (POLLING) ===
 # =========================================================
+def _validador_nuevas():
+    # Cambia solo cuando se inserta una alerta (o cambia el punto de partida del cliente)
+    if current_user.rol != 'admin':
+        return None
+    return f"nuevas:{request.args.get('desde_id', 0, type=int)}:{cache.version('alertas')}"
+
 @alertas_bp.route('/api/alertas/nuevas', methods=['GET'])
 @login_required
+@respuesta_condicional(_validador_nuevas)
 def get_nuevas_alertas():
     # Solo los admins pueden usar este endpoint
     if current_user.rol != 'admin':
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from database.conexion import db
 from app.models import Usuario
+from app.utils.cache import cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -34,6 +35,7 @@ def registro():
 
     db.session.add(nuevo_usuario)
     db.session.commit()
+    cache.invalidar('usuarios')
 
     return jsonify({'message': 'Usuario registrado correctamente'}), 201
 
@@ -1,14 +1,20 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask import Response
+import logging
 import time
 from flask_login import login_required, current_user
 from datetime import datetime
-from sqlalchemy import func
 from database.conexion import db
-from app.models import Vehiculo, SesionConduccion, Alerta
+from app.models import Vehiculo, SesionConduccion, ResumenSesion
 from app.utils.detector_launcher import iniciar_detector, detener_detector, camera_buffer
+from app.utils import agregados, resumen_sesion
+from app.utils.cache import cache
+from app.utils.agrupacion_alertas import agrupador_alertas
+from app.utils.respuestas_http import respuesta_condicional
+from app.utils.metricas import mjpeg_espectadores
 
 conductor_bp = Blueprint('conductor', __name__)
+log = logging.getLogger(__name__)
 
 # =======PERFIL DEL CONDUCTOR==============
 @conductor_bp.route('/perfil')
@@ -79,11 +85,12 @@ def iniciar_jornada():
     )
     db.session.add(nueva)
     db.session.commit()
+    cache.invalidar('sesiones', f'conductor:{current_user.id}')
     
     try:
         iniciar_detector(current_user.id, vehiculo.id)
     except Exception as e:
-        print(f"[Detector] No se pudo iniciar: {e}")
+        log.error("No se pudo iniciar el detector: %s", e)
 
     flash(f'Jornada iniciada con el vehículo {vehiculo.codigo}.', 'success')
     return redirect(url_for('conductor.perfil_conductor'))
@@ -104,14 +111,19 @@ def finalizar_jornada():
         flash('No tienes una jornada activa.', 'warning')
         return redirect(url_for('conductor.perfil_conductor'))
 
+    # Lo que quedó agrupado en memoria entra al resumen antes de cerrarlo
+    agrupador_alertas.vaciar(sesion.id)
     sesion.fecha_fin = datetime.now()
     sesion.estado = 'finalizada'
+    agregados.registrar_sesion_finalizada(sesion)
+    resumen_sesion.cerrar_sesion(sesion)
     db.session.commit()
+    cache.invalidar('sesiones', f'conductor:{current_user.id}')
     
     try:
         detener_detector()
     except Exception as e:
-        print(f"[Detector] No se pudo detener: {e}")
+        log.error("No se pudo detener el detector: %s", e)
 
     flash('Jornada finalizada correctamente. Cámara desactivada.', 'success')
     return redirect(url_for('conductor.perfil_conductor'))
@@ -121,42 +133,66 @@ def generate_frames():
     Generador que lee desde el búfer global 'camera_buffer' 
     y transmite los frames al navegador.
     """
-    print("[Streaming] Iniciando stream para el navegador.")
-    while True:
-        time.sleep(0.05)
-        frame_bytes = camera_buffer.get_frame_bytes()
-        if not frame_bytes:
-            continue
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    log.info("Iniciando stream para el navegador.")
+    mjpeg_espectadores.inc()
+    try:
+        while True:
+            time.sleep(0.05)
+            frame_bytes = camera_buffer.get_frame_bytes()
+            if not frame_bytes:
+                continue
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    finally:
+        # El navegador cerró la conexión (GeneratorExit) o el servidor se detiene
+        mjpeg_espectadores.dec()
 
 @conductor_bp.route('/video_feed')
 @login_required
 def video_feed():
     """Ruta que sirve el video en vivo."""
+    # El stream dura lo que el navegador mire: se devuelve la conexión al pool
+    # ahora (la de login_required) en lugar de retenerla hasta el teardown.
+    db.session.remove()
     return Response(generate_frames(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 # ============HISTORIAL DE JORNADAS=================
+def _validador_historial():
+    # Solo cambia con las sesiones/alertas de este conductor (o al borrar vehículos)
+    return (f"historial:{current_user.id}:{current_user.rol}:"
+            f"{cache.version(f'conductor:{current_user.id}')}:{cache.version('vehiculos')}")
+
 @conductor_bp.route('/perfil/historial_json', methods=['GET'])
 @login_required
+@respuesta_condicional(_validador_historial)
 def historial_json():
     if current_user.rol != 'conductor':
         return jsonify({'sesiones': []})
-    sesiones = (SesionConduccion.query
-                .filter_by(id_usuario=current_user.id)
-                .order_by(SesionConduccion.id.desc())
-                .limit(50).all())
+    # Una sola consulta sobre (id_usuario, id) con el resumen precalculado
+    sesiones = (
+        db.session.query(
+            SesionConduccion.id, SesionConduccion.fecha_inicio, SesionConduccion.fecha_fin,
+            SesionConduccion.estado, Vehiculo.codigo,
+            ResumenSesion.alertas_total, ResumenSesion.segundos_somnolencia,
+            ResumenSesion.segundos_conducidos
+        )
+        .outerjoin(Vehiculo, SesionConduccion.id_vehiculo == Vehiculo.id)
+        .outerjoin(ResumenSesion, ResumenSesion.id_sesion == SesionConduccion.id)
+        .filter(SesionConduccion.id_usuario == current_user.id)
+        .order_by(SesionConduccion.id.desc())
+        .limit(50).all()
+    )
     data = []
     for s in sesiones:
-        total_alertas = db.session.query(func.count(Alerta.id))\
-            .filter(Alerta.id_sesion == s.id).scalar() or 0
         data.append({
             'id': s.id,
-            'vehiculo': s.vehiculo.codigo if s.vehiculo else '-',
+            'vehiculo': s.codigo or '-',
             'inicio': s.fecha_inicio.strftime('%d/%m/%Y %H:%M'),
             'fin': s.fecha_fin.strftime('%d/%m/%Y %H:%M') if s.fecha_fin else '—',
             'estado': s.estado,
-            'alertas': total_alertas
+            'alertas': s.alertas_total or 0,
+            'segundos_somnolencia': round(s.segundos_somnolencia or 0.0, 1),
+            'segundos_conducidos': round(s.segundos_conducidos) if s.segundos_conducidos is not None else None
         })
     return jsonify({'sesiones': data})
\ No newline at end of file
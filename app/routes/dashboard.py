@@ -1,11 +1,16 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, send_file, current_app
 from flask_login import login_required, current_user
 # Importamos todos los modelos
 from app.models import Alerta, Usuario, Vehiculo, SesionConduccion
 from database.conexion import db
 # Importamos funciones SQL avanzadas y 'request'
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, case, select, true
 from datetime import datetime, timedelta, date
+from app.utils import agregados
+from app.utils.cache import cache
+from app.utils import reporte_flota
+from app.utils.trabajos import trabajos, estado_exportacion_dict
+import os
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -13,6 +18,10 @@ dashboard_bp = Blueprint('dashboard', __name__)
 # ==========================
 # DASHBOARD PRINCIPAL (CON FILTROS DE FECHA)
 # ==========================
+RANGOS = ('todo', 'hoy', 'semana', 'mes')
+# Temas cuyos cambios invalidan el dashboard
+TEMAS_DASHBOARD = ('alertas', 'sesiones', 'usuarios', 'vehiculos')
+
 @dashboard_bp.route('/dashboard')
 @login_required
 def dashboard():
@@ -21,8 +30,26 @@ def dashboard():
         flash('Acceso denegado: solo administradores pueden ver el dashboard.', 'danger')
         return redirect(url_for('web_login.perfil_usuario'))
 
-    # === 0. LÓGICA DE FILTROS DE FECHA ===
     rango = request.args.get('rango', 'todo') # Por defecto, 'todo'
+    if rango not in RANGOS:
+        rango = 'todo'
+
+    # El resultado es el mismo para todos los admins con el mismo rango:
+    # se calcula una vez por cambio de datos (o al vencer el TTL)
+    clave = cache.clave('dashboard', rango, temas=TEMAS_DASHBOARD)
+    contexto = cache.obtener_o_calcular(clave, lambda: _calcular_dashboard(rango))
+
+    # === 6. RENDERIZAMOS TODO ===
+    return render_template(
+        'dashboard.html',
+        user=current_user, # Añadido para el saludo
+        **contexto
+    )
+
+
+def _calcular_dashboard(rango):
+    """Ejecuta las consultas del dashboard y devuelve el contexto del template (datos planos)."""
+    # === 0. LÓGICA DE FILTROS DE FECHA ===
     today = date.today()
     start_date = None
     # Usamos datetime.now() para end_date para incluir siempre la hora actual
@@ -36,91 +63,42 @@ def dashboard():
     elif rango == 'mes':
         start_date = datetime(today.year, today.month, 1) # Primer día del mes actual
 
-    # Creamos listas de filtros para aplicar a las consultas
+    # Filtro de alertas para la tabla de últimas alertas
     alerta_filter = []
-    sesion_filter = []
     
     if start_date:
-        alerta_filter = [Alerta.fecha >= start_date, Alerta.fecha <= end_date]
-        # Para sesiones, filtramos por fecha de inicio
-        # y permitimos las que terminaron en el rango O las que siguen activas
-        sesion_filter = [
-            SesionConduccion.fecha_inicio >= start_date,
-            (SesionConduccion.fecha_fin <= end_date) | (SesionConduccion.fecha_fin == None)
-        ]
+        # Rango sobre la columna indexada (sargable)
+        alerta_filter = [Alerta.timestamp >= start_date, Alerta.timestamp <= end_date]
 
 
     # === 1. MÉTRICAS DE TARJETAS (Sin filtro) ===
     # (Estas métricas suelen ser globales y no de rango)
-    total_usuarios = Usuario.query.filter(Usuario.rol != 'inactivo').count()
-    total_conductores = Usuario.query.filter_by(rol='conductor').count()
-    total_vehiculos = Vehiculo.query.count()
-    vehiculos_activos = Vehiculo.query.filter_by(estado='activo').count() 
-    sesiones_activas_count = SesionConduccion.query.filter_by(estado='activa').count() 
+    # Una sola consulta con agregados condicionales por tabla
+    tarjetas = _contar_tarjetas()
 
     
-    # === 2. GRÁFICO 1: "ALERTAS POR HORA DEL DÍA" (Corregido) ===
-    hora_col = func.extract('hour', Alerta.hora)
-    alertas_por_hora_db = (
-        db.session.query(
-            hora_col.label('hora'), 
-            func.count(Alerta.id).label('cantidad')
-        )
-        .filter(*alerta_filter) # Aplicamos el filtro de fecha
-        .group_by(hora_col)
-        .all()
-    )
+    # === 2. GRÁFICO 1: "ALERTAS POR HORA DEL DÍA" ===
+    # Se lee de agregado_alertas_hora: el costo depende de los buckets, no del historial
     horas_labels = [f"{h:02d}:00" for h in range(24)]
-    horas_data = [0] * 24
-    for h in alertas_por_hora_db:
-        if h.hora is not None:
-            horas_data[int(h.hora)] = h.cantidad
+    horas_data = agregados.alertas_por_hora_del_dia(start_date)
 
             
     # === 3. GRÁFICO 2: "TASA DE RIESGO" (Filtrado) ===
-    
-    # Subconsulta A: Total de horas conducidas (Filtrada)
-    sub_horas = (
-        db.session.query(
-            SesionConduccion.id_usuario,
-            (func.sum(
-                func.extract('epoch', func.coalesce(SesionConduccion.fecha_fin, func.now())) - 
-                func.extract('epoch', SesionConduccion.fecha_inicio)
-            ) / 3600.0).label('total_horas')
-        )
-        .filter(*sesion_filter) # Aplicamos el filtro de fecha
-        .group_by(SesionConduccion.id_usuario)
-        .subquery()
-    )
-
-    # Subconsulta B: Total de alertas (Filtrada)
-    sub_alertas = (
-        db.session.query(
-            Alerta.id_usuario,
-            func.count(Alerta.id).label('total_alertas')
-        )
-        .filter(*alerta_filter) # Aplicamos el filtro de fecha
-        .group_by(Alerta.id_usuario)
-        .subquery()
-    )
-
-    # Consulta Principal: Unimos todo
-    data_riesgo = (
-        db.session.query(
-            Usuario.nombre,
-            func.coalesce(sub_alertas.c.total_alertas, 0).label('alertas'),
-            func.coalesce(sub_horas.c.total_horas, 0.0).label('horas')
-        )
-        .outerjoin(sub_alertas, Usuario.id == sub_alertas.c.id_usuario)
-        .outerjoin(sub_horas, Usuario.id == sub_horas.c.id_usuario)
+    # Alertas y horas conducidas por conductor desde los agregados
+    alertas_usuario = agregados.alertas_por_usuario(start_date)
+    horas_usuario = agregados.horas_por_usuario(start_date, end_date)
+    conductores = (
+        db.session.query(Usuario.id, Usuario.nombre)
         .filter(Usuario.rol == 'conductor')
         .all()
     )
     
     riesgo_calculado = []
-    for d in data_riesgo:
-        tasa = (d.alertas / d.horas) if d.horas > 0 else 0
-        riesgo_calculado.append({'nombre': d.nombre, 'tasa': round(tasa, 2)})
+    for uid, nombre in conductores:
+        alertas_c = alertas_usuario.get(uid, 0)
+        horas_c = horas_usuario.get(uid, 0.0)
+        tasa = (alertas_c / horas_c) if horas_c > 0 else 0
+        riesgo_calculado.append({'nombre': nombre, 'tasa': round(tasa, 2)})
         
     top_5_riesgo = sorted(riesgo_calculado, key=lambda x: x['tasa'], reverse=True)[:5]
 
@@ -129,8 +107,9 @@ def dashboard():
     
 
     # === 4. TABLA 1: "ÚLTIMAS ALERTAS" (Filtrada) ===
-    ultimas_alertas = (
-        db.session.query(Alerta, Usuario.nombre, Vehiculo.codigo)
+    # Solo las columnas que usa el template, para poder guardarlas en caché
+    ultimas_alertas_db = (
+        db.session.query(Alerta.hora, Alerta.nivel_somnolencia, Usuario.nombre, Vehiculo.codigo)
         .join(Usuario, Alerta.id_usuario == Usuario.id, isouter=True)
         .join(Vehiculo, Alerta.id_vehiculo == Vehiculo.id, isouter=True)
         .filter(*alerta_filter) # Aplicamos el filtro de fecha
@@ -138,6 +117,10 @@ def dashboard():
         .limit(10)
         .all()
     )
+    ultimas_alertas = [
+        ({'hora': hora, 'nivel_somnolencia': nivel}, nombre, codigo)
+        for hora, nivel, nombre, codigo in ultimas_alertas_db
+    ]
 
     
     # === 5. TABLA 2: "JORNADAS ACTIVAS" (Sin filtro) ===
@@ -149,6 +132,7 @@ def dashboard():
         .order_by(SesionConduccion.fecha_inicio.desc())
         .all()
     )
+    jornadas_activas = [tuple(j) for j in jornadas_activas]
 
     # =========================================================
     # === INICIO: LÍNEA CORREGIDA PARA NOTIFICACIONES ===
@@ -159,17 +143,9 @@ def dashboard():
     # === FIN: LÍNEA CORREGIDA ===
     # =========================================================
 
-    # === 6. RENDERIZAMOS TODO ===
-    return render_template(
-        'dashboard.html',
-        user=current_user, # Añadido para el saludo
-        
+    return dict(
         # Métricas de Tarjetas
-        total_usuarios=total_usuarios,
-        total_conductores=total_conductores,
-        total_vehiculos=total_vehiculos,
-        vehiculos_activos=vehiculos_activos,
-        sesiones_activas=sesiones_activas_count,
+        **tarjetas,
         
         # Gráfico 1 (Horas)
         horas_labels=horas_labels,
@@ -191,6 +167,121 @@ def dashboard():
     )
 
 
+def _contar_tarjetas():
+    def _suma_si(condicion):
+        return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+    usuarios = select(
+        _suma_si(Usuario.rol != 'inactivo').label('total_usuarios'),
+        _suma_si(Usuario.rol == 'conductor').label('total_conductores'),
+    ).subquery()
+    vehiculos = select(
+        func.count(Vehiculo.id).label('total_vehiculos'),
+        _suma_si(Vehiculo.estado == 'activo').label('vehiculos_activos'),
+    ).subquery()
+    sesiones = select(
+        _suma_si(SesionConduccion.estado == 'activa').label('sesiones_activas'),
+    ).subquery()
+    # Cada subconsulta devuelve una fila: el join incondicional las pone lado a lado
+    desde = usuarios.join(vehiculos, true()).join(sesiones, true())
+    fila = db.session.execute(select(usuarios, vehiculos, sesiones).select_from(desde)).one()
+    return {k: int(v or 0) for k, v in fila._mapping.items()}
+
+
+# ==========================
+# REPORTE DE FLOTA (TODOS LOS CONDUCTORES Y VEHÍCULOS)
+# ==========================
+def _rango_flota():
+    """Rango pedido (desde/hasta AAAA-MM-DD). Por defecto, el mes actual hasta hoy."""
+    hoy = date.today()
+    desde = request.values.get('desde') or hoy.replace(day=1).isoformat()
+    hasta = request.values.get('hasta') or hoy.isoformat()
+    desde = datetime.strptime(desde, '%Y-%m-%d').date()
+    hasta = datetime.strptime(hasta, '%Y-%m-%d').date()
+    if hasta < desde:
+        raise ValueError('rango invertido')
+    return reporte_flota.rango_reporte(desde, hasta)
+
+def _preparar_reporte_flota():
+    desde, hasta = _rango_flota()
+    huella = reporte_flota.huella_datos(desde, hasta)
+    clave = reporte_flota.clave_reporte(desde, hasta, huella)
+    ruta = reporte_flota.ruta_reporte(current_app.config['EXPORTACIONES_DIR'], desde, hasta, clave)
+    return desde, hasta, clave, ruta
+
+@dashboard_bp.route('/dashboard/reporte_flota')
+@login_required
+def descargar_reporte_flota():
+    if current_user.rol != 'admin':
+        flash('Acceso denegado: solo administradores pueden ver el dashboard.', 'danger')
+        return redirect(url_for('web_login.perfil_usuario'))
+    try:
+        desde, hasta, clave, ruta = _preparar_reporte_flota()
+    except ValueError:
+        flash('Rango de fechas inválido (usar AAAA-MM-DD).', 'warning')
+        return redirect(url_for('dashboard.dashboard'))
+
+    # Mismo rango y mismos datos: el archivo ya generado sirve tal cual
+    if os.path.exists(ruta):
+        return send_file(
+            ruta,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=f"reporte_flota_{desde:%Y-%m-%d}_{hasta:%Y-%m-%d}.xlsx"
+        )
+    trabajos.enviar(f"reporte_flota:{clave}", 'reporte_flota', reporte_flota.generar_reporte_flota,
+                    desde, hasta, ruta)
+    flash('El reporte de flota se está generando en segundo plano. '
+          'Vuelve a presionar "Reporte de flota" en unos momentos para descargarlo.', 'info')
+    return redirect(url_for('dashboard.dashboard'))
+
+@dashboard_bp.route('/api/reportes/flota', methods=['GET', 'POST'])
+@login_required
+def api_reporte_flota():
+    """GET: datos del reporte en JSON (en caché por rango). POST: genera el Excel en segundo plano."""
+    if current_user.rol != 'admin':
+        return jsonify({"error": "No autorizado"}), 403
+    try:
+        if request.method == 'GET':
+            desde, hasta = _rango_flota()
+            datos = dict(reporte_flota.datos_reporte_flota(desde, hasta))
+            datos['desde'], datos['hasta'] = desde.date().isoformat(), hasta.date().isoformat()
+            return jsonify(datos)
+        desde, hasta, clave, ruta = _preparar_reporte_flota()
+    except ValueError:
+        return jsonify({"error": "Rango de fechas inválido (usar AAAA-MM-DD)"}), 400
+
+    if os.path.exists(ruta):
+        trabajo = trabajos.enviar(f"reporte_flota:{clave}", 'reporte_flota', lambda reportar: ruta)
+    else:
+        trabajo = trabajos.enviar(f"reporte_flota:{clave}", 'reporte_flota', reporte_flota.generar_reporte_flota,
+                                  desde, hasta, ruta)
+    respuesta = estado_exportacion_dict(trabajo)
+    respuesta['url_estado'] = url_for('admin_usuarios.estado_exportacion', id_trabajo=trabajo.id)
+    return jsonify(respuesta), 202
+
+
+# ==========================
+# INVALIDACIÓN DE CACHÉ (COMANDOS DE MANTENIMIENTO)
+# ==========================
+@dashboard_bp.route('/api/admin/cache/invalidar', methods=['POST'])
+def invalidar_cache():
+    """
+    Invalida temas de la caché de este proceso: {"temas": ["alertas", ...]}.
+    La usan los comandos de `flask` (app/comandos.py), que corren en otro proceso
+    y no ven esta caché. Sesión de admin o "Authorization: Bearer <CACHE_TOKEN>".
+    """
+    token = current_app.config.get('CACHE_TOKEN')
+    con_token = bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+    if not con_token and not (current_user.is_authenticated and current_user.rol == 'admin'):
+        return jsonify({"error": "No autorizado"}), 403
+    temas = (request.get_json(silent=True) or {}).get('temas')
+    if not isinstance(temas, list) or not temas or not all(isinstance(t, str) and t for t in temas):
+        return jsonify({"error": "temas debe ser una lista de nombres"}), 400
+    cache.invalidar(*temas)
+    return jsonify({'invalidados': temas})
+
+
 # ==========================
 # ENDPOINT: ESTADÍSTICAS POR USUARIO (Sin cambios)
 # ==========================
@@ -0,0 +1,13 @@
+from flask import Blueprint, Response, request, current_app, abort
+from app.utils.metricas import registro
+
+metricas_bp = Blueprint('metricas', __name__)
+
+# Exposición para Prometheus. Si METRICS_TOKEN está configurado se exige
+# "Authorization: Bearer <token>" (el scraper no inicia sesión).
+@metricas_bp.route('/metrics')
+def metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(registro.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
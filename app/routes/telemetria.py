@@ -0,0 +1,153 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required, current_user
+from datetime import datetime
+import json
+import logging
+import math
+import zlib
+from database.conexion import db
+from database.funciones import insert_upsert
+from app.models import TelemetriaMinuto, SesionConduccion, Usuario, Vehiculo
+from app.utils.metricas import telemetria_minutos
+
+telemetria_bp = Blueprint('telemetria', __name__)
+log = logging.getLogger(__name__)
+
+# Los de ia_module.telemetria.CAMPOS (no se importa de ahí: cargaría numpy al arrancar)
+CAMPOS = ('minuto', 'ear_media', 'ear_min', 'ear_p10', 'rostro', 'cierres', 'fps', 'cpu', 'perclos')
+ENTEROS = ('cierres',)   # el resto de los campos (salvo minuto) son Float
+LIMITE_MAXIMO = 1440   # un día de minutos
+
+
+class CuerpoInvalido(ValueError):
+    pass
+
+
+def _leer_cuerpo():
+    """JSON del cuerpo, descomprimido si viene con Content-Encoding: gzip (con tope de tamaño)."""
+    maximo = current_app.config.get('TELEMETRIA_MAX_BYTES', 1024 * 1024)
+    datos = request.get_data()
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            datos = d.decompress(datos, maximo + 1)
+        except zlib.error:
+            raise CuerpoInvalido('Cuerpo gzip inválido')
+        if d.unconsumed_tail or len(datos) > maximo:
+            raise CuerpoInvalido('Cuerpo demasiado grande')
+    elif len(datos) > maximo:
+        raise CuerpoInvalido('Cuerpo demasiado grande')
+    try:
+        return json.loads(datos)
+    except ValueError:
+        raise CuerpoInvalido('JSON inválido')
+
+
+def _numero(campo, valor):
+    """Valor de una columna numérica: None o un número finito. Lanza CuerpoInvalido."""
+    if valor is None:
+        return None
+    try:
+        if isinstance(valor, bool):
+            raise TypeError
+        numero = float(valor)
+        if not math.isfinite(numero):
+            raise ValueError
+        return int(numero) if campo in ENTEROS else numero
+    except (TypeError, ValueError):
+        raise CuerpoInvalido(f'{campo} debe ser numérico o null')
+
+
+def _filas(cuerpo, id_usuario, id_vehiculo, id_sesion):
+    campos = cuerpo.get('campos') or []
+    if 'minuto' not in campos or not set(campos) <= set(CAMPOS):
+        raise CuerpoInvalido(f'campos debe incluir minuto y solo puede tener: {", ".join(CAMPOS)}')
+    filas = cuerpo.get('filas') or []
+    if len(filas) > current_app.config.get('TELEMETRIA_MAX_MINUTOS', 240):
+        raise CuerpoInvalido('Demasiados minutos en un solo envío')
+    registros = []
+    for fila in filas:
+        if not isinstance(fila, list) or len(fila) != len(campos):
+            raise CuerpoInvalido('Cada fila debe tener un valor por campo')
+        registro = {c: v if c == 'minuto' else _numero(c, v) for c, v in zip(campos, fila)}
+        try:
+            registro['minuto'] = datetime.fromtimestamp(float(registro['minuto']))
+        except (TypeError, ValueError, OverflowError, OSError):
+            raise CuerpoInvalido('minuto debe ser un epoch en segundos')
+        registro.update(id_usuario=id_usuario, id_vehiculo=id_vehiculo, id_sesion=id_sesion)
+        registros.append(registro)
+    return registros
+
+
+@telemetria_bp.route('/api/telemetria', methods=['POST'])
+def recibir_telemetria():
+    """
+    Lote de minutos del detector en formato columnar:
+      {"id_usuario": 1, "id_vehiculo": 2, "campos": ["minuto", ...], "filas": [[1700000000, ...], ...]}
+    Se insertan todas las filas en un solo execute (executemany); los minutos
+    repetidos (reintentos del detector) se ignoran.
+    """
+    try:
+        cuerpo = _leer_cuerpo()
+        if not isinstance(cuerpo, dict):
+            raise CuerpoInvalido('Se esperaba un objeto JSON')
+        try:
+            id_usuario = int(cuerpo.get('id_usuario'))
+            id_vehiculo = int(cuerpo['id_vehiculo']) if cuerpo.get('id_vehiculo') is not None else None
+        except (TypeError, ValueError):
+            raise CuerpoInvalido('Faltan campos obligatorios o tienen formato incorrecto')
+        id_sesion = db.session.query(SesionConduccion.id) \
+            .filter_by(id_usuario=id_usuario, estado='activa').scalar()
+        registros = _filas(cuerpo, id_usuario, id_vehiculo, id_sesion)
+    except CuerpoInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    if db.session.get(Usuario, id_usuario) is None:
+        return jsonify({'error': f'El usuario ID {id_usuario} no existe'}), 404
+    if id_vehiculo is not None and db.session.get(Vehiculo, id_vehiculo) is None:
+        return jsonify({'error': 'El vehículo no existe'}), 404
+
+    if registros:
+        tabla = TelemetriaMinuto.__table__
+        stmt = insert_upsert(tabla, db.engine.dialect.name) \
+            .on_conflict_do_nothing(index_elements=['id_usuario', 'minuto'])
+        db.session.execute(stmt, registros)
+        db.session.commit()
+        telemetria_minutos.inc(len(registros))
+    log.debug("Telemetría: %s minutos del usuario %s", len(registros), id_usuario)
+    return jsonify({'recibidos': len(registros)}), 201
+
+
+@telemetria_bp.route('/api/telemetria', methods=['GET'])
+@login_required
+def obtener_telemetria():
+    """
+    Minutos de telemetría (solo admin), del más viejo al más nuevo.
+    Query params: id_usuario, id_sesion, desde, hasta (ISO 8601), limite (máx. 1440).
+    """
+    if current_user.rol != 'admin':
+        return jsonify({"error": "No autorizado"}), 403
+    try:
+        desde = request.args.get('desde')
+        hasta = request.args.get('hasta')
+        desde = datetime.fromisoformat(desde) if desde else None
+        hasta = datetime.fromisoformat(hasta) if hasta else None
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido en desde/hasta (usar ISO 8601)'}), 400
+    limite = max(1, min(request.args.get('limite', 60, type=int), LIMITE_MAXIMO))
+
+    query = db.session.query(TelemetriaMinuto)
+    for columna in ('id_usuario', 'id_sesion'):
+        valor = request.args.get(columna, type=int)
+        if valor is not None:
+            query = query.filter(getattr(TelemetriaMinuto, columna) == valor)
+    if desde:
+        query = query.filter(TelemetriaMinuto.minuto >= desde)
+    if hasta:
+        query = query.filter(TelemetriaMinuto.minuto <= hasta)
+    filas = query.order_by(TelemetriaMinuto.minuto.desc()).limit(limite).all()
+
+    return jsonify({'telemetria': [{
+        'usuario': t.id_usuario, 'vehiculo': t.id_vehiculo, 'sesion': t.id_sesion,
+        'minuto': t.minuto.isoformat(timespec='minutes'),
+        **{c: getattr(t, c) for c in CAMPOS if c != 'minuto'},
+    } for t in reversed(filas)]}), 200
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from database.conexion import db
 from app.models import Vehiculo, Usuario
+from app.utils.cache import cache
 
 vehiculos_bp = Blueprint('vehiculos', __name__)
 
@@ -35,6 +36,7 @@ def crear_vehiculo():
 
     db.session.add(nuevo)
     db.session.commit()
+    cache.invalidar('vehiculos')
 
     return jsonify({'message': 'Vehículo registrado correctamente'}), 201
 
@@ -0,0 +1,165 @@
+# app/utils/agregados.py
+"""
+Tablas de agregados (rollups) para el dashboard.
+
+- agregado_alertas_hora: +1 por cada alerta (las agrupadas suman sus ocurrencias).
+- agregado_conduccion_dia: segundos conducidos, repartidos por día, al finalizar una sesión.
+
+Las actualizaciones son upserts atómicos (INSERT ... ON CONFLICT DO UPDATE),
+válidos en PostgreSQL y SQLite. Se ejecutan dentro de la transacción de la ruta
+que llama; el commit lo hace la ruta.
+"""
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from database.conexion import db
+from database.funciones import truncar_fecha, insert_upsert
+from app.models import Alerta, SesionConduccion, AgregadoAlertasHora, AgregadoConduccionDia
+
+SIN_NIVEL = 'N/A'
+
+
+def _sumar(modelo, claves, columna, valor):
+    """UPSERT que suma `valor` a `columna` en la fila identificada por `claves`."""
+    tabla = modelo.__table__
+    stmt = insert_upsert(tabla, db.engine.dialect.name).values(**claves, **{columna: valor})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(claves.keys()),
+        set_={columna: tabla.c[columna] + stmt.excluded[columna]}
+    )
+    db.session.execute(stmt)
+
+def _hora(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+def segundos_por_dia(inicio, fin):
+    """Reparte el intervalo [inicio, fin) en (fecha, segundos) por día calendario."""
+    partes = []
+    actual = inicio
+    while actual < fin:
+        medianoche = datetime.combine(actual.date() + timedelta(days=1), datetime.min.time())
+        corte = min(medianoche, fin)
+        partes.append((actual.date(), (corte - actual).total_seconds()))
+        actual = corte
+    return partes
+
+
+# ==========================
+# ACTUALIZACIÓN INCREMENTAL
+# ==========================
+def registrar_alerta(alerta, cantidad=1):
+    """Llamar al insertar una alerta (antes del commit)."""
+    ts = alerta.timestamp or datetime.now()
+    _sumar(AgregadoAlertasHora, {
+        'bucket': _hora(ts),
+        'id_usuario': alerta.id_usuario or 0,
+        'id_vehiculo': alerta.id_vehiculo or 0,
+        'nivel_somnolencia': alerta.nivel_somnolencia or SIN_NIVEL,
+    }, 'cantidad', cantidad)
+
+def registrar_sesion_finalizada(sesion, signo=1):
+    """
+    Llamar al finalizar una sesión (con fecha_fin ya asignada).
+    Con signo=-1 revierte el aporte (sesión reactivada o eliminada).
+    """
+    if not sesion.fecha_inicio or not sesion.fecha_fin:
+        return
+    for dia, segundos in segundos_por_dia(sesion.fecha_inicio, sesion.fecha_fin):
+        _sumar(AgregadoConduccionDia, {
+            'dia': dia, 'id_usuario': sesion.id_usuario or 0,
+        }, 'segundos', signo * segundos)
+
+def revertir_sesion_finalizada(sesion):
+    registrar_sesion_finalizada(sesion, signo=-1)
+
+
+# ==========================
+# RECONSTRUCCIÓN COMPLETA
+# ==========================
+def reconstruir_agregados():
+    """Recalcula ambas tablas desde las filas crudas. Hace commit."""
+    db.session.execute(sa.delete(AgregadoAlertasHora))
+    db.session.execute(sa.delete(AgregadoConduccionDia))
+
+    bucket = truncar_fecha('hour', Alerta.timestamp)
+    seleccion = (
+        sa.select(
+            bucket,
+            sa.func.coalesce(Alerta.id_usuario, 0),
+            sa.func.coalesce(Alerta.id_vehiculo, 0),
+            sa.func.coalesce(Alerta.nivel_somnolencia, SIN_NIVEL),
+            sa.func.sum(Alerta.ocurrencias),
+        )
+        .where(Alerta.timestamp.isnot(None))
+        .group_by(
+            bucket,
+            sa.func.coalesce(Alerta.id_usuario, 0),
+            sa.func.coalesce(Alerta.id_vehiculo, 0),
+            sa.func.coalesce(Alerta.nivel_somnolencia, SIN_NIVEL),
+        )
+    )
+    db.session.execute(
+        sa.insert(AgregadoAlertasHora).from_select(
+            ['bucket', 'id_usuario', 'id_vehiculo', 'nivel_somnolencia', 'cantidad'], seleccion
+        )
+    )
+
+    # Las sesiones se reparten por día en Python; se acumula antes de escribir
+    acumulado = {}
+    sesiones = (
+        db.session.query(SesionConduccion.id_usuario, SesionConduccion.fecha_inicio, SesionConduccion.fecha_fin)
+        .filter(SesionConduccion.fecha_fin.isnot(None))
+        .yield_per(1000)
+    )
+    for id_usuario, inicio, fin in sesiones:
+        for dia, segundos in segundos_por_dia(inicio, fin):
+            clave = (dia, id_usuario or 0)
+            acumulado[clave] = acumulado.get(clave, 0.0) + segundos
+    if acumulado:
+        db.session.execute(sa.insert(AgregadoConduccionDia), [
+            {'dia': dia, 'id_usuario': uid, 'segundos': seg} for (dia, uid), seg in acumulado.items()
+        ])
+    db.session.commit()
+    return len(acumulado)
+
+
+# ==========================
+# LECTURA PARA EL DASHBOARD
+# ==========================
+def alertas_por_hora_del_dia(desde=None):
+    """Lista de 24 conteos (hora del día 0-23) desde `desde`."""
+    query = db.session.query(AgregadoAlertasHora.bucket, sa.func.sum(AgregadoAlertasHora.cantidad))
+    if desde:
+        query = query.filter(AgregadoAlertasHora.bucket >= _hora(desde))
+    horas = [0] * 24
+    for bucket, cantidad in query.group_by(AgregadoAlertasHora.bucket).all():
+        horas[bucket.hour] += int(cantidad or 0)
+    return horas
+
+def alertas_por_usuario(desde=None):
+    query = db.session.query(AgregadoAlertasHora.id_usuario, sa.func.sum(AgregadoAlertasHora.cantidad))
+    if desde:
+        query = query.filter(AgregadoAlertasHora.bucket >= _hora(desde))
+    return {uid: int(c or 0) for uid, c in query.group_by(AgregadoAlertasHora.id_usuario).all()}
+
+def horas_por_usuario(desde=None, ahora=None):
+    """
+    Horas conducidas por usuario: agregados diarios de sesiones finalizadas
+    más el tiempo transcurrido de las sesiones activas (pocas filas).
+    """
+    ahora = ahora or datetime.now()
+    query = db.session.query(AgregadoConduccionDia.id_usuario, sa.func.sum(AgregadoConduccionDia.segundos))
+    if desde:
+        query = query.filter(AgregadoConduccionDia.dia >= desde.date())
+    segundos = {uid: float(s or 0) for uid, s in query.group_by(AgregadoConduccionDia.id_usuario).all()}
+
+    activas = (
+        db.session.query(SesionConduccion.id_usuario, SesionConduccion.fecha_inicio)
+        .filter(SesionConduccion.estado == 'activa')
+        .all()
+    )
+    for uid, inicio in activas:
+        if not inicio:
+            continue
+        inicio = max(inicio, desde) if desde else inicio
+        segundos[uid] = segundos.get(uid, 0.0) + max((ahora - inicio).total_seconds(), 0.0)
+    return {uid: s / 3600.0 for uid, s in segundos.items()}
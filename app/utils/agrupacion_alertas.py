@@ -0,0 +1,180 @@
+# app/utils/agrupacion_alertas.py
+"""
+Agrupación de alertas repetidas en el servidor.
+
+Un conductor que cabecea varias veces seguidas genera una ráfaga de alertas casi
+iguales: cada una era un INSERT, una fila más en el dashboard, un aviso en el
+polling y quizá un correo. Con ALERTAS_VENTANA_AGRUPACION > 0, las alertas de la
+misma sesión, nivel y nota que llegan dentro de la ventana se fusionan en la primera:
+
+- La primera se inserta como siempre (aparece en el polling y dispara el correo).
+- Las siguientes solo se acumulan en memoria (ocurrencias, duración total y
+  máxima, hora de la última) y la petición responde sin escribir en la base.
+- Al cerrarse la ventana, un hilo aplica lo acumulado con un solo UPDATE sobre
+  la alerta, junto con los agregados por hora y el resumen de la sesión.
+
+La ventana es fija desde la primera alerta: una ráfaga larga deja un registro por
+ventana. Las alertas con evidencia (foto) no se fusionan nunca, y la nota
+separa los tipos (una obstrucción de cámara no se mezcla con somnolencia). El estado vive en el proceso (cada proceso agrupa lo que recibe); lo
+pendiente se aplica también al finalizar la sesión y al salir del proceso.
+"""
+import atexit
+import logging
+import threading
+import time
+from contextlib import nullcontext
+import sqlalchemy as sa
+from flask import has_app_context
+from app.utils.metricas import alertas_agrupadas
+
+log = logging.getLogger(__name__)
+
+REINTENTO_S = 5.0
+
+
+class Grupo:
+    """
+    Alerta abierta y lo acumulado desde su inserción. Los atributos se llaman
+    como las columnas de Alerta para pasarlo tal cual a agregados y resumen_sesion.
+    """
+    __slots__ = ('id_alerta', 'id_usuario', 'id_vehiculo', 'id_sesion', 'nivel_somnolencia', 'nota',
+                 'timestamp', 'cierre', 'ocurrencias', 'duracion', 'duracion_max', 'ultima')
+
+    def __init__(self, alerta, cierre):
+        self.id_alerta = alerta.id
+        self.id_usuario = alerta.id_usuario
+        self.id_vehiculo = alerta.id_vehiculo
+        self.id_sesion = alerta.id_sesion
+        self.nivel_somnolencia = alerta.nivel_somnolencia
+        self.nota = alerta.nota
+        self.timestamp = alerta.timestamp
+        self.cierre = cierre
+        # Solo lo pendiente de aplicar (la alerta insertada ya cuenta como 1)
+        self.ocurrencias = 0
+        self.duracion = 0.0
+        self.duracion_max = 0.0
+        self.ultima = None
+
+
+class AgrupadorAlertas:
+    def __init__(self):
+        self.app = None
+        self.ventana = 0.0
+        self._grupos = {}        # (id_sesion, nivel, nota) -> Grupo
+        self._por_aplicar = []   # grupos reemplazados o cuya aplicación falló
+        self._cambio = threading.Condition()
+        self._hilo = None
+        self._atexit = False
+
+    def init_app(self, app):
+        self.app = app
+        self.ventana = app.config.get('ALERTAS_VENTANA_AGRUPACION', 0.0)
+        if not self._atexit:
+            atexit.register(self.vaciar)
+            self._atexit = True
+
+    # === Hilo de la petición ===
+    def agregar(self, id_sesion, nivel, nota, duracion, ahora):
+        """
+        Si hay una alerta abierta de la misma sesión, nivel y nota, le suma esta y
+        devuelve su id. Si no, devuelve None: la ruta inserta la alerta y llama abrir().
+        """
+        if not self.ventana:
+            return None
+        with self._cambio:
+            grupo = self._grupos.get((id_sesion, nivel, nota))
+            if grupo is None or grupo.cierre <= time.monotonic():
+                return None
+            grupo.ocurrencias += 1
+            grupo.duracion += duracion
+            grupo.duracion_max = max(grupo.duracion_max, duracion)
+            grupo.ultima = ahora
+        alertas_agrupadas.inc(nivel=nivel)
+        return grupo.id_alerta
+
+    def abrir(self, alerta):
+        """Registra una alerta recién insertada (con id) como inicio de una ventana."""
+        if not self.ventana:
+            return
+        clave = (alerta.id_sesion, alerta.nivel_somnolencia, alerta.nota)
+        with self._cambio:
+            anterior = self._grupos.get(clave)
+            if anterior is not None and anterior.ocurrencias:
+                self._por_aplicar.append(anterior)
+            self._grupos[clave] = Grupo(alerta, time.monotonic() + self.ventana)
+            self._cambio.notify()
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, daemon=True, name='agrupacion-alertas')
+                self._hilo.start()
+
+    def vaciar(self, id_sesion=None):
+        """Aplica ya lo pendiente (de una sesión o de todas). Lo usan finalizar sesión y atexit."""
+        with self._cambio:
+            listos = self._tomar(lambda clave, g: id_sesion is None or clave[0] == id_sesion)
+        if listos:
+            self._aplicar(listos)
+
+    # === Hilo de aplicación ===
+    def _tomar(self, condicion):
+        """Saca del estado los grupos que cumplen `condicion` y devuelve los que tienen algo pendiente."""
+        listos, self._por_aplicar = self._por_aplicar, []
+        for clave, grupo in list(self._grupos.items()):
+            if condicion(clave, grupo):
+                del self._grupos[clave]
+                if grupo.ocurrencias:
+                    listos.append(grupo)
+        return listos
+
+    def _bucle(self):
+        while True:
+            with self._cambio:
+                while True:
+                    ahora = time.monotonic()
+                    listos = self._tomar(lambda clave, g: g.cierre <= ahora)
+                    if listos:
+                        break
+                    proximo = min((g.cierre for g in self._grupos.values()), default=None)
+                    self._cambio.wait(None if proximo is None else max(proximo - ahora, 0.0))
+            if not self._aplicar(listos):
+                with self._cambio:
+                    self._cambio.wait(REINTENTO_S)
+
+    def _aplicar(self, grupos):
+        from database.conexion import db
+        from app.models import Alerta
+        from app.utils import agregados, resumen_sesion
+        from app.utils.cache import cache
+
+        with nullcontext() if has_app_context() else self.app.app_context():
+            try:
+                for g in grupos:
+                    db.session.execute(
+                        sa.update(Alerta)
+                        # El timestamp acota la búsqueda a una partición en PostgreSQL
+                        .where(Alerta.id == g.id_alerta, Alerta.timestamp == g.timestamp)
+                        .values(
+                            ocurrencias=Alerta.ocurrencias + g.ocurrencias,
+                            duracion=sa.func.coalesce(Alerta.duracion, 0.0) + g.duracion,
+                            duracion_max=sa.case(
+                                (sa.func.coalesce(Alerta.duracion_max, 0.0) < g.duracion_max, g.duracion_max),
+                                else_=Alerta.duracion_max,
+                            ),
+                            ultima_ocurrencia=g.ultima,
+                        )
+                    )
+                    agregados.registrar_alerta(g, cantidad=g.ocurrencias)
+                    resumen_sesion.registrar_alerta(g, ocurrencias=g.ocurrencias)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                log.error("No se pudieron aplicar %s alertas agrupadas (se reintentará): %s", len(grupos), e)
+                with self._cambio:
+                    self._por_aplicar.extend(grupos)
+                return False
+        for id_usuario in {g.id_usuario for g in grupos}:
+            cache.invalidar('alertas', f'conductor:{id_usuario}')
+        log.debug("Aplicadas %s alertas agrupadas.", len(grupos))
+        return True
+
+
+agrupador_alertas = AgrupadorAlertas()
@@ -0,0 +1,124 @@
+# app/utils/cache.py
+"""
+Caché de respuestas con invalidación por contadores de versión.
+
+Cada "tema" (alertas, sesiones, usuarios, vehiculos) tiene un contador que las
+rutas de escritura incrementan con `cache.invalidar(...)` después del commit.
+Las claves de caché incluyen las versiones de los temas de los que dependen,
+así que un cambio vuelve inaccesibles las entradas viejas sin tener que borrarlas.
+
+El backend por defecto es un LRU en memoria con TTL. Se puede cambiar con
+CACHE_BACKEND = 'paquete.modulo.Clase' (misma interfaz que BackendMemoria).
+"""
+import threading
+import time
+from collections import OrderedDict
+from importlib import import_module
+
+
+class BackendMemoria:
+    """LRU con TTL, seguro para hilos. Los contadores de versión nunca se desalojan."""
+
+    def __init__(self, max_items=256, ttl=60):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return None
+            expira, valor = item
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, ttl=None):
+        expira = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._datos[clave] = (expira, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def contador(self, clave):
+        with self._lock:
+            return self._contadores.get(clave, 0)
+
+    def incrementar(self, clave):
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + 1
+            return self._contadores[clave]
+
+
+class Cache:
+    def __init__(self, backend=None):
+        self.backend = backend or BackendMemoria()
+        self.ttl = None
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def init_app(self, app):
+        ruta = app.config.get('CACHE_BACKEND', 'memoria')
+        max_items = app.config.get('CACHE_MAX_ITEMS', 256)
+        self.ttl = app.config.get('CACHE_TTL', 30)
+        if ruta == 'memoria':
+            self.backend = BackendMemoria(max_items=max_items, ttl=self.ttl)
+        else:
+            modulo, clase = ruta.rsplit('.', 1)
+            self.backend = getattr(import_module(modulo), clase)(max_items=max_items, ttl=self.ttl)
+
+    # === Versiones ===
+    def version(self, tema):
+        return self.backend.contador(f"v:{tema}")
+
+    def invalidar(self, *temas):
+        """Incrementa la versión de cada tema. Llamar después del commit."""
+        for tema in temas:
+            self.backend.incrementar(f"v:{tema}")
+
+    def clave(self, prefijo, *partes, temas=()):
+        versiones = ':'.join(f"{t}{self.version(t)}" for t in temas)
+        return ':'.join([prefijo, *map(str, partes), versiones])
+
+    # === Lectura / cálculo ===
+    def _lock_para(self, clave):
+        with self._locks_guard:
+            lock = self._locks.get(clave)
+            if lock is None:
+                # Limpieza simple para no acumular locks de claves viejas
+                if len(self._locks) > 1024:
+                    self._locks.clear()
+                lock = self._locks[clave] = threading.Lock()
+            return lock
+
+    def obtener_o_calcular(self, clave, calcular, ttl=None):
+        """
+        Devuelve el valor en caché o lo calcula. Si varias peticiones piden la
+        misma clave a la vez, solo una ejecuta `calcular` y las demás esperan.
+        """
+        valor = self.backend.get(clave)
+        if valor is not None:
+            return valor
+        with self._lock_para(clave):
+            valor = self.backend.get(clave)
+            if valor is None:
+                valor = calcular()
+                self.backend.set(clave, valor, ttl if ttl is not None else self.ttl)
+        return valor
+
+
+cache = Cache()
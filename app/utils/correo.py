@@ -0,0 +1,269 @@
+# app/utils/correo.py
+"""
+Envío de correos de alertas críticas con un único hilo y conexión SMTP persistente.
+
+- Cada alerta se guarda primero como JSON en CORREO_PENDIENTES_DIR y se borra
+  cuando su correo se envió: si el proceso se reinicia, los pendientes se envían
+  al arrancar.
+- El hilo mantiene abierta la conexión SMTP (Flask-Mail) y la cierra tras
+  CORREO_INACTIVIDAD segundos sin envíos; si el servidor la cortó, reconecta una vez.
+- La primera alerta sale de inmediato. Las que llegan dentro de los
+  CORREO_VENTANA_DIGEST segundos siguientes se juntan en un solo correo
+  (resumen con varias imágenes adjuntas, máx. CORREO_MAX_ALERTAS por correo).
+- Si el envío falla, los archivos quedan y se reintenta cada CORREO_REINTENTO segundos.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from app.utils.metricas import correos_enviados, correos_fallidos
+
+log = logging.getLogger(__name__)
+
+
+def _datos_alerta(alerta, usuario, vehiculo, evidencia_path):
+    return {
+        'id_alerta': alerta.id,
+        'id_usuario': usuario.id,
+        'conductor': usuario.nombre,
+        'vehiculo': vehiculo.codigo,
+        'placa': vehiculo.placa or 'N/A',
+        'fecha': alerta.fecha.strftime('%d/%m/%Y'),
+        'hora': alerta.hora.strftime('%H:%M:%S'),
+        'duracion': alerta.duracion,
+        'nota': alerta.nota or 'Alerta automática del detector.',
+        'evidencia': os.path.abspath(evidencia_path) if evidencia_path else None,
+    }
+
+def _detalle(d):
+    return f"""
+    Conductor: {d['conductor']} (ID: {d['id_usuario']})
+    Vehículo: {d['vehiculo']} (Placa: {d['placa']})
+
+    Fecha: {d['fecha']}
+    Hora: {d['hora']}
+    Duración del evento: {d['duracion']} segundos
+    Nota: {d['nota']}
+    """
+
+def construir_mensaje(alertas, remitente, destinatario):
+    """Un correo para una alerta (formato de siempre) o un resumen para varias."""
+    from flask_mail import Message
+
+    if len(alertas) == 1:
+        d = alertas[0]
+        subject = f"ALERTA CRÍTICA: Conductor {d['conductor']}"
+        body = f"""
+    Se ha detectado una alerta de somnolencia Nivel CRÍTICO.
+    Por favor, contacte al conductor de inmediato.
+
+    --- DETALLES DE LA ALERTA ---{_detalle(d)}
+    Se adjunta imagen de evidencia.
+    """
+    else:
+        conductores = sorted({d['conductor'] for d in alertas})
+        subject = f"ALERTAS CRÍTICAS: {len(alertas)} alertas ({', '.join(conductores)})"
+        bloques = "\n    ---".join(_detalle(d) for d in alertas)
+        body = f"""
+    Se han detectado {len(alertas)} alertas de somnolencia Nivel CRÍTICO en pocos minutos.
+    Por favor, contacte a los conductores de inmediato.
+
+    --- DETALLES DE LAS ALERTAS ---{bloques}
+    Se adjuntan las imágenes de evidencia disponibles.
+    """
+    msg = Message(subject, sender=remitente, recipients=[destinatario])
+    msg.body = body
+    for d in alertas:
+        ruta = d.get('evidencia')
+        if not ruta:
+            continue
+        if not os.path.exists(ruta):
+            log.warning("Se esperaba evidencia pero no se encontró en %s", ruta)
+            continue
+        try:
+            with open(ruta, 'rb') as fp:
+                msg.attach(filename=f"alerta_{d['id_alerta']}_{os.path.basename(ruta)}",
+                           content_type='image/jpeg', data=fp.read())
+        except OSError as e:
+            log.error("Error al adjuntar imagen al email: %s", e)
+    return msg
+
+
+class GestorCorreo:
+    def __init__(self):
+        self.app = None
+        self.directorio = None
+        self._cola = queue.Queue()
+        self._en_cola = set()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+        self._conexion = None
+        self._ultimo_uso = 0.0
+        self._ultimo_envio = float('-inf')
+
+    def init_app(self, app):
+        self.app = app
+        self.directorio = app.config['CORREO_PENDIENTES_DIR']
+        self.ventana = app.config.get('CORREO_VENTANA_DIGEST', 60.0)
+        self.max_alertas = app.config.get('CORREO_MAX_ALERTAS', 20)
+        self.inactividad = app.config.get('CORREO_INACTIVIDAD', 120.0)
+        self.reintento = app.config.get('CORREO_REINTENTO', 30.0)
+        self._cola = queue.Queue(maxsize=app.config.get('CORREO_MAX_COLA', 1000))
+        # Correos que quedaron sin enviar en la ejecución anterior
+        if self._pendientes_en_disco():
+            self._asegurar_hilo()
+
+    # === Encolar (hilo de la petición) ===
+    def encolar_alerta(self, alerta, usuario, vehiculo, evidencia_path=None):
+        config = self.app.config
+        if not config.get('ADMIN_EMAIL'):
+            log.error("ADMIN_EMAIL no está configurado en .env. No se puede enviar email.")
+            return None
+        if not config.get('MAIL_USERNAME'):
+            log.error("MAIL_USERNAME no está configurado en .env. No se puede enviar email.")
+            return None
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f"{time.time_ns()}_{uuid.uuid4().hex[:8]}.json")
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(_datos_alerta(alerta, usuario, vehiculo, evidencia_path), f, ensure_ascii=False)
+        os.replace(temporal, ruta)
+        self._poner(ruta)
+        self._asegurar_hilo()
+        return ruta
+
+    def _poner(self, ruta):
+        with self._lock:
+            if ruta in self._en_cola:
+                return
+            try:
+                self._cola.put_nowait(ruta)
+            except queue.Full:
+                # Queda en disco: el hilo lo toma al vaciar la cola
+                log.warning("Cola de correo llena; la alerta se enviará más tarde.")
+                return
+            self._en_cola.add(ruta)
+
+    def _pendientes_en_disco(self):
+        try:
+            nombres = os.listdir(self.directorio)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directorio, n) for n in sorted(nombres) if n.endswith('.json')]
+
+    def _asegurar_hilo(self):
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, daemon=True, name='correo')
+            self._hilo.start()
+
+    # === Hilo de envío ===
+    def _bucle(self):
+        for ruta in self._pendientes_en_disco():
+            self._poner(ruta)
+        while not self._detener.is_set():
+            try:
+                primera = self._cola.get(timeout=min(self.inactividad, 5.0))
+            except queue.Empty:
+                self._cerrar_si_inactiva()
+                for ruta in self._pendientes_en_disco():
+                    self._poner(ruta)
+                continue
+            if primera is None:   # aviso de detener()
+                continue
+            lote = [primera]
+            # En plena tormenta (hubo un envío hace menos de `ventana`) se espera
+            # al cierre de la ventana juntando las alertas que lleguen
+            limite = self._ultimo_envio + self.ventana
+            while len(lote) < self.max_alertas:
+                restante = limite - time.monotonic()
+                try:
+                    ruta = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if ruta is None:
+                    break
+                lote.append(ruta)
+            if not self._enviar_lote(lote):
+                self._detener.wait(self.reintento)
+        self._cerrar()
+
+    def _enviar_lote(self, rutas):
+        alertas, validas = [], []
+        for ruta in rutas:
+            try:
+                with open(ruta, encoding='utf-8') as f:
+                    alertas.append(json.load(f))
+                validas.append(ruta)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                log.error("Correo pendiente ilegible %s: %s", ruta, e)
+                os.replace(ruta, ruta + '.error')
+        with self._lock:
+            self._en_cola.difference_update(rutas)
+        if not alertas:
+            return True
+
+        with self.app.app_context():
+            config = self.app.config
+            msg = construir_mensaje(alertas, config.get('MAIL_USERNAME'), config.get('ADMIN_EMAIL'))
+            for intento in (1, 2):
+                try:
+                    if self._conexion is None:
+                        self._conectar()
+                    self._conexion.send(msg)
+                    break
+                except Exception as e:
+                    self._cerrar()
+                    if intento == 2:
+                        correos_fallidos.inc()
+                        log.error("Error al enviar email (%s alertas, se reintentará): %s", len(alertas), e)
+                        return False
+
+        self._ultimo_envio = self._ultimo_uso = time.monotonic()
+        correos_enviados.inc(tipo='resumen' if len(alertas) > 1 else 'individual')
+        log.info("Email de alerta enviado (%s alertas).", len(alertas))
+        for ruta in validas:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+        return True
+
+    def _conectar(self):
+        from app import mail
+        conexion = mail.connect()
+        conexion.__enter__()
+        self._conexion = conexion
+
+    def _cerrar_si_inactiva(self):
+        if self._conexion is not None and time.monotonic() - self._ultimo_uso > self.inactividad:
+            self._cerrar()
+
+    def _cerrar(self):
+        conexion, self._conexion = self._conexion, None
+        if conexion is not None:
+            try:
+                conexion.__exit__(None, None, None)
+            except Exception:
+                pass
+
+    def detener(self, timeout=5.0):
+        self._detener.set()
+        try:
+            self._cola.put_nowait(None)
+        except queue.Full:
+            pass
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join(timeout)
+
+
+correo = GestorCorreo()
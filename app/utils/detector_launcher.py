@@ -1,10 +1,22 @@
 # app/utils/detector_launcher.py
+"""
+Detector en un hilo del servidor y búfer de cámara para el stream MJPEG.
+
+cv2, numpy y requests se importan dentro de las funciones que los usan: este
+módulo se carga al registrar el blueprint del conductor y no debe encarecer el
+arranque de la app (se pagan al iniciar la primera jornada o el primer stream).
+"""
+import logging
 import os
+import tempfile
 import threading
 import time
-import requests
-import cv2
-import numpy as np
+from functools import partial
+from app.utils.metricas import (MedidorFPS, detector_inferencia, detector_ear, detector_episodios,
+                                detector_perclos, detector_parpadeos, detector_envio, detector_envio_fallos)
+
+log = logging.getLogger(__name__)
+
 class StreamingCamera:
     """
     Un búfer de cámara seguro para hilos (thread-safe).
@@ -13,19 +25,26 @@ class StreamingCamera:
     def __init__(self):
         self.frame = None
         self.lock = threading.Lock()
-        self.placeholder_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        self._reset_placeholder = self.placeholder_frame.copy()
+        self.placeholder_frame = None   # se crea en el primer uso (evita importar numpy al arrancar)
 
-    def set_frame(self, frame: np.ndarray):
+    def _placeholder(self):
+        if self.placeholder_frame is None:
+            import numpy as np
+            self.placeholder_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        return self.placeholder_frame
+
+    def set_frame(self, frame):
         """Llamado por el hilo del detector para guardar el último frame."""
         with self.lock:
             self.frame = frame.copy()
 
     def get_frame_bytes(self) -> bytes:
         """Llamado por el hilo de Flask para enviar el frame al navegador."""
+        import cv2
+
         with self.lock:
             if self.frame is None:
-                frame_to_encode = self.placeholder_frame
+                frame_to_encode = self._placeholder()
             else:
                 frame_to_encode = self.frame
         
@@ -39,19 +58,50 @@ class StreamingCamera:
         """Resetea el búfer para una nueva sesión."""
         with self.lock:
             self.frame = None
-            self.placeholder_frame = self._reset_placeholder.copy()
+            self.placeholder_frame = None
             
 camera_buffer = StreamingCamera()
 
 # Variables globales de control
 _stop_flag = threading.Event()
 _detector_thread = None
+_candado_propietario = None
+
+def _adquirir_propiedad() -> bool:
+    """
+    Candado de archivo exclusivo entre procesos (DETECTOR_LOCK): la cámara, el
+    búfer y el hilo del detector son estado de este proceso, así que solo un
+    proceso del servidor puede ser su dueño. Quien lo obtiene lo conserva hasta
+    terminar; el sistema operativo lo libera aunque el proceso muera.
+    """
+    global _candado_propietario
+    if _candado_propietario is not None:
+        return True
+    ruta = os.getenv("DETECTOR_LOCK", os.path.join(tempfile.gettempdir(), "somnolencia_detector.lock"))
+    archivo = open(ruta, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            archivo.seek(0)
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        archivo.close()
+        return False
+    _candado_propietario = archivo
+    return True
 
 # === FUNCIÓN PARA ENVIAR ALERTAS AL BACKEND ===
-def _post_alerta(server: str, id_usuario: int, id_vehiculo: int, duracion: float, frame):
+def _post_alerta(server: str, id_usuario: int, id_vehiculo: int, duracion: float, frame,
+                 nivel: str = None, nota: str = "Alerta automática del detector"):
     """
-    Envía una alerta de SOMNOLENCIA al backend.
+    Envía una alerta de SOMNOLENCIA al backend. Sin `nivel`, se deduce de la duración.
     """
+    import cv2
+    import requests
+
     url = f"{server.rstrip('/')}/api/alertas"
     
     def nivel_por_duracion(seg: float) -> str:
@@ -62,10 +112,10 @@ def _post_alerta(server: str, id_usuario: int, id_vehiculo: int, duracion: float
         else:               # > 11.0s (12s para adelante)
             return "critico"
 
-    nivel = nivel_por_duracion(duracion)
+    nivel = nivel or nivel_por_duracion(duracion)
     data = {
         "id_usuario": str(id_usuario), "id_vehiculo": str(id_vehiculo),
-        "duracion": str(round(duracion, 2)), "nota": "Alerta automática del detector",
+        "duracion": str(round(duracion, 2)), "nota": nota,
         "nivel_somnolencia": nivel
     }
     files = None
@@ -74,26 +124,34 @@ def _post_alerta(server: str, id_usuario: int, id_vehiculo: int, duracion: float
             _, buffer = cv2.imencode('.jpg', frame)
             frame_bytes = buffer.tobytes()
             files = {'evidencia_img': ('evidencia.jpg', frame_bytes, 'image/jpeg')}
-            print("[API] Alerta CRÍTICA (Somnolencia). Adjuntando imagen.")
+            log.info("Alerta CRÍTICA (somnolencia): se adjunta imagen.")
         except Exception as e:
-            print(f"[API] Error al codificar la imagen: {e}")
+            log.warning("Error al codificar la imagen: %s", e)
     elif frame is not None:
-        print("[API] Alerta BAJO/MEDIO (Somnolencia). Foto descartada.")
+        log.debug("Alerta bajo/medio (somnolencia): foto descartada.")
 
+    inicio = time.perf_counter()
     try:
         r = requests.post(url, data=data, files=files, timeout=5)
         if r.status_code >= 400:
-            print(f"[API] Error {r.status_code}: {r.text}")
+            detector_envio_fallos.inc(tipo='somnolencia')
+            log.warning("Error %s del backend: %s", r.status_code, r.text)
         else:
-            print(f"[API] Alerta (Somnolencia) enviada: {data['nivel_somnolencia']} ({data['duracion']}s)")
+            log.info("Alerta (somnolencia) enviada: %s (%ss)", data['nivel_somnolencia'], data['duracion'])
     except requests.RequestException as e:
-        print(f"[API] Error de red: {e}")
+        detector_envio_fallos.inc(tipo='somnolencia')
+        log.warning("Error de red: %s", e)
+    finally:
+        detector_envio.observar(time.perf_counter() - inicio, tipo='somnolencia')
         
 def _post_obstruction_alerta(server: str, id_usuario: int, id_vehiculo: int, duracion: float, frame):
     """
     Envía una alerta de OBSTRUCCIÓN/ANTI-TAMPER al backend.
     Siempre se trata como crítica y siempre adjunta foto.
     """
+    import cv2
+    import requests
+
     url = f"{server.rstrip('/')}/api/alertas"
     
     data = {
@@ -109,131 +167,205 @@ def _post_obstruction_alerta(server: str, id_usuario: int, id_vehiculo: int, dur
             _, buffer = cv2.imencode('.jpg', frame)
             frame_bytes = buffer.tobytes()
             files = {'evidencia_img': ('obstruccion.jpg', frame_bytes, 'image/jpeg')}
-            print("[API] Alerta CRÍTICA (Obstrucción). Adjuntando imagen.")
+            log.info("Alerta CRÍTICA (obstrucción): se adjunta imagen.")
         except Exception as e:
-            print(f"[API] Error al codificar la imagen de obstrucción: {e}")
+            log.warning("Error al codificar la imagen de obstrucción: %s", e)
     
+    inicio = time.perf_counter()
     try:
         r = requests.post(url, data=data, files=files, timeout=5)
         if r.status_code >= 400:
-            print(f"[API] Error {r.status_code}: {r.text}")
+            detector_envio_fallos.inc(tipo='obstruccion')
+            log.warning("Error %s del backend: %s", r.status_code, r.text)
         else:
-            print(f"[API] Alerta (Obstrucción) enviada.")
+            log.info("Alerta (obstrucción) enviada.")
     except requests.RequestException as e:
-        print(f"[API] Error de red: {e}")
+        detector_envio_fallos.inc(tipo='obstruccion')
+        log.warning("Error de red: %s", e)
+    finally:
+        detector_envio.observar(time.perf_counter() - inicio, tipo='obstruccion')
 
-def _detector_thread_func(id_usuario, id_vehiculo):
+def _post_telemetria(server: str, id_usuario: int, id_vehiculo: int, filas) -> bool:
     """
-    Hilo de ejecución del detector (modo headless).
+    Sube varios minutos de telemetría en un solo POST con el cuerpo JSON en gzip.
+    Devuelve False (el lote queda pendiente) solo ante errores que un reintento
+    puede resolver; un 4xx se registra y el lote se descarta.
     """
-    global camera_buffer
+    import requests
+    from ia_module.telemetria import empaquetar
+
     try:
-        from ia_module.mediapipe_detector import SomnolenceDetector, DetectorConfig
-        import cv2
-    except Exception as e:
-        print(f"[Detector] Import lazy falló (mediapipe/cv2 no disponibles): {e}")
-        return
+        r = requests.post(f"{server.rstrip('/')}/api/telemetria", data=empaquetar(id_usuario, id_vehiculo, filas),
+                          headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+                          timeout=10)
+    except requests.RequestException as e:
+        log.warning("Error de red al enviar telemetría: %s", e)
+        return False
+    if r.status_code >= 500 or r.status_code in (408, 429):
+        log.warning("Error %s del backend (telemetría): %s", r.status_code, r.text)
+        return False
+    if r.status_code >= 400:
+        # El backend rechazó el lote (usuario o vehículo inexistente, cuerpo inválido): reenviarlo no sirve
+        log.error("Telemetría rechazada (%s), se descartan %s minutos: %s", r.status_code, len(filas), r.text)
+        return True
+    log.debug("Telemetría enviada: %s minutos", len(filas))
+    return True
 
-    print(f"[Detector] Iniciando para usuario={id_usuario}, vehiculo={id_vehiculo}")
-    
-    cfg = DetectorConfig(
-        calibration_seconds=6.0, threshold_ratio=0.75,
-        min_close_seconds=1.5, draw_landmarks=False, 
-    )
-    detector = SomnolenceDetector(cfg)
+SERVIDOR_LOCAL = "http://127.0.0.1:5000"
+TRAZAS_DIR = os.getenv("DETECTOR_TRAZAS_DIR",
+                       os.path.join(os.path.dirname(__file__), '..', '..', 'archivo', 'trazas'))
 
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-    if not cap.isOpened():
-        print("[Detector] Error: no se pudo abrir la cámara.")
-        return
-    
-    try:
-        print("[Calibración] Calibrando, por favor mira a la cámara...")
-        detector.calibrate(cap) 
-        print("[Detector] Cámara activa, monitoreo iniciado.")
-    except RuntimeError as e:
-        print(f"[Detector] Error en calibración: {e}")
-        cap.release()
-        return
+def ejecutar_bucle(detector, cap, id_usuario, id_vehiculo, stop_flag, server=SERVIDOR_LOCAL, publicar=None,
+                   telemetria=None, traza=None):
+    """
+    Bucle principal del detector (ya calibrado) hasta `stop_flag` o fin del stream.
+    Cada frame se mide por etapas con `detector.perfil` (no-op si el perfilador
+    está deshabilitado). Los envíos al backend se acumulan durante la etapa de
+    estado y se hacen juntos en la etapa 'envio', para medirlos por separado.
+    La telemetría por minuto (ia_module/telemetria.py) se sube en lotes de
+    DETECTOR_TELEMETRIA_LOTE minutos; DETECTOR_TELEMETRIA=0 la desactiva.
+    La señal EAR cruda se archiva en DETECTOR_TRAZAS_DIR (ia_module/traza.py);
+    DETECTOR_TRAZA=0 la desactiva.
+    """
+    import cv2
+    from ia_module.telemetria import TelemetriaDetector
+    from ia_module.traza import GrabadorTraza, directorio_sesion
+
+    publicar = publicar or camera_buffer.set_frame
+    perfil = detector.perfil
+    fps = MedidorFPS()
+    if telemetria is None and os.getenv("DETECTOR_TELEMETRIA", "1") != "0":
+        telemetria = TelemetriaDetector(
+            partial(_post_telemetria, server, id_usuario, id_vehiculo),
+            minutos_por_lote=int(os.getenv("DETECTOR_TELEMETRIA_LOTE", "5")),
+        )
+    if traza is None and os.getenv("DETECTOR_TRAZA", "1") != "0":
+        try:
+            traza = GrabadorTraza(directorio_sesion(TRAZAS_DIR, id_usuario),
+                                  meta={'id_usuario': id_usuario, 'id_vehiculo': id_vehiculo})
+        except OSError as e:
+            log.error("No se pudo crear el directorio de trazas EAR: %s", e)
     try:
-        while not _stop_flag.is_set():
+        while not stop_flag.is_set():
+            t0 = t = perfil.inicio_frame()
             ok, frame = cap.read()
             if not ok:
-                print("[Detector] Fin de stream o error de cámara.")
+                if getattr(cap, 'reconectando', False):
+                    continue   # stream cortado: la fuente reconecta, la sesión sigue
+                log.warning("Fin de stream o error de cámara.")
                 break
-            
+            fps.frame()
+            t = perfil.etapa('captura', t)
+
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = detector.face_mesh.process(frame_rgb)
-            
+            t = perfil.etapa('color', t)
+            t_inferencia = time.perf_counter()
+            results = detector.backend.procesar(frame_rgb)
+            detector_inferencia.observar(time.perf_counter() - t_inferencia)
+            t = perfil.etapa('facemesh', t)
+
             l_ear, r_ear = detector._calc_ears(frame, results)
-            ear = (l_ear + r_ear) / 2.0 if l_ear and r_ear else None
-            
+            # Con blendshapes la apertura puede ser 0.0 (ojo cerrado del todo): no es "sin rostro"
+            ear = (l_ear + r_ear) / 2.0 if l_ear is not None and r_ear is not None else None
+            if ear is not None:
+                detector_ear.observar(ear)
+            t = perfil.etapa('ear', t)
+
             now = time.time()
-            somnoliento = False 
-            
+            if traza is not None:
+                traza.agregar(now, ear)
+            somnoliento = False
+            envios = []
+
             if ear is None and detector.state.threshold_ear is not None:
                 if detector.state.no_face_start_ts is None:
                     detector.state.no_face_start_ts = now
-                
+
                 elapsed_no_face = now - detector.state.no_face_start_ts
-                
+
                 if elapsed_no_face > 3.0:
                     detector._start_beep()
                     somnoliento = True
-                    
+
                 OBSTRUCTION_THRESHOLD_SECONDS = 60.0
                 if elapsed_no_face > OBSTRUCTION_THRESHOLD_SECONDS and detector.state.no_face_alert_sent is False:
-                    print(f"[Detector] UMBRAL DE OBSTRUCCIÓN ({OBSTRUCTION_THRESHOLD_SECONDS}s) ALCANZADO. Enviando alerta...")
+                    log.warning("Umbral de obstrucción (%ss) alcanzado. Enviando alerta...", OBSTRUCTION_THRESHOLD_SECONDS)
                     detector.state.no_face_alert_sent = True
-                    frame_alerta = frame.copy() 
-                    _post_obstruction_alerta("http://127.0.0.1:5000", id_usuario, id_vehiculo, elapsed_no_face, frame_alerta)
+                    detector_episodios.inc(tipo='obstruccion')
+                    frame_alerta = frame.copy()
+                    envios.append((_post_obstruction_alerta, elapsed_no_face, frame_alerta))
 
             elif ear is not None and detector.state.threshold_ear is not None:
-            
+
                 if detector.state.no_face_start_ts is not None:
                     detector.state.no_face_start_ts = None
                     detector.state.no_face_alert_sent = False
-                    detector._stop_beep() 
-             
+                    detector._stop_beep()
+
                 if ear < detector.state.threshold_ear:
                     if detector.state.closed_start_ts is None:
                         detector.state.closed_start_ts = now
-                else:   
+                else:
                     if detector.state.closed_start_ts is not None:
                         duracion = now - detector.state.closed_start_ts
                         if duracion >= detector.cfg.min_close_seconds and detector.state.critical_alert_sent is False:
                             detector.state.last_alert_duration = duracion
                             detector.state.total_somnolencia_time += duracion
-                        
+                            detector_episodios.inc(tipo='somnolencia')
+
                         detector.state.closed_start_ts = None
                         detector.state.critical_alert_sent = False
-                        detector._stop_beep() 
-            
+                        detector._stop_beep()
+
                 if detector.state.closed_start_ts is not None:
                     elapsed_somnolencia = now - detector.state.closed_start_ts
-                    
+
                     if elapsed_somnolencia >= detector.cfg.min_close_seconds:
                         somnoliento = True
                         detector._start_beep()
                         if detector.state.alert_start_frame is None:
-                             detector.state.alert_start_frame = frame.copy()
-                             
+                            detector.state.alert_start_frame = frame.copy()
+
                     CRITICAL_THRESHOLD_SECONDS = 11.0
                     if elapsed_somnolencia > CRITICAL_THRESHOLD_SECONDS and detector.state.critical_alert_sent is False:
-                        print(f"[Detector] UMBRAL CRÍTICO ({CRITICAL_THRESHOLD_SECONDS}s) ALCANZADO. Enviando alerta...")
-                        detector.state.critical_alert_sent = True 
+                        log.warning("Umbral crítico (%ss) alcanzado. Enviando alerta...", CRITICAL_THRESHOLD_SECONDS)
+                        detector.state.critical_alert_sent = True
+                        detector_episodios.inc(tipo='critico')
                         frame_alerta = detector.state.alert_start_frame
-                        _post_alerta("http://127.0.0.1:5000", id_usuario, id_vehiculo, elapsed_somnolencia, frame_alerta)
+                        envios.append((_post_alerta, elapsed_somnolencia, frame_alerta))
                 else:
-                    if detector.state.no_face_start_ts is None: 
+                    if detector.state.no_face_start_ts is None:
                         detector._stop_beep()
             else:
                 detector._stop_beep()
-                
+
+            if detector.state.threshold_ear is not None:
+                if detector.update_fatigue_metrics(now, ear):
+                    perclos = detector.state.perclos
+                    log.warning("PERCLOS %.0f%% en la última ventana. Enviando alerta...", perclos * 100)
+                    detector_episodios.inc(tipo='perclos')
+                    nota = (f"PERCLOS {perclos:.0%}: {detector.fatiga.segundos_cerrados:.1f}s con ojos cerrados "
+                            f"en {detector.fatiga.observado_s:.0f}s ({detector.state.blink_rate:.0f} parpadeos/min, "
+                            f"{detector.state.blink_mean_duration:.2f}s de media)")
+                    # Duración 0: los segundos cerrados de la ventana ya llegan en las alertas de
+                    # cada cierre; sumarlos de nuevo inflaría segundos_somnolencia y el episodio más largo
+                    envios.append((partial(_post_alerta, nivel="alto", nota=nota), 0.0, frame.copy()))
+                detector_perclos.set(detector.state.perclos)
+                detector_parpadeos.set(detector.state.blink_rate)
+                if telemetria is not None:
+                    telemetria.frame(now, ear, ear is not None and ear < detector.state.threshold_ear,
+                                     detector.state.perclos)
+
             alerta_result = detector.consume_alert_if_ready()
             if alerta_result:
                 duracion, frame_alerta = alerta_result
-                _post_alerta("http://127.0.0.1:5000", id_usuario, id_vehiculo, duracion, frame_alerta)
+                envios.append((_post_alerta, duracion, frame_alerta))
+            t = perfil.etapa('estado', t)
+
+            if envios:
+                for enviar, duracion, frame_alerta in envios:
+                    enviar(server, id_usuario, id_vehiculo, duracion, frame_alerta)
+                t = perfil.etapa('envio', t)
 
             if somnoliento:
                 cv2.rectangle(frame, (0, 0), (frame.shape[1], frame.shape[0]), (0, 0, 255), 10)
@@ -241,28 +373,106 @@ def _detector_thread_func(id_usuario, id_vehiculo):
                 if detector.state.no_face_start_ts is not None:
                     alert_text = ""
                 cv2.putText(frame, alert_text, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 255), 3)
-         
-            camera_buffer.set_frame(frame)
-            time.sleep(0.02) 
-            
+            if detector.fatiga.observado_s > 0:
+                cv2.putText(frame, f"PERCLOS {detector.state.perclos:.0%} | {detector.state.blink_rate:.0f} parp/min",
+                            (20, frame.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            t = perfil.etapa('overlay', t)
+
+            publicar(frame)
+            perfil.etapa('publicacion', t)
+            perfil.fin_frame(t0)
+            time.sleep(0.02)
+    finally:
+        # También ante una excepción o Ctrl+C: no se pierde el último bloque ni los minutos pendientes
+        if telemetria is not None:
+            telemetria.cerrar()   # el minuto en curso y lo que no se pudo subir
+        if traza is not None:
+            traza.cerrar()
+
+
+def _detector_thread_func(id_usuario, id_vehiculo):
+    """
+    Hilo de ejecución del detector (modo headless).
+    Con DETECTOR_PERFIL=1 se imprime el reporte por etapas al finalizar.
+    La fuente de frames se elige con DETECTOR_FUENTE (índice o /dev/videoN,
+    URL rtsp/http, ruta de video o 'sintetica'), DETECTOR_RESOLUCION,
+    DETECTOR_FPS y DETECTOR_FOURCC (ver ia_module/fuentes.py). El backend de
+    rostro, con DETECTOR_BACKEND (face_mesh o face_landmarker), DETECTOR_MODELO
+    y DETECTOR_SENAL_OJOS (ver ia_module/backends_rostro.py).
+    """
+    global camera_buffer
+    try:
+        from ia_module.mediapipe_detector import SomnolenceDetector, DetectorConfig
+        from ia_module.fuentes import crear_fuente, parsear_resolucion
     except Exception as e:
-        print(f"[Detector] Error durante ejecución: {e}")
+        log.error("Import lazy falló (mediapipe/cv2 no disponibles): %s", e)
+        return
+
+    log.info("Iniciando para usuario=%s, vehiculo=%s", id_usuario, id_vehiculo)
+    
+    cfg = DetectorConfig(
+        calibration_seconds=6.0, threshold_ratio=0.75,
+        min_close_seconds=1.5, draw_landmarks=False,
+        profile=os.getenv("DETECTOR_PERFIL", "0") == "1",
+        backend=os.getenv("DETECTOR_BACKEND", "face_mesh"),
+        eye_signal=os.getenv("DETECTOR_SENAL_OJOS", "blendshapes"),
+    )
+    if os.getenv("DETECTOR_MODELO"):
+        cfg.landmarker_model_path = os.getenv("DETECTOR_MODELO")
+    try:
+        detector = SomnolenceDetector(cfg)
+    except (ImportError, OSError, ValueError) as e:
+        log.error("No se pudo crear el backend %s: %s", cfg.backend, e)
+        return
+
+    cap = None
+    # Desde aquí el backend (grafo de MediaPipe y sus hilos) se cierra en cualquier salida
+    try:
+        ancho, alto = parsear_resolucion(os.getenv("DETECTOR_RESOLUCION", "640x480"))
+        cap = crear_fuente(os.getenv("DETECTOR_FUENTE", "0"), ancho, alto,
+                           fps=int(os.getenv("DETECTOR_FPS", "30")),
+                           fourcc=os.getenv("DETECTOR_FOURCC", "MJPG") or None)
+        if not cap.isOpened():
+            log.error("No se pudo abrir la fuente de video (%s).", cap.descripcion)
+            return
+
+        try:
+            log.info("Calibrando, por favor mira a la cámara...")
+            detector.calibrate(cap)
+            log.info("Cámara activa, monitoreo iniciado.")
+        except RuntimeError as e:
+            log.error("Error en calibración: %s", e)
+            return
+        try:
+            ejecutar_bucle(detector, cap, id_usuario, id_vehiculo, _stop_flag)
+        except Exception as e:
+            log.exception("Error durante ejecución: %s", e)
+        log.info("%s", cap.reporte())
+        log.info("Finalizado correctamente.")
     finally:
         detector._stop_beep()
-        cap.release()
-        detector.face_mesh.close()
-        print("[Detector] Finalizado correctamente.")
+        if cap is not None:
+            cap.release()
+        detector.backend.close()
+        if detector.perfil.activo:
+            detector.perfil.detener()
+            log.info("%s", detector.perfil.reporte())
 
 
 def iniciar_detector(id_usuario: int, id_vehiculo: int):
     global _detector_thread, _stop_flag, camera_buffer
 
     if os.getenv("APP_DISABLE_DETECTOR", "0") == "1":
-        print("[Detector] Deshabilitado por APP_DISABLE_DETECTOR=1 (modo tests).")
+        log.info("Deshabilitado por APP_DISABLE_DETECTOR=1 (modo tests).")
         return
 
     if _detector_thread and _detector_thread.is_alive():
-        print("[Detector] Ya hay un detector activo.")
+        log.info("Ya hay un detector activo.")
+        return
+
+    if not _adquirir_propiedad():
+        log.warning("Otro proceso del servidor es dueño de la cámara; el detector no se inicia aquí. "
+                    "Use un solo proceso (wsgi.py) o APP_DISABLE_DETECTOR=1 en los workers.")
         return
     
     camera_buffer.reset() 
@@ -272,19 +482,19 @@ def iniciar_detector(id_usuario: int, id_vehiculo: int):
         target=_detector_thread_func, args=(id_usuario, id_vehiculo), daemon=True
     )
     _detector_thread.start()
-    print("[Detector] Hilo de monitoreo iniciado.")
+    log.info("Hilo de monitoreo iniciado.")
 
 def detener_detector():
     global _detector_thread, _stop_flag
 
     if os.getenv("APP_DISABLE_DETECTOR", "0") == "1":
-        print("[Detector] Deshabilitado (modo tests). Nada que detener.")
+        log.info("Deshabilitado (modo tests). Nada que detener.")
         return
 
     if not _detector_thread or not _detector_thread.is_alive():
-        print("[Detector] No hay detector activo.")
+        log.info("No hay detector activo.")
         return
 
-    print("[Detector] Señal de parada enviada.")
+    log.info("Señal de parada enviada.")
     _stop_flag.set()
     _detector_thread.join(timeout=5)
\ No newline at end of file
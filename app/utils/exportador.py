@@ -0,0 +1,211 @@
+# app/utils/exportador.py
+"""
+Exportación del historial de un conductor en memoria constante.
+
+- Excel: openpyxl en modo write-only, alimentado por un cursor con yield_per.
+- CSV: generador línea por línea para transmitir directamente al navegador.
+
+Los archivos Excel se guardan en EXPORTACIONES_DIR con un nombre derivado del
+usuario, el rango de fechas y una huella de los datos (conteo e id máximo),
+así que un reporte repetido se sirve desde disco mientras los datos no cambien.
+Al guardar una versión nueva se borran las anteriores del mismo reporte y
+cualquier archivo del directorio más viejo que TRABAJOS_TTL, para que el disco
+no crezca sin límite.
+"""
+import csv
+import glob
+import hashlib
+import io
+import logging
+import os
+import time
+from datetime import datetime, time as dtime
+from flask import current_app
+from sqlalchemy import func
+from database.conexion import db
+from app.models import Alerta, SesionConduccion, Vehiculo
+
+ENCABEZADO_ALERTAS = ["ID", "Fecha", "Hora", "Nivel", "Duración (s)", "Nota", "ID Vehículo", "Ocurrencias"]
+LOTE = 1000
+
+log = logging.getLogger(__name__)
+
+
+def rango_desde_texto(desde, hasta):
+    """Convierte 'YYYY-MM-DD' a datetimes [desde 00:00, hasta 23:59:59]. Lanza ValueError."""
+    d = datetime.combine(datetime.strptime(desde, '%Y-%m-%d').date(), dtime.min) if desde else None
+    h = datetime.combine(datetime.strptime(hasta, '%Y-%m-%d').date(), dtime.max) if hasta else None
+    return d, h
+
+def _filtros_alertas(id_usuario, desde, hasta):
+    filtros = [Alerta.id_usuario == id_usuario]
+    if desde:
+        filtros.append(Alerta.timestamp >= desde)
+    if hasta:
+        filtros.append(Alerta.timestamp <= hasta)
+    return filtros
+
+def _filtros_sesiones(id_usuario, desde, hasta):
+    filtros = [SesionConduccion.id_usuario == id_usuario]
+    if desde:
+        filtros.append(SesionConduccion.fecha_inicio >= desde)
+    if hasta:
+        filtros.append(SesionConduccion.fecha_inicio <= hasta)
+    return filtros
+
+def huella_datos(id_usuario, desde, hasta):
+    """(total_alertas, id_max_alerta, total_sesiones, id_max_sesion): cambia si cambian los datos."""
+    # Suma de ocurrencias: también cambia cuando se aplica una alerta agrupada
+    total_alertas, max_alerta = (
+        db.session.query(func.sum(Alerta.ocurrencias), func.max(Alerta.id))
+        .filter(*_filtros_alertas(id_usuario, desde, hasta)).one()
+    )
+    total_sesiones, max_sesion = (
+        db.session.query(func.count(SesionConduccion.id), func.max(SesionConduccion.id))
+        .filter(*_filtros_sesiones(id_usuario, desde, hasta)).one()
+    )
+    return (total_alertas or 0, max_alerta or 0, total_sesiones or 0, max_sesion or 0)
+
+def clave_exportacion(id_usuario, desde, hasta, huella):
+    texto = f"{id_usuario}:{desde}:{hasta}:{huella}"
+    return hashlib.blake2s(texto.encode('utf-8'), digest_size=8).hexdigest()
+
+def _dia(valor):
+    return f"{valor:%Y%m%d}" if valor else 'todo'
+
+def ruta_exportacion(directorio, id_usuario, desde, hasta, clave):
+    return os.path.join(directorio, f"reporte_usuario_{id_usuario}_{_dia(desde)}_{_dia(hasta)}_{clave}.xlsx")
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError as e:
+        log.warning("No se pudo borrar la exportación %s: %s", ruta, e)
+
+def purgar_exportaciones(directorio, ttl):
+    """Borra los archivos del directorio sin modificar en los últimos `ttl` segundos."""
+    limite = time.time() - ttl
+    for ruta in glob.glob(os.path.join(directorio, '*.xlsx*')):
+        try:
+            viejo = os.path.getmtime(ruta) < limite
+        except OSError:
+            continue
+        if viejo:
+            _borrar(ruta)
+
+def guardar_libro(wb, ruta):
+    """
+    Guarda el libro en `ruta` (el nombre termina en _<clave>.xlsx) y borra las
+    versiones anteriores del mismo reporte y lo vencido del directorio.
+    """
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    tmp = ruta + '.tmp'
+    wb.save(tmp)
+    os.replace(tmp, ruta)
+    # Mismo reporte (usuario/flota y rango) con otra huella de datos
+    prefijo = ruta.rsplit('_', 1)[0]
+    for anterior in glob.glob(glob.escape(prefijo) + '_*.xlsx'):
+        if anterior != ruta:
+            _borrar(anterior)
+    purgar_exportaciones(directorio, current_app.config.get('TRABAJOS_TTL', 3600))
+    return ruta
+
+def _filas_alertas(id_usuario, desde, hasta):
+    query = (
+        db.session.query(Alerta.id, Alerta.fecha, Alerta.hora, Alerta.nivel_somnolencia,
+                         Alerta.duracion, Alerta.nota, Alerta.id_vehiculo, Alerta.ocurrencias)
+        .filter(*_filtros_alertas(id_usuario, desde, hasta))
+        .order_by(Alerta.timestamp.desc())
+        .yield_per(LOTE)
+    )
+    for a in query:
+        yield [
+            a.id,
+            a.fecha.strftime('%d/%m/%Y') if a.fecha else None,
+            a.hora.strftime('%H:%M:%S') if a.hora else None,
+            a.nivel_somnolencia, a.duracion, a.nota, a.id_vehiculo, a.ocurrencias,
+        ]
+
+
+# ==========================
+# EXCEL (WRITE-ONLY)
+# ==========================
+def escribir_excel_usuario(usuario, desde, hasta, ruta, reportar=None):
+    """Escribe el reporte del conductor en `ruta`. Devuelve la ruta."""
+    from openpyxl import Workbook
+
+    total_sesiones = db.session.query(func.count(SesionConduccion.id)) \
+        .filter(*_filtros_sesiones(usuario.id, desde, hasta)).scalar() or 0
+    filas_alertas, total_alertas = db.session.query(func.count(Alerta.id), func.sum(Alerta.ocurrencias)) \
+        .filter(*_filtros_alertas(usuario.id, desde, hasta)).one()
+    total_alertas = total_alertas or 0
+    nivel_counts = (
+        db.session.query(Alerta.nivel_somnolencia, func.sum(Alerta.ocurrencias))
+        .filter(*_filtros_alertas(usuario.id, desde, hasta))
+        .group_by(Alerta.nivel_somnolencia)
+        .all()
+    )
+    vehiculos_top = (
+        db.session.query(Vehiculo.codigo, func.count(SesionConduccion.id))
+        .join(SesionConduccion, Vehiculo.id == SesionConduccion.id_vehiculo)
+        .filter(*_filtros_sesiones(usuario.id, desde, hasta))
+        .group_by(Vehiculo.codigo)
+        .order_by(func.count(SesionConduccion.id).desc())
+        .all()
+    )
+    if reportar:
+        reportar(0, filas_alertas)
+
+    wb = Workbook(write_only=True)
+    # Pestaña 1: Resumen
+    ws = wb.create_sheet('Resumen')
+    ws.append(["Métrica", "Valor"])
+    ws.append(["Usuario", usuario.nombre])
+    ws.append(["Username", usuario.username])
+    ws.append(["Desde", desde.strftime('%d/%m/%Y') if desde else "Inicio"])
+    ws.append(["Hasta", hasta.strftime('%d/%m/%Y') if hasta else "Hoy"])
+    ws.append(["Total de Sesiones", total_sesiones])
+    ws.append(["Total de Alertas", total_alertas])
+    # Pestaña 2: Alertas por Nivel
+    ws = wb.create_sheet('Alertas por Nivel')
+    ws.append(['Nivel', 'Cantidad'])
+    for nivel, cantidad in nivel_counts:
+        ws.append([(nivel or 'N/A').lower(), cantidad])
+    # Pestaña 3: Vehículos Usados
+    ws = wb.create_sheet('Vehículos Usados')
+    ws.append(['Vehículo', 'Sesiones'])
+    for codigo, sesiones in vehiculos_top:
+        ws.append([codigo, sesiones])
+    # Pestaña 4: Historial de Alertas (en streaming)
+    ws = wb.create_sheet('Historial de Alertas')
+    ws.append(ENCABEZADO_ALERTAS)
+    for n, fila in enumerate(_filas_alertas(usuario.id, desde, hasta), start=1):
+        ws.append(fila)
+        if reportar and n % LOTE == 0:
+            reportar(n)
+
+    guardar_libro(wb, ruta)
+    if reportar:
+        reportar(filas_alertas)
+    return ruta
+
+
+# ==========================
+# CSV (STREAMING)
+# ==========================
+def generar_csv_usuario(id_usuario, desde, hasta):
+    """Generador de líneas CSV del historial de alertas."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def _linea(fila):
+        escritor.writerow(fila)
+        valor = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return valor
+
+    yield '\ufeff' + _linea(ENCABEZADO_ALERTAS)  # BOM para que Excel detecte UTF-8
+    for fila in _filas_alertas(id_usuario, desde, hasta):
+        yield _linea(fila)
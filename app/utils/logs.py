@@ -0,0 +1,135 @@
+# app/utils/logs.py
+"""
+Logging no bloqueante para los caminos calientes.
+
+Los hilos que registran (bucle del detector, peticiones HTTP, hilo de email) solo
+dejan el registro en una cola acotada con put_nowait; un QueueListener en su
+propio hilo lo escribe a stdout. Si la salida se traba y la cola se llena, el
+registro se descarta y se cuenta: el que registra nunca espera.
+
+Además, FiltroRepeticiones deja pasar un mismo mensaje (logger + nivel + texto
+con sus argumentos) una vez por ventana y, al reaparecer, indica cuántos se
+suprimieron. Con otros argumentos es otro evento (la alerta de otro conductor) y
+pasa siempre. Solo se aplica a los loggers del proyecto ('app', 'ia_module'),
+no a los accesos de werkzeug.
+
+Niveles: LOG_NIVEL para todo y LOG_NIVELES para módulos concretos,
+p. ej. "app.utils.detector_launcher=DEBUG,ia_module=WARNING".
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+FORMATO = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+PREFIJOS_PROPIOS = ('app', 'ia_module')
+MAX_CLAVES = 1000
+
+
+class FiltroRepeticiones(logging.Filter):
+    def __init__(self, ventana=60.0, prefijos=PREFIJOS_PROPIOS):
+        super().__init__()
+        self.ventana = ventana
+        self.prefijos = tuple(prefijos)
+        self._vistos = {}   # clave -> [inicio de la ventana, suprimidos]
+        self._lock = threading.Lock()
+
+    def _propio(self, nombre):
+        return any(nombre == p or nombre.startswith(p + '.') for p in self.prefijos)
+
+    def filter(self, record):
+        if not self.ventana or not self._propio(record.name):
+            return True
+        clave = (record.name, record.levelno, record.getMessage())
+        ahora = time.monotonic()
+        with self._lock:
+            visto = self._vistos.get(clave)
+            if visto is not None and ahora - visto[0] < self.ventana:
+                visto[1] += 1
+                return False
+            suprimidos = visto[1] if visto is not None else 0
+            if len(self._vistos) >= MAX_CLAVES:
+                self._vistos.clear()
+            self._vistos[clave] = [ahora, 0]
+        if suprimidos:
+            record.msg = f"{record.msg} (+{suprimidos} repeticiones suprimidas)"
+        return True
+
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (y cuenta) en vez de bloquear si la cola está llena."""
+
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+            from app.utils.metricas import logs_descartados
+            logs_descartados.inc()
+
+
+_manejador = None
+_listener = None
+
+
+def _leer_niveles(texto):
+    niveles = {}
+    for par in (texto or '').split(','):
+        if '=' in par:
+            nombre, nivel = par.split('=', 1)
+            niveles[nombre.strip()] = nivel.strip().upper()
+    return niveles
+
+
+def configurar_logging(nivel='INFO', niveles=None, ventana_repeticiones=60.0, cola_max=10000, stream=None):
+    """
+    Instala (una sola vez) el par QueueHandler/QueueListener en el logger raíz.
+    Llamadas siguientes solo actualizan niveles y ventana. `niveles` acepta un
+    dict {logger: nivel} o el texto "logger=NIVEL,...".
+    """
+    global _manejador, _listener
+    raiz = logging.getLogger()
+    if _manejador is None:
+        salida = logging.StreamHandler(stream or sys.stdout)
+        salida.setFormatter(logging.Formatter(FORMATO))
+        _manejador = ManejadorCola(queue.Queue(maxsize=cola_max))
+        _manejador.addFilter(FiltroRepeticiones(ventana_repeticiones))
+        _listener = logging.handlers.QueueListener(_manejador.queue, salida, respect_handler_level=True)
+        _listener.start()
+        atexit.register(detener_logging)
+        raiz.addHandler(_manejador)
+    else:
+        for filtro in _manejador.filters:
+            if isinstance(filtro, FiltroRepeticiones):
+                filtro.ventana = ventana_repeticiones
+
+    raiz.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+    if isinstance(niveles, str):
+        niveles = _leer_niveles(niveles)
+    for nombre, nivel_modulo in (niveles or {}).items():
+        logging.getLogger(nombre).setLevel(nivel_modulo)
+    return _manejador
+
+
+def detener_logging():
+    """Vacía la cola y detiene el hilo escritor (al salir del proceso)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def init_app(app):
+    configurar_logging(
+        nivel=app.config.get('LOG_NIVEL', 'INFO'),
+        niveles=app.config.get('LOG_NIVELES'),
+        ventana_repeticiones=app.config.get('LOG_VENTANA_REPETICIONES', 60.0),
+        cola_max=app.config.get('LOG_COLA_MAX', 10000),
+    )
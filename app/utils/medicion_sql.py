@@ -0,0 +1,145 @@
+# app/utils/medicion_sql.py
+"""
+Medición de SQL por petición.
+
+Con los eventos before/after_cursor_execute de SQLAlchemy se cuenta, para cada
+petición HTTP, cuántas sentencias se ejecutaron, el tiempo total en la base y las
+más lentas. Se expone así:
+
+- Cabecera Server-Timing (visible en la pestaña Network del navegador).
+- Log de consultas lentas (SQL_LENTA_MS) y de peticiones con demasiadas
+  consultas (SQL_AVISO_CONSULTAS), con las sentencias más lentas.
+- Para pruebas: `with limite_consultas(n): ...` falla si el bloque ejecuta más
+  de n sentencias, y SQL_MAX_CONSULTAS aplica el mismo límite a cada petición.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from flask import g, request, has_request_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+MAX_LENTAS = 3
+
+# Sentencias capturadas por limite_consultas() (None fuera de un bloque)
+_colector = contextvars.ContextVar('colector_sql', default=None)
+
+
+class EstadisticasSQL:
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.lentas = []   # [(segundos, sentencia)] de mayor a menor, máx. MAX_LENTAS
+
+    def registrar(self, sentencia, segundos):
+        self.consultas += 1
+        self.segundos += segundos
+        if len(self.lentas) < MAX_LENTAS or segundos > self.lentas[-1][0]:
+            self.lentas.append((segundos, sentencia))
+            self.lentas.sort(key=lambda x: x[0], reverse=True)
+            del self.lentas[MAX_LENTAS:]
+
+
+def _resumir(sentencia, largo=300):
+    sentencia = ' '.join(sentencia.split())
+    return sentencia if len(sentencia) <= largo else sentencia[:largo] + '…'
+
+
+# ==========================
+# EVENTOS DE SQLALCHEMY
+# ==========================
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    context._inicio_sql = time.perf_counter()
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_inicio_sql', None)
+    if inicio is None:
+        return
+    segundos = time.perf_counter() - inicio
+
+    colector = _colector.get()
+    if colector is not None:
+        colector.append(statement)
+
+    if not has_request_context():
+        return
+    stats = g.get('_sql')
+    if stats is None:
+        stats = g._sql = EstadisticasSQL()
+    stats.registrar(statement, segundos)
+
+    umbral = current_app.config.get('SQL_LENTA_MS')
+    if umbral is not None and segundos * 1000 >= umbral:
+        log.warning("SQL lenta: %.1f ms en %s: %s", segundos * 1000, request.endpoint, _resumir(statement))
+
+
+# ==========================
+# HOOKS DE FLASK
+# ==========================
+def _inicio_peticion():
+    g._inicio_peticion = time.perf_counter()
+    g._sql = EstadisticasSQL()
+
+def _fin_peticion(resp):
+    stats = g.get('_sql')
+    inicio = g.get('_inicio_peticion')
+    if stats is None or inicio is None:
+        return resp
+    total_ms = (time.perf_counter() - inicio) * 1000
+    db_ms = stats.segundos * 1000
+    config = current_app.config
+
+    if config.get('SQL_SERVER_TIMING', True):
+        resp.headers.add('Server-Timing', f'db;dur={db_ms:.1f};desc="{stats.consultas} consultas"')
+        resp.headers.add('Server-Timing', f'total;dur={total_ms:.1f}')
+
+    aviso = config.get('SQL_AVISO_CONSULTAS')
+    if aviso is not None and stats.consultas > aviso:
+        log.warning("%s %s: %s consultas, %.1f ms en la base", request.method, request.path, stats.consultas, db_ms)
+        for segundos, sentencia in stats.lentas:
+            log.warning("  %.1f ms: %s", segundos * 1000, _resumir(sentencia, 200))
+
+    maximo = config.get('SQL_MAX_CONSULTAS')
+    if maximo is not None and stats.consultas > maximo:
+        raise AssertionError(
+            f"{request.method} {request.path} ejecutó {stats.consultas} consultas (máximo {maximo})"
+        )
+    return resp
+
+
+def estadisticas_peticion():
+    """EstadisticasSQL de la petición en curso (o None)."""
+    return g.get('_sql') if has_request_context() else None
+
+
+@contextmanager
+def limite_consultas(maximo):
+    """
+    Para pruebas: falla si el bloque ejecuta más de `maximo` sentencias.
+    Devuelve la lista de sentencias capturadas.
+    """
+    sentencias = []
+    token = _colector.set(sentencias)
+    try:
+        yield sentencias
+    finally:
+        _colector.reset(token)
+    if len(sentencias) > maximo:
+        detalle = '\n'.join(f"  {i + 1}. {_resumir(s, 160)}" for i, s in enumerate(sentencias))
+        raise AssertionError(f"Se ejecutaron {len(sentencias)} consultas (máximo {maximo}):\n{detalle}")
+
+
+_eventos_registrados = False
+
+def init_app(app):
+    global _eventos_registrados
+    if not _eventos_registrados:
+        # A nivel de clase: cubre el engine que Flask-SQLAlchemy crea de forma perezosa
+        event.listen(Engine, 'before_cursor_execute', _antes)
+        event.listen(Engine, 'after_cursor_execute', _despues)
+        _eventos_registrados = True
+    app.before_request(_inicio_peticion)
+    app.after_request(_fin_peticion)
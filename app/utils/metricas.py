@@ -0,0 +1,299 @@
+# app/utils/metricas.py
+"""
+Métricas en formato de exposición de texto de Prometheus (GET /metrics).
+
+Implementación mínima, sin dependencias: contadores, medidores e histogramas con
+etiquetas. Cada serie guarda sus valores en una lista y se actualiza sin lock
+cuando tiene un único escritor (el hilo del detector); las métricas que se
+actualizan desde varios hilos de petición se crean con `con_lock=True`.
+La lectura (/metrics) no bloquea a los escritores: tolera ver un valor a medias
+entre dos incrementos, que se corrige en la siguiente lectura.
+"""
+import bisect
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _fmt(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor)) if abs(valor) < 1e15 else repr(valor)
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+def _escapar(valor):
+    # Formato de texto de Prometheus: \\, \" y \n dentro de los valores de etiqueta
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = list(zip(nombres, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ''
+    texto = ','.join(f'{n}="{_escapar(v)}"' for n, v in pares)
+    return '{' + texto + '}'
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=(), con_lock=False):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}
+        self._lock = threading.Lock() if con_lock else None
+
+    def _clave(self, valores):
+        if set(valores) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre}: se esperaban las etiquetas {self.etiquetas}")
+        return tuple(str(valores[e]) for e in self.etiquetas)
+
+    def _serie(self, clave):
+        serie = self._series.get(clave)
+        if serie is None:
+            # setdefault es atómico: dos hilos que crean la misma serie obtienen la misma lista
+            serie = self._series.setdefault(clave, self._nueva_serie())
+        return serie
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for clave, serie in list(self._series.items()):
+            lineas.extend(self._lineas(clave, serie))
+        return lineas
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def _nueva_serie(self):
+        return [0.0]
+
+    def inc(self, valor=1.0, **etiquetas):
+        serie = self._serie(self._clave(etiquetas))
+        if self._lock is None:
+            serie[0] += valor
+        else:
+            with self._lock:
+                serie[0] += valor
+
+    def valor(self, **etiquetas):
+        return self._series.get(self._clave(etiquetas), [0.0])[0]
+
+    def _lineas(self, clave, serie):
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_fmt(float(serie[0]))}"]
+
+
+class Medidor(_Metrica):
+    """Gauge. Con `funcion` el valor se lee al exponer (p. ej. estado del pool)."""
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), con_lock=False, funcion=None):
+        super().__init__(nombre, ayuda, etiquetas, con_lock)
+        self.funcion = funcion
+
+    def _nueva_serie(self):
+        return [0.0]
+
+    def set(self, valor, **etiquetas):
+        self._serie(self._clave(etiquetas))[0] = valor
+
+    def inc(self, valor=1.0, **etiquetas):
+        serie = self._serie(self._clave(etiquetas))
+        if self._lock is None:
+            serie[0] += valor
+        else:
+            with self._lock:
+                serie[0] += valor
+
+    def dec(self, valor=1.0, **etiquetas):
+        self.inc(-valor, **etiquetas)
+
+    def valor(self, **etiquetas):
+        return self._series.get(self._clave(etiquetas), [0.0])[0]
+
+    def exponer(self):
+        if self.funcion is not None:
+            # La función devuelve {tupla_de_etiquetas: valor}
+            try:
+                for clave, valor in self.funcion().items():
+                    self._series[tuple(map(str, clave))] = [valor]
+            except Exception as e:
+                log.warning("Error leyendo %s: %s", self.nombre, e)
+        return super().exponer()
+
+    def _lineas(self, clave, serie):
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_fmt(float(serie[0]))}"]
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), con_lock=False, buckets=BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas, con_lock)
+        self.buckets = tuple(sorted(buckets))
+
+    def _nueva_serie(self):
+        # [conteo por bucket (no acumulado)..., +Inf, suma]
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observar(self, valor, **etiquetas):
+        serie = self._serie(self._clave(etiquetas))
+        i = bisect.bisect_left(self.buckets, valor)
+        if self._lock is None:
+            serie[i] += 1
+            serie[-1] += valor
+        else:
+            with self._lock:
+                serie[i] += 1
+                serie[-1] += valor
+
+    def conteo(self, **etiquetas):
+        serie = self._series.get(self._clave(etiquetas))
+        return sum(serie[:-1]) if serie else 0
+
+    def _lineas(self, clave, serie):
+        lineas = []
+        acumulado = 0
+        for limite, n in zip(self.buckets + (float('inf'),), serie[:-1]):
+            acumulado += n
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, ('le', _fmt(float(limite))))} {acumulado}")
+        lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_fmt(float(serie[-1]))}")
+        lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}")
+        return lineas
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+
+    def _registrar(self, metrica):
+        existente = self._metricas.get(metrica.nombre)
+        if existente is not None:
+            return existente
+        self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=(), **kw):
+        return self._registrar(Contador(nombre, ayuda, etiquetas, **kw))
+
+    def medidor(self, nombre, ayuda, etiquetas=(), **kw):
+        return self._registrar(Medidor(nombre, ayuda, etiquetas, **kw))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), **kw):
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, **kw))
+
+    def exponer(self):
+        lineas = []
+        for metrica in list(self._metricas.values()):
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+
+# ==========================
+# MÉTRICAS DE LA APLICACIÓN WEB
+# ==========================
+http_duracion = registro.histograma(
+    'http_request_duration_seconds', 'Duración de las peticiones HTTP por endpoint.',
+    ('endpoint', 'method', 'status'), con_lock=True)
+alertas_recibidas = registro.contador(
+    'alertas_recibidas_total', 'Alertas registradas por POST /api/alertas, por nivel.',
+    ('nivel',), con_lock=True)
+alertas_agrupadas = registro.contador(
+    'alertas_agrupadas_total', 'Alertas fusionadas en una alerta anterior de la misma sesión y nivel.',
+    ('nivel',), con_lock=True)
+telemetria_minutos = registro.contador(
+    'telemetria_minutos_total', 'Minutos de telemetría recibidos del detector.', con_lock=True)
+mjpeg_espectadores = registro.medidor(
+    'mjpeg_viewers', 'Navegadores conectados al stream /video_feed.', con_lock=True)
+correos_enviados = registro.contador(
+    'alert_emails_sent_total', 'Correos de alertas críticas enviados (individual o resumen).', ('tipo',))
+correos_fallidos = registro.contador(
+    'alert_email_failures_total', 'Envíos de correo fallidos (se reintentan desde disco).')
+logs_descartados = registro.contador(
+    'logs_dropped_total', 'Registros de log descartados porque la cola de logging estaba llena.', con_lock=True)
+
+
+# ==========================
+# MÉTRICAS DEL DETECTOR (un solo escritor: el hilo del detector)
+# ==========================
+detector_fps = registro.medidor('detector_fps', 'Frames por segundo procesados por el detector.')
+detector_inferencia = registro.histograma(
+    'detector_inference_seconds', 'Tiempo de inferencia de MediaPipe por frame.',
+    buckets=(0.005, 0.01, 0.015, 0.02, 0.03, 0.05, 0.075, 0.1, 0.2, 0.5))
+detector_ear = registro.histograma(
+    'detector_ear', 'Distribución del EAR promedio por frame con rostro detectado.',
+    buckets=(0.05, 0.1, 0.15, 0.18, 0.2, 0.22, 0.25, 0.28, 0.3, 0.35, 0.4, 0.5))
+detector_episodios = registro.contador(
+    'detector_episodes_total', 'Episodios detectados (somnolencia, critico, perclos, obstruccion).', ('tipo',))
+detector_perclos = registro.medidor(
+    'detector_perclos', 'Fracción del último minuto con los ojos cerrados (PERCLOS).')
+detector_parpadeos = registro.medidor(
+    'detector_blinks_per_minute', 'Parpadeos por minuto en la última ventana.')
+detector_envio = registro.histograma(
+    'detector_alert_dispatch_seconds', 'Latencia del envío de alertas del detector al backend.', ('tipo',))
+detector_envio_fallos = registro.contador(
+    'detector_alert_dispatch_failures_total', 'Envíos de alertas del detector que fallaron.', ('tipo',))
+
+
+class MedidorFPS:
+    """Calcula FPS sobre ventanas de ~1 s y los publica en detector_fps."""
+
+    def __init__(self, medidor=detector_fps, ventana=1.0):
+        self.medidor = medidor
+        self.ventana = ventana
+        self._inicio = time.perf_counter()
+        self._frames = 0
+
+    def frame(self):
+        self._frames += 1
+        ahora = time.perf_counter()
+        transcurrido = ahora - self._inicio
+        if transcurrido >= self.ventana:
+            self.medidor.set(self._frames / transcurrido)
+            self._inicio = ahora
+            self._frames = 0
+
+
+# ==========================
+# INTEGRACIÓN CON FLASK
+# ==========================
+def _inicio_peticion():
+    from flask import g
+    g._inicio_metricas = time.perf_counter()
+
+def _fin_peticion(resp):
+    from flask import g, request
+    inicio = g.pop('_inicio_metricas', None)
+    if inicio is not None:
+        http_duracion.observar(time.perf_counter() - inicio, endpoint=request.endpoint or 'sin_ruta',
+                               method=request.method, status=resp.status_code)
+    return resp
+
+def _estado_pool(db):
+    def leer():
+        pool = db.engine.pool
+        valores = {}
+        for estado, metodo in (('size', 'size'), ('checked_in', 'checkedin'),
+                               ('checked_out', 'checkedout'), ('overflow', 'overflow')):
+            funcion = getattr(pool, metodo, None)
+            if funcion is not None:
+                valores[(estado,)] = float(funcion())
+        return valores
+    return leer
+
+def init_app(app):
+    from database.conexion import db
+    registro.medidor('db_pool_connections', 'Conexiones del pool de SQLAlchemy por estado.',
+                     ('state',), funcion=_estado_pool(db))
+    app.before_request(_inicio_peticion)
+    app.after_request(_fin_peticion)
@@ -0,0 +1,104 @@
+# app/utils/paginacion.py
+"""
+Paginación por cursor (keyset) y búsqueda por prefijo para los listados de admin.
+
+En lugar de OFFSET, cada página continúa desde la última fila de la anterior:
+WHERE (orden, id) > (último_valor, último_id) ORDER BY orden, id LIMIT n.
+Con un índice sobre (orden, id) el costo de cada página no depende del tamaño
+de la tabla. El cursor es opaco para el cliente (base64 de [valor, id]).
+"""
+import base64
+import json
+from datetime import datetime
+import sqlalchemy as sa
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+
+class Pagina:
+    def __init__(self, items, siguiente, orden, direccion, q, limite, es_primera):
+        self.items = items
+        self.siguiente = siguiente
+        self.orden = orden
+        self.direccion = direccion
+        self.q = q
+        self.limite = limite
+        self.es_primera = es_primera
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def codificar_cursor(valor, id_fila):
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    texto = json.dumps([valor, id_fila])
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decodificar_cursor(cursor, columna):
+    """Devuelve (valor, id). Lanza ValueError si el cursor no es válido."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valor, id_fila = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except Exception:
+        raise ValueError('cursor inválido')
+    if valor is not None and isinstance(columna.type, sa.DateTime):
+        valor = datetime.fromisoformat(valor)
+    return valor, int(id_fila)
+
+def patron_prefijo(q):
+    """Patrón LIKE 'q%' en minúsculas, escapando los comodines del usuario."""
+    q = q.strip().lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return q + '%'
+
+def filtro_prefijo(q, *columnas):
+    """OR de lower(col) LIKE 'q%' (usa los índices funcionales sobre lower(col))."""
+    patron = patron_prefijo(q)
+    return sa.or_(*[sa.func.lower(c).like(patron, escape='\\') for c in columnas])
+
+
+def paginar(query, columnas_orden, id_col, args, orden_defecto, direccion_defecto='asc'):
+    """
+    Aplica orden, cursor y límite a `query` según el query string (`args`):
+      orden: clave de `columnas_orden` (dict nombre -> columna)
+      dir:   'asc' | 'desc'
+      cursor: valor de `siguiente` de la página anterior
+      limite: 1..LIMITE_MAXIMO
+    Las filas deben ser instancias del modelo (se lee el atributo de la columna).
+    """
+    orden = args.get('orden', orden_defecto)
+    if orden not in columnas_orden:
+        orden = orden_defecto
+    direccion = args.get('dir', direccion_defecto)
+    if direccion not in ('asc', 'desc'):
+        direccion = direccion_defecto
+    limite = min(max(args.get('limite', LIMITE_POR_DEFECTO, type=int) or LIMITE_POR_DEFECTO, 1), LIMITE_MAXIMO)
+    columna = columnas_orden[orden]
+    descendente = direccion == 'desc'
+
+    cursor = args.get('cursor')
+    if cursor:
+        try:
+            valor, ultimo_id = decodificar_cursor(cursor, columna)
+        except ValueError:
+            cursor = None
+        else:
+            clave = sa.tuple_(columna, id_col)
+            query = query.filter(clave < (valor, ultimo_id) if descendente else clave > (valor, ultimo_id))
+
+    if descendente:
+        query = query.order_by(columna.desc(), id_col.desc())
+    else:
+        query = query.order_by(columna.asc(), id_col.asc())
+    # Una fila extra para saber si hay página siguiente sin hacer COUNT(*)
+    filas = query.limit(limite + 1).all()
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(getattr(ultima, columna.key), getattr(ultima, id_col.key))
+    return Pagina(filas, siguiente, orden, direccion, (args.get('q') or '').strip(), limite, not cursor)
@@ -0,0 +1,235 @@
+# app/utils/recomendaciones.py
+"""
+Recomendaciones de IA por conductor.
+
+- Las métricas del conductor se leen de las tablas de agregados (consultas baratas)
+  y forman una "foto" cuyo hash, junto con PROMPT_VERSION y el backend, es la
+  clave de caché (LRU con TTL). Si las métricas no cambiaron no se vuelve a llamar al LLM.
+- La generación corre como trabajo en segundo plano (app.utils.trabajos): la petición
+  HTTP no espera al LLM. Peticiones simultáneas para el mismo conductor y la misma
+  foto comparten un único trabajo, es decir, una sola llamada al proveedor.
+- El proveedor es intercambiable (LLM_BACKEND): 'gemini', 'local' (stub sin red,
+  útil para pruebas y para medir el flujo) o 'modulo.Clase'.
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from importlib import import_module
+import sqlalchemy as sa
+from database.conexion import db
+from app.models import SesionConduccion, AgregadoAlertasHora, AgregadoConduccionDia
+from app.utils.cache import BackendMemoria
+from app.utils.trabajos import trabajos
+
+log = logging.getLogger(__name__)
+
+# Cambiar al modificar el texto del prompt: invalida las recomendaciones en caché
+PROMPT_VERSION = 'v1'
+
+
+class ErrorLLM(Exception):
+    pass
+
+
+# ==========================
+# BACKENDS DE LLM
+# ==========================
+class BackendLLM:
+    """Interfaz: `generar(prompt) -> str`. Lanza ErrorLLM si el proveedor falla."""
+    nombre = 'base'
+
+    @classmethod
+    def desde_config(cls, config):
+        return cls()
+
+    def generar(self, prompt):
+        raise NotImplementedError
+
+
+class BackendGemini(BackendLLM):
+    """API REST de Gemini. No usa la librería de Python para evitar conflictos."""
+    nombre = 'gemini'
+
+    def __init__(self, api_key, modelo='gemini-2.5-pro-latest', timeout=20):
+        self.api_key = api_key
+        self.modelo = modelo
+        self.timeout = timeout
+
+    @classmethod
+    def desde_config(cls, config):
+        return cls(config.get('GEMINI_API_KEY'), config.get('GEMINI_MODELO', 'gemini-2.5-pro-latest'),
+                   config.get('LLM_TIMEOUT', 20))
+
+    def generar(self, prompt):
+        import requests
+
+        if not self.api_key:
+            raise ErrorLLM("GEMINI_API_KEY no está configurada en el servidor.")
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.modelo}:generateContent?key={self.api_key}"
+        data = {"contents": [{"parts": [{"text": prompt}]}]}
+        try:
+            response = requests.post(url, headers={"Content-Type": "application/json"}, json=data,
+                                     timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            log.warning("Gemini: error en la solicitud: %s", e)
+            raise ErrorLLM(f"Error al contactar la API de Gemini: {e}")
+        try:
+            return response.json()['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError, ValueError) as e:
+            log.warning("Gemini: error al parsear la respuesta: %s", e)
+            log.debug("Gemini: respuesta recibida: %s", response.text)
+            raise ErrorLLM("La API de IA devolvió una respuesta inesperada.")
+
+
+class BackendLocal(BackendLLM):
+    """Stub sin red: arma la respuesta con los datos del prompt tras `latencia` segundos."""
+    nombre = 'local'
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.llamadas = 0
+
+    @classmethod
+    def desde_config(cls, config):
+        return cls(config.get('LLM_STUB_LATENCIA', 0.0))
+
+    def generar(self, prompt):
+        self.llamadas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        datos = [l.strip() for l in prompt.splitlines() if l.strip().startswith('- ')]
+        return "\n".join([
+            "1. **Diagnóstico General:** análisis generado localmente (sin proveedor de IA).",
+            "2. **Puntos Clave de Riesgo:**",
+            *[f"   {d}" for d in datos],
+            "3. **Recomendación Accionable:** revisar las horas de mayor riesgo con el conductor.",
+        ])
+
+
+BACKENDS = {'gemini': BackendGemini, 'local': BackendLocal}
+
+
+# ==========================
+# MÉTRICAS Y PROMPT
+# ==========================
+def metricas_conductor(usuario, ahora=None):
+    """Foto de las métricas del conductor (solo tipos JSON, para poder hashearla)."""
+    ahora = ahora or datetime.now()
+    total_sesiones = db.session.query(sa.func.count(SesionConduccion.id)) \
+        .filter(SesionConduccion.id_usuario == usuario.id).scalar() or 0
+
+    niveles = dict(
+        db.session.query(AgregadoAlertasHora.nivel_somnolencia, sa.func.sum(AgregadoAlertasHora.cantidad))
+        .filter(AgregadoAlertasHora.id_usuario == usuario.id)
+        .group_by(AgregadoAlertasHora.nivel_somnolencia)
+        .all()
+    )
+    niveles = {nivel: int(c or 0) for nivel, c in sorted(niveles.items())}
+    total_alertas = sum(niveles.values())
+
+    conteo_horas = {}
+    buckets = (
+        db.session.query(AgregadoAlertasHora.bucket, sa.func.sum(AgregadoAlertasHora.cantidad))
+        .filter(AgregadoAlertasHora.id_usuario == usuario.id)
+        .group_by(AgregadoAlertasHora.bucket)
+    )
+    for bucket, cantidad in buckets:
+        conteo_horas[bucket.hour] = conteo_horas.get(bucket.hour, 0) + int(cantidad or 0)
+    top_horas = sorted(conteo_horas.items(), key=lambda x: (-x[1], x[0]))[:3]  # Top 3 horas de mayor riesgo
+
+    # Horas conducidas: sesiones finalizadas + tiempo transcurrido de la activa
+    segundos = db.session.query(sa.func.coalesce(sa.func.sum(AgregadoConduccionDia.segundos), 0.0)) \
+        .filter(AgregadoConduccionDia.id_usuario == usuario.id).scalar() or 0.0
+    for (inicio,) in db.session.query(SesionConduccion.fecha_inicio).filter(
+            SesionConduccion.id_usuario == usuario.id, SesionConduccion.estado == 'activa'):
+        if inicio:
+            segundos += max((ahora - inicio).total_seconds(), 0.0)
+    # Redondeado: una sesión activa no debe invalidar la caché a cada segundo
+    total_horas = round(segundos / 3600.0, 1)
+
+    return {
+        'nombre': usuario.nombre,
+        'total_sesiones': total_sesiones,
+        'total_alertas': total_alertas,
+        'niveles': niveles,
+        'horas_riesgo': [[h, c] for h, c in top_horas],
+        'total_horas': total_horas,
+        'tasa_riesgo': round(total_alertas / total_horas, 2) if total_horas > 0 else 0.0,
+    }
+
+def construir_prompt(m):
+    niveles_str = ", ".join(f"{c} {n}" for n, c in m['niveles'].items()) or "Ninguna"
+    horas_riesgo_str = ", ".join(f"{c} alertas a las {h:02d}:00" for h, c in m['horas_riesgo']) or "Sin patrón claro"
+    return f"""
+    Eres un analista experto en seguridad de flotas de transporte pesado.
+    Tu trabajo es analizar los datos de un conductor y generar una recomendación clara y accionable para un administrador.
+
+    Responde en español y usa Markdown para formatear tu respuesta.
+    Tu respuesta debe ser un análisis profesional en 3 secciones:
+    1.  **Diagnóstico General:** Un resumen del perfil de riesgo del conductor.
+    2.  **Puntos Clave de Riesgo:** 2 o 3 viñetas identificando los patrones peligrosos.
+    3.  **Recomendación Accionable:** 1 o 2 acciones claras que el administrador debe tomar.
+
+    Aquí están los datos del conductor '{m['nombre']}':
+
+    --- DATOS DE RENDIMIENTO ---
+    - Tasa de Riesgo (Alertas por Hora): {m['tasa_riesgo']:.2f}
+    - Total de Jornadas Conducidas: {m['total_sesiones']}
+    - Total de Alertas Acumuladas: {m['total_alertas']}
+    - Desglose de Alertas por Nivel: {niveles_str}
+    - Horas de Mayor Riesgo (Patrones): {horas_riesgo_str}
+    --- FIN DE DATOS ---
+
+    Genera el análisis.
+    """
+
+
+# ==========================
+# GESTOR (CACHÉ + TRABAJOS)
+# ==========================
+class GestorRecomendaciones:
+    def __init__(self):
+        self.backend = BackendLocal()
+        self.cache = BackendMemoria(max_items=512, ttl=86400)
+
+    def init_app(self, app):
+        ruta = app.config.get('LLM_BACKEND', 'gemini')
+        if ruta in BACKENDS:
+            clase = BACKENDS[ruta]
+        else:
+            modulo, nombre = ruta.rsplit('.', 1)
+            clase = getattr(import_module(modulo), nombre)
+        self.backend = clase.desde_config(app.config)
+        self.cache = BackendMemoria(max_items=app.config.get('RECOMENDACIONES_MAX_ITEMS', 512),
+                                    ttl=app.config.get('RECOMENDACIONES_TTL', 86400))
+
+    def clave(self, metricas):
+        texto = json.dumps({'v': PROMPT_VERSION, 'backend': self.backend.nombre, 'm': metricas}, sort_keys=True)
+        return hashlib.blake2s(texto.encode('utf-8'), digest_size=12).hexdigest()
+
+    def solicitar(self, usuario):
+        """
+        Devuelve (texto, None) si hay una recomendación vigente en caché, o
+        (None, trabajo) con el trabajo que la está generando.
+        """
+        metricas = metricas_conductor(usuario)
+        clave = self.clave(metricas)
+        texto = self.cache.get(clave)
+        if texto is not None:
+            return texto, None
+        trabajo = trabajos.enviar(f"recomendacion:{usuario.id}:{clave}", 'recomendacion',
+                                  self._generar, clave, construir_prompt(metricas))
+        return None, trabajo
+
+    def _generar(self, clave, prompt, reportar=None):
+        inicio = time.perf_counter()
+        texto = self.backend.generar(prompt)
+        log.info("Recomendación generada con '%s' en %.2fs", self.backend.nombre, time.perf_counter() - inicio)
+        self.cache.set(clave, texto)
+        return texto
+
+
+recomendaciones = GestorRecomendaciones()
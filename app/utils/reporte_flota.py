@@ -0,0 +1,212 @@
+# app/utils/reporte_flota.py
+"""
+Reporte de flota (todos los conductores y vehículos) para un rango de fechas.
+
+Se calcula con unas pocas consultas GROUP BY sobre las tablas de agregados
+(agregado_alertas_hora / agregado_conduccion_dia) y los resúmenes de sesión,
+en lugar de repetir la exportación de cada conductor. El libro Excel se
+escribe en modo write-only y se guarda en EXPORTACIONES_DIR con una huella de
+los datos del rango: un reporte mensual repetido se sirve directo desde disco
+(la versión anterior del mismo rango se borra al guardar una nueva).
+"""
+import hashlib
+import os
+from datetime import datetime, time as dtime
+import sqlalchemy as sa
+from database.conexion import db
+from app.models import (Usuario, Vehiculo, SesionConduccion, ResumenSesion,
+                        AgregadoAlertasHora, AgregadoConduccionDia)
+from app.utils.cache import cache
+from app.utils.resumen_sesion import NIVELES
+from app.utils.exportador import guardar_libro
+
+DIAS_SEMANA = ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')
+TEMAS_REPORTE = ('alertas', 'sesiones', 'usuarios', 'vehiculos')
+
+
+def rango_reporte(desde, hasta):
+    """Fechas (date) a datetimes [desde 00:00, hasta 23:59:59]."""
+    return datetime.combine(desde, dtime.min), datetime.combine(hasta, dtime.max)
+
+def _filtro_buckets(desde, hasta):
+    return [AgregadoAlertasHora.bucket >= desde, AgregadoAlertasHora.bucket <= hasta]
+
+def _filtro_sesiones(desde, hasta):
+    return [SesionConduccion.fecha_inicio >= desde, SesionConduccion.fecha_inicio <= hasta]
+
+def huella_datos(desde, hasta):
+    """Cambia si cambian las alertas, las horas o las sesiones del rango."""
+    alertas = db.session.query(sa.func.coalesce(sa.func.sum(AgregadoAlertasHora.cantidad), 0)) \
+        .filter(*_filtro_buckets(desde, hasta)).scalar()
+    segundos = db.session.query(sa.func.coalesce(sa.func.sum(AgregadoConduccionDia.segundos), 0.0)) \
+        .filter(AgregadoConduccionDia.dia >= desde.date(), AgregadoConduccionDia.dia <= hasta.date()).scalar()
+    sesiones, max_sesion = db.session.query(sa.func.count(SesionConduccion.id), sa.func.max(SesionConduccion.id)) \
+        .filter(*_filtro_sesiones(desde, hasta)).one()
+    return (int(alertas or 0), round(float(segundos or 0.0), 1), sesiones or 0, max_sesion or 0)
+
+def clave_reporte(desde, hasta, huella):
+    texto = f"flota:{desde:%Y-%m-%d}:{hasta:%Y-%m-%d}:{huella}"
+    return hashlib.blake2s(texto.encode('utf-8'), digest_size=8).hexdigest()
+
+def ruta_reporte(directorio, desde, hasta, clave):
+    return os.path.join(directorio, f"reporte_flota_{desde:%Y%m%d}_{hasta:%Y%m%d}_{clave}.xlsx")
+
+
+# ==========================
+# CÁLCULO (CONSULTAS POR CONJUNTO)
+# ==========================
+def calcular_reporte_flota(desde, hasta):
+    """Devuelve el reporte como datos planos (listas y dicts), apto para caché."""
+    # 1. Alertas por conductor y nivel
+    por_conductor = {}
+    filas = (
+        db.session.query(AgregadoAlertasHora.id_usuario, AgregadoAlertasHora.nivel_somnolencia,
+                         sa.func.sum(AgregadoAlertasHora.cantidad))
+        .filter(*_filtro_buckets(desde, hasta))
+        .group_by(AgregadoAlertasHora.id_usuario, AgregadoAlertasHora.nivel_somnolencia)
+    )
+    for uid, nivel, cantidad in filas:
+        fila = por_conductor.setdefault(uid, {n: 0 for n in NIVELES})
+        nivel = (nivel or '').lower()
+        if nivel in NIVELES:
+            fila[nivel] += int(cantidad or 0)
+
+    # 2. Horas conducidas por conductor (sesiones finalizadas)
+    horas = dict(
+        db.session.query(AgregadoConduccionDia.id_usuario, sa.func.sum(AgregadoConduccionDia.segundos) / 3600.0)
+        .filter(AgregadoConduccionDia.dia >= desde.date(), AgregadoConduccionDia.dia <= hasta.date())
+        .group_by(AgregadoConduccionDia.id_usuario)
+        .all()
+    )
+
+    # 3. Mapas de calor: día de semana x hora (flota) y conductor x hora
+    mapa_flota = [[0] * 24 for _ in DIAS_SEMANA]
+    mapa_conductor = {}
+    filas = (
+        db.session.query(AgregadoAlertasHora.bucket, AgregadoAlertasHora.id_usuario,
+                         sa.func.sum(AgregadoAlertasHora.cantidad))
+        .filter(*_filtro_buckets(desde, hasta))
+        .group_by(AgregadoAlertasHora.bucket, AgregadoAlertasHora.id_usuario)
+    )
+    for bucket, uid, cantidad in filas:
+        cantidad = int(cantidad or 0)
+        mapa_flota[bucket.weekday()][bucket.hour] += cantidad
+        mapa_conductor.setdefault(uid, [0] * 24)[bucket.hour] += cantidad
+
+    # 4. Vehículos: alertas (agregados) + sesiones y horas (resúmenes)
+    alertas_vehiculo = dict(
+        db.session.query(AgregadoAlertasHora.id_vehiculo, sa.func.sum(AgregadoAlertasHora.cantidad))
+        .filter(*_filtro_buckets(desde, hasta))
+        .group_by(AgregadoAlertasHora.id_vehiculo)
+        .all()
+    )
+    uso_vehiculo = {
+        vid: (sesiones, (segundos or 0.0) / 3600.0)
+        for vid, sesiones, segundos in (
+            db.session.query(SesionConduccion.id_vehiculo, sa.func.count(SesionConduccion.id),
+                             sa.func.sum(ResumenSesion.segundos_conducidos))
+            .outerjoin(ResumenSesion, ResumenSesion.id_sesion == SesionConduccion.id)
+            .filter(*_filtro_sesiones(desde, hasta))
+            .group_by(SesionConduccion.id_vehiculo)
+        )
+    }
+
+    # Los conductores activos más todo el que tenga actividad en el rango, aunque ya esté dado de baja
+    con_actividad = set(por_conductor) | set(horas)
+    nombres = dict(
+        db.session.query(Usuario.id, Usuario.nombre)
+        .filter(sa.or_(Usuario.rol == 'conductor', Usuario.id.in_(con_actividad)))
+        .all()
+    )
+    codigos = dict(db.session.query(Vehiculo.id, Vehiculo.codigo).all())
+
+    conductores = []
+    for uid in set(nombres) | con_actividad:
+        niveles = por_conductor.get(uid, {n: 0 for n in NIVELES})
+        total = sum(niveles.values())
+        h = float(horas.get(uid) or 0.0)
+        conductores.append({
+            'id': uid, 'nombre': nombres.get(uid, f'#{uid}'), **niveles, 'total': total,
+            'horas': round(h, 2), 'tasa': round(total / h, 2) if h > 0 else 0.0,
+            'por_hora': mapa_conductor.get(uid, [0] * 24),
+        })
+    conductores.sort(key=lambda c: (c['tasa'], c['total']), reverse=True)
+
+    vehiculos = []
+    for vid in set(alertas_vehiculo) | set(uso_vehiculo):
+        sesiones, h = uso_vehiculo.get(vid, (0, 0.0))
+        alertas = int(alertas_vehiculo.get(vid) or 0)
+        vehiculos.append({
+            'id': vid, 'codigo': codigos.get(vid, 'N/A'), 'alertas': alertas, 'sesiones': sesiones,
+            'horas': round(h, 2), 'tasa': round(alertas / h, 2) if h > 0 else 0.0,
+        })
+    vehiculos.sort(key=lambda v: (v['alertas'], v['sesiones']), reverse=True)
+
+    return {
+        'desde': desde, 'hasta': hasta,
+        'total_alertas': sum(c['total'] for c in conductores),
+        'total_horas': round(sum(c['horas'] for c in conductores), 2),
+        'total_sesiones': sum(v['sesiones'] for v in vehiculos),
+        'conductores': conductores,
+        'vehiculos': vehiculos,
+        'mapa_flota': mapa_flota,
+    }
+
+def datos_reporte_flota(desde, hasta):
+    """calcular_reporte_flota con caché por rango (se invalida con los temas de datos)."""
+    clave = cache.clave('reporte_flota', f"{desde:%Y%m%d}", f"{hasta:%Y%m%d}", temas=TEMAS_REPORTE)
+    return cache.obtener_o_calcular(clave, lambda: calcular_reporte_flota(desde, hasta))
+
+
+# ==========================
+# EXCEL (WRITE-ONLY)
+# ==========================
+def escribir_excel_flota(datos, ruta):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    # Pestaña 1: Resumen
+    ws = wb.create_sheet('Resumen')
+    ws.append(['Métrica', 'Valor'])
+    ws.append(['Desde', datos['desde'].strftime('%d/%m/%Y')])
+    ws.append(['Hasta', datos['hasta'].strftime('%d/%m/%Y')])
+    ws.append(['Conductores', len(datos['conductores'])])
+    ws.append(['Sesiones', datos['total_sesiones']])
+    ws.append(['Horas conducidas', datos['total_horas']])
+    ws.append(['Total de Alertas', datos['total_alertas']])
+    tasa = datos['total_alertas'] / datos['total_horas'] if datos['total_horas'] else 0.0
+    ws.append(['Alertas por hora', round(tasa, 2)])
+    # Pestaña 2: Conductores (alertas por nivel y tasa de riesgo)
+    ws = wb.create_sheet('Conductores')
+    ws.append(['Conductor', *[n.capitalize() for n in NIVELES], 'Total', 'Horas', 'Alertas/hora'])
+    for c in datos['conductores']:
+        ws.append([c['nombre'], *[c[n] for n in NIVELES], c['total'], c['horas'], c['tasa']])
+    # Pestaña 3: Mapa de calor de la flota (día x hora)
+    ws = wb.create_sheet('Mapa de Calor')
+    ws.append(['Día', *[f"{h:02d}:00" for h in range(24)]])
+    for dia, horas in zip(DIAS_SEMANA, datos['mapa_flota']):
+        ws.append([dia, *horas])
+    # Pestaña 4: Mapa de calor por conductor (conductor x hora)
+    ws = wb.create_sheet('Horas por Conductor')
+    ws.append(['Conductor', *[f"{h:02d}:00" for h in range(24)]])
+    for c in datos['conductores']:
+        ws.append([c['nombre'], *c['por_hora']])
+    # Pestaña 5: Vehículos
+    ws = wb.create_sheet('Vehículos')
+    ws.append(['Vehículo', 'Alertas', 'Sesiones', 'Horas', 'Alertas/hora'])
+    for v in datos['vehiculos']:
+        ws.append([v['codigo'], v['alertas'], v['sesiones'], v['horas'], v['tasa']])
+
+    return guardar_libro(wb, ruta)
+
+def generar_reporte_flota(desde, hasta, ruta, reportar=None):
+    """Función del trabajo en segundo plano. Devuelve la ruta del archivo."""
+    if reportar:
+        reportar(0, 2)
+    datos = datos_reporte_flota(desde, hasta)
+    if reportar:
+        reportar(1)
+    escribir_excel_flota(datos, ruta)
+    if reportar:
+        reportar(2)
+    return ruta
@@ -0,0 +1,73 @@
+# app/utils/respuestas_http.py
+"""
+Capa de respuestas HTTP para endpoints consultados por polling:
+
+- @respuesta_condicional(validador): calcula un ETag barato (contadores de versión
+  de app.utils.cache) ANTES de ejecutar la vista. Si coincide con If-None-Match
+  se responde 304 sin tocar la base de datos ni reenviar el cuerpo.
+- init_app(app): comprime con gzip las respuestas JSON/HTML que superan
+  COMPRESION_MIN_BYTES cuando el cliente lo acepta.
+"""
+import gzip
+import hashlib
+import uuid
+from functools import wraps
+from flask import request, make_response, current_app
+
+# Los contadores en memoria vuelven a 0 al reiniciar; el id de arranque evita
+# que un ETag anterior al reinicio coincida por casualidad con uno nuevo.
+_ARRANQUE = uuid.uuid4().hex[:8]
+
+TIPOS_COMPRIMIBLES = ('application/json', 'text/html', 'application/x-ndjson')
+
+
+def _etag(validador):
+    digest = hashlib.blake2s(validador.encode('utf-8'), digest_size=8).hexdigest()
+    return f"{_ARRANQUE}-{digest}"
+
+def respuesta_condicional(validador):
+    """
+    Decorador. `validador(*args, **kwargs)` devuelve un str que cambia cuando
+    cambia la respuesta (o None para no usar caché condicional).
+    Va debajo de @login_required.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            clave = validador(*args, **kwargs)
+            if clave is None:
+                return vista(*args, **kwargs)
+            etag = _etag(clave)
+            if request.if_none_match.contains_weak(etag):
+                resp = make_response('', 304)
+            else:
+                resp = make_response(vista(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            # Débil: la variante gzip y la sin comprimir comparten validador
+            resp.set_etag(etag, weak=True)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            return resp
+        return envoltura
+    return decorador
+
+
+def _comprimir(resp):
+    minimo = current_app.config.get('COMPRESION_MIN_BYTES', 1024)
+    if (resp.status_code != 200
+            or resp.direct_passthrough
+            or resp.is_streamed
+            or 'Content-Encoding' in resp.headers
+            or resp.mimetype not in TIPOS_COMPRIMIBLES
+            or 'gzip' not in request.accept_encodings):
+        return resp
+    cuerpo = resp.get_data()
+    if len(cuerpo) < minimo:
+        return resp
+    resp.set_data(gzip.compress(cuerpo, compresslevel=current_app.config.get('COMPRESION_NIVEL', 6)))
+    resp.headers['Content-Encoding'] = 'gzip'
+    resp.vary.add('Accept-Encoding')
+    return resp
+
+def init_app(app):
+    app.after_request(_comprimir)
@@ -0,0 +1,98 @@
+# app/utils/resumen_sesion.py
+"""
+Resumen precalculado por sesión (tabla resumen_sesiones).
+
+Se actualiza de forma incremental con cada alerta y se cierra al finalizar la
+sesión, para que historial_json y las páginas de admin no tengan que contar
+alertas ni recalcular duraciones en cada petición.
+"""
+import sqlalchemy as sa
+from database.conexion import db
+from database.funciones import insert_upsert
+from app.models import Alerta, SesionConduccion, ResumenSesion
+
+NIVELES = ('bajo', 'medio', 'alto', 'critico')
+
+
+def registrar_alerta(alerta, ocurrencias=1):
+    """
+    Suma la alerta al resumen de su sesión (antes del commit). Para una alerta
+    agrupada, `duracion` es el total y `duracion_max` el episodio más largo.
+    """
+    if not alerta.id_sesion:
+        return
+    tabla = ResumenSesion.__table__
+    duracion = float(alerta.duracion or 0.0)
+    valores = {
+        'id_sesion': alerta.id_sesion,
+        'alertas_total': ocurrencias,
+        'segundos_somnolencia': duracion,
+        'episodio_mas_largo': float(alerta.duracion_max) if alerta.duracion_max is not None else duracion,
+    }
+    nivel = (alerta.nivel_somnolencia or '').lower()
+    if nivel in NIVELES:
+        valores[f'alertas_{nivel}'] = ocurrencias
+
+    stmt = insert_upsert(tabla, db.engine.dialect.name).values(**valores)
+    actualizar = {
+        col: tabla.c[col] + stmt.excluded[col]
+        for col in valores if col not in ('id_sesion', 'episodio_mas_largo')
+    }
+    actualizar['episodio_mas_largo'] = sa.case(
+        (stmt.excluded.episodio_mas_largo > tabla.c.episodio_mas_largo, stmt.excluded.episodio_mas_largo),
+        else_=tabla.c.episodio_mas_largo,
+    )
+    db.session.execute(stmt.on_conflict_do_update(index_elements=['id_sesion'], set_=actualizar))
+
+def cerrar_sesion(sesion):
+    """Guarda los segundos conducidos al finalizar (fecha_fin ya asignada)."""
+    segundos = None
+    if sesion.fecha_inicio and sesion.fecha_fin:
+        segundos = (sesion.fecha_fin - sesion.fecha_inicio).total_seconds()
+    resumen = db.session.get(ResumenSesion, sesion.id)
+    if resumen is None:
+        resumen = ResumenSesion(id_sesion=sesion.id, alertas_total=0, alertas_bajo=0,
+                                alertas_medio=0, alertas_alto=0, alertas_critico=0,
+                                segundos_somnolencia=0.0, episodio_mas_largo=0.0)
+        db.session.add(resumen)
+    resumen.segundos_conducidos = segundos
+
+def reabrir_sesion(sesion):
+    resumen = db.session.get(ResumenSesion, sesion.id)
+    if resumen is not None:
+        resumen.segundos_conducidos = None
+
+def reconstruir_resumenes():
+    """Recalcula todos los resúmenes desde alertas y sesiones. Hace commit."""
+    db.session.execute(sa.delete(ResumenSesion))
+
+    def _conteo(nivel):
+        return sa.func.sum(sa.case((sa.func.lower(Alerta.nivel_somnolencia) == nivel, Alerta.ocurrencias), else_=0))
+
+    por_sesion = (
+        sa.select(
+            Alerta.id_sesion.label('id_sesion'),
+            sa.func.sum(Alerta.ocurrencias).label('alertas_total'),
+            *[_conteo(n).label(f'alertas_{n}') for n in NIVELES],
+            sa.func.coalesce(sa.func.sum(Alerta.duracion), 0.0).label('segundos_somnolencia'),
+            sa.func.coalesce(sa.func.max(sa.func.coalesce(Alerta.duracion_max, Alerta.duracion)), 0.0)
+            .label('episodio_mas_largo'),
+        )
+        .where(Alerta.id_sesion.isnot(None))
+        .group_by(Alerta.id_sesion)
+    )
+    filas = {f.id_sesion: dict(f._mapping) for f in db.session.execute(por_sesion)}
+
+    sesiones = db.session.query(SesionConduccion.id, SesionConduccion.fecha_inicio, SesionConduccion.fecha_fin)
+    registros = []
+    for id_sesion, inicio, fin in sesiones.yield_per(1000):
+        fila = filas.get(id_sesion) or {
+            'id_sesion': id_sesion, 'alertas_total': 0, 'segundos_somnolencia': 0.0,
+            'episodio_mas_largo': 0.0, **{f'alertas_{n}': 0 for n in NIVELES},
+        }
+        fila['segundos_conducidos'] = (fin - inicio).total_seconds() if inicio and fin else None
+        registros.append(fila)
+    if registros:
+        db.session.execute(sa.insert(ResumenSesion), registros)
+    db.session.commit()
+    return len(registros)
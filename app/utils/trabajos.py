@@ -0,0 +1,123 @@
+# app/utils/trabajos.py
+"""
+Trabajos en segundo plano (exportaciones, reportes, recomendaciones).
+
+Un pool de hilos acotado (TRABAJOS_MAX_WORKERS) ejecuta cada trabajo dentro de
+un app context. Los trabajos se identifican por una `clave`: si se pide de nuevo
+una clave que ya está en proceso (o terminada y vigente) se devuelve el mismo
+trabajo en lugar de lanzar otro.
+
+La función del trabajo recibe `reportar(progreso, total=None)` para publicar avance.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import url_for
+
+log = logging.getLogger(__name__)
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+TERMINADO = 'terminado'
+ERROR = 'error'
+
+# Trabajos cuyo resultado es un archivo descargable (incluye el reporte de flota)
+TIPOS_DESCARGABLES = ('exportacion', 'reporte_flota')
+
+
+class Trabajo:
+    def __init__(self, clave, tipo):
+        self.id = uuid.uuid4().hex
+        self.clave = clave
+        self.tipo = tipo
+        self.estado = PENDIENTE
+        self.progreso = 0
+        self.total = None
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.terminado = None
+        self.evento = threading.Event()
+
+    def reportar(self, progreso, total=None):
+        self.progreso = progreso
+        if total is not None:
+            self.total = total
+
+    def a_dict(self):
+        return {
+            'id': self.id, 'tipo': self.tipo, 'estado': self.estado,
+            'progreso': self.progreso, 'total': self.total, 'error': self.error,
+        }
+
+
+class GestorTrabajos:
+    def __init__(self):
+        self._app = None
+        self._pool = None
+        self._max_workers = 2
+        self._ttl = 3600
+        self._trabajos = {}
+        self._por_clave = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self._max_workers = app.config.get('TRABAJOS_MAX_WORKERS', 2)
+        self._ttl = app.config.get('TRABAJOS_TTL', 3600)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='trabajo')
+        return self._pool
+
+    def enviar(self, clave, tipo, funcion, *args, **kwargs):
+        """Encola `funcion(*args, reportar=..., **kwargs)` salvo que ya exista un trabajo vigente con esa clave."""
+        with self._lock:
+            self._purgar()
+            existente = self._trabajos.get(self._por_clave.get(clave))
+            if existente is not None and existente.estado != ERROR:
+                return existente
+            trabajo = Trabajo(clave, tipo)
+            self._trabajos[trabajo.id] = trabajo
+            self._por_clave[clave] = trabajo.id
+        self._executor().submit(self._ejecutar, trabajo, funcion, args, kwargs)
+        return trabajo
+
+    def obtener(self, id_trabajo):
+        return self._trabajos.get(id_trabajo)
+
+    def _ejecutar(self, trabajo, funcion, args, kwargs):
+        with self._app.app_context():
+            trabajo.estado = EN_PROCESO
+            try:
+                trabajo.resultado = funcion(*args, reportar=trabajo.reportar, **kwargs)
+                trabajo.estado = TERMINADO
+            except Exception as e:
+                log.error("Error en trabajo %s (%s): %s", trabajo.tipo, trabajo.id, e)
+                trabajo.error = str(e)
+                trabajo.estado = ERROR
+            finally:
+                trabajo.terminado = time.time()
+                trabajo.evento.set()
+
+    def _purgar(self):
+        limite = time.time() - self._ttl
+        viejos = [t for t in self._trabajos.values() if t.terminado and t.terminado < limite]
+        for t in viejos:
+            self._trabajos.pop(t.id, None)
+            if self._por_clave.get(t.clave) == t.id:
+                self._por_clave.pop(t.clave, None)
+
+
+trabajos = GestorTrabajos()
+
+
+def estado_exportacion_dict(trabajo):
+    """Estado de un trabajo descargable, con la URL de descarga cuando terminó."""
+    estado = trabajo.a_dict()
+    if trabajo.estado == TERMINADO:
+        estado['url_descarga'] = url_for('admin_usuarios.descargar_exportacion', id_trabajo=trabajo.id)
+    return estado
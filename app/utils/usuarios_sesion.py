@@ -0,0 +1,69 @@
+# app/utils/usuarios_sesion.py
+"""
+Caché del usuario autenticado para el user_loader de Flask-Login.
+
+Flask-Login carga el usuario en cada petición autenticada: el polling de alertas
+(cada 5 s), el del historial (cada 10 s), el stream MJPEG... En lugar de consultar
+la tabla usuarios cada vez, se guarda en un LRU con TTL (memoria del proceso) una
+copia de los campos que usan las rutas y plantillas: id, nombre, username y rol.
+
+Las rutas que modifican esos campos llaman `usuarios_sesion.invalidar(id)` después
+del commit, así un cambio de rol o una desactivación aplica en la petición
+siguiente. Con varios procesos, los demás lo ven al vencer USUARIOS_CACHE_TTL.
+"""
+from flask_login import UserMixin
+from database.conexion import db
+from app.utils.cache import BackendMemoria
+
+
+class UsuarioSesion(UserMixin):
+    """Copia de solo lectura del usuario; no es un objeto ORM (no se agrega a db.session)."""
+
+    def __init__(self, id, nombre, username, rol):
+        self.id = id
+        self.nombre = nombre
+        self.username = username
+        self.rol = rol
+
+    def get_id(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return f"<UsuarioSesion {self.id} {self.username} ({self.rol})>"
+
+
+class CacheUsuarios:
+    def __init__(self):
+        self.backend = BackendMemoria(max_items=1024, ttl=60)
+
+    def init_app(self, app):
+        self.backend = BackendMemoria(max_items=app.config.get('USUARIOS_CACHE_MAX_ITEMS', 1024),
+                                      ttl=app.config.get('USUARIOS_CACHE_TTL', 60))
+
+    def cargar(self, user_id):
+        from app.models import Usuario
+
+        try:
+            id_usuario = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        usuario = self.backend.get(id_usuario)
+        if usuario is not None:
+            return usuario
+        # Si se invalida mientras se consulta, la fila leída puede ser vieja: no se guarda
+        generacion = self.backend.contador(id_usuario)
+        fila = db.session.query(Usuario.id, Usuario.nombre, Usuario.username, Usuario.rol) \
+            .filter(Usuario.id == id_usuario).first()
+        if fila is None:
+            return None
+        usuario = UsuarioSesion(*fila)
+        if self.backend.contador(id_usuario) == generacion:
+            self.backend.set(id_usuario, usuario)
+        return usuario
+
+    def invalidar(self, id_usuario):
+        self.backend.incrementar(int(id_usuario))
+        self.backend.delete(int(id_usuario))
+
+
+usuarios_sesion = CacheUsuarios()
@@ -1,3 +1,22 @@
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
+
+
+def opciones_engine(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS para el pool de conexiones según la configuración.
+    Por defecto, una conexión por hilo WSGI y por hilo de trabajos en segundo
+    plano, más una de reserva (CLI, métricas). SQLite (pruebas) no usa pool.
+    """
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if uri.startswith('sqlite'):
+        return {}
+    tamano = config.get('DB_POOL_SIZE') or config.get('WSGI_HILOS', 8) + config.get('TRABAJOS_MAX_WORKERS', 2) + 1
+    return {
+        'pool_size': tamano,
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
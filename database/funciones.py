@@ -0,0 +1,56 @@
+# database/funciones.py
+"""
+Funciones SQL portables entre PostgreSQL (producción) y SQLite (tests).
+"""
+import sqlalchemy as sa
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+
+# Formatos equivalentes a date_trunc() para SQLite. Incluyen microsegundos para
+# coincidir con el texto que SQLAlchemy guarda en columnas DateTime de SQLite.
+_FORMATOS_SQLITE = {
+    'hour': '%Y-%m-%d %H:00:00.000000',
+    'day': '%Y-%m-%d 00:00:00.000000',
+    'month': '%Y-%m-01 00:00:00.000000',
+}
+
+
+class truncar_fecha(GenericFunction):
+    """
+    date_trunc(unidad, columna). Uso: truncar_fecha('hour', Alerta.timestamp)
+    Unidades soportadas: 'hour', 'day', 'month'.
+    """
+    type = sa.DateTime()
+    inherit_cache = True
+
+    def __init__(self, unidad, columna, **kw):
+        if unidad not in _FORMATOS_SQLITE:
+            raise ValueError(f"Unidad no soportada para truncar_fecha: {unidad}")
+        # La unidad va como literal para que forme parte de la cache key
+        super().__init__(sa.literal_column(f"'{unidad}'"), columna, **kw)
+
+
+def _partes(element):
+    unidad, columna = list(element.clauses)
+    return unidad.name.strip("'"), columna
+
+
+@compiles(truncar_fecha)
+def _truncar_fecha_default(element, compiler, **kw):
+    unidad, columna = _partes(element)
+    return f"date_trunc('{unidad}', {compiler.process(columna, **kw)})"
+
+
+@compiles(truncar_fecha, 'sqlite')
+def _truncar_fecha_sqlite(element, compiler, **kw):
+    unidad, columna = _partes(element)
+    return f"strftime('{_FORMATOS_SQLITE[unidad]}', {compiler.process(columna, **kw)})"
+
+
+def insert_upsert(tabla, dialecto):
+    """INSERT con soporte de .on_conflict_do_update() según el dialecto (PostgreSQL o SQLite)."""
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(tabla)
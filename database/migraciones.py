@@ -0,0 +1,135 @@
+# database/migraciones.py
+"""
+Migraciones idempotentes que se aplican al arrancar, después de db.create_all().
+El proyecto no usa Alembic; cada paso revisa el esquema antes de modificarlo.
+"""
+import sqlalchemy as sa
+from database.conexion import db
+from database.particiones import convertir_a_particionada, asegurar_particiones
+
+LOTE_BACKFILL = 50000
+
+
+def _columnas(conn, tabla):
+    return {c['name'] for c in sa.inspect(conn).get_columns(tabla)}
+
+
+def agregar_alertas_timestamp(conn):
+    """Agrega alertas.timestamp (fecha + hora en una sola columna), todavía vacía."""
+    if 'timestamp' not in _columnas(conn, 'alertas'):
+        conn.execute(sa.text('ALTER TABLE alertas ADD COLUMN "timestamp" TIMESTAMP'))
+
+
+def rellenar_alertas_timestamp(engine):
+    """
+    Rellena alertas.timestamp por lotes de ID, cada lote en su propia
+    transacción: en una tabla grande no se retienen los bloqueos hasta el final.
+    """
+    if engine.dialect.name == 'postgresql':
+        combinado = "fecha + COALESCE(hora, TIME '00:00:00')"
+    else:
+        combinado = "fecha || ' ' || COALESCE(hora, '00:00:00')"
+
+    with engine.connect() as conn:
+        min_id, max_id = conn.execute(sa.text(
+            'SELECT MIN(id), MAX(id) FROM alertas WHERE "timestamp" IS NULL AND fecha IS NOT NULL'
+        )).one()
+    if min_id is None:
+        return
+    for desde in range(min_id, max_id + 1, LOTE_BACKFILL):
+        with engine.begin() as conn:
+            conn.execute(sa.text(
+                f'UPDATE alertas SET "timestamp" = {combinado} '
+                'WHERE "timestamp" IS NULL AND fecha IS NOT NULL '
+                'AND id >= :desde AND id < :hasta'
+            ), {'desde': desde, 'hasta': desde + LOTE_BACKFILL})
+
+
+def indexar_alertas_timestamp(conn):
+    """Índices (timestamp) y (id_usuario, timestamp)."""
+    conn.execute(sa.text(
+        'CREATE INDEX IF NOT EXISTS ix_alertas_timestamp ON alertas ("timestamp")'
+    ))
+    conn.execute(sa.text(
+        'CREATE INDEX IF NOT EXISTS ix_alertas_usuario_timestamp ON alertas (id_usuario, "timestamp")'
+    ))
+
+
+def migrar_alertas_agrupacion(conn):
+    """Columnas de las alertas agrupadas: ocurrencias, duracion_max y ultima_ocurrencia."""
+    columnas = _columnas(conn, 'alertas')
+    if 'ocurrencias' not in columnas:
+        conn.execute(sa.text('ALTER TABLE alertas ADD COLUMN ocurrencias INTEGER NOT NULL DEFAULT 1'))
+    if 'duracion_max' not in columnas:
+        conn.execute(sa.text('ALTER TABLE alertas ADD COLUMN duracion_max FLOAT'))
+    if 'ultima_ocurrencia' not in columnas:
+        conn.execute(sa.text('ALTER TABLE alertas ADD COLUMN ultima_ocurrencia TIMESTAMP'))
+
+
+def crear_indices_sesiones(conn):
+    conn.execute(sa.text('CREATE INDEX IF NOT EXISTS ix_alertas_id_sesion ON alertas (id_sesion)'))
+    conn.execute(sa.text(
+        'CREATE INDEX IF NOT EXISTS ix_sesiones_usuario_id ON sesiones_conduccion (id_usuario, id)'
+    ))
+
+
+def crear_indices_listados(conn):
+    """Índices para ordenar (keyset) y buscar por prefijo en los listados de admin."""
+    # En PostgreSQL text_pattern_ops permite usar el índice con LIKE 'abc%' en cualquier collation
+    ops = ' text_pattern_ops' if conn.dialect.name == 'postgresql' else ''
+    conn.execute(sa.text('CREATE INDEX IF NOT EXISTS ix_usuarios_nombre_id ON usuarios (nombre, id)'))
+    conn.execute(sa.text(
+        'CREATE INDEX IF NOT EXISTS ix_sesiones_fecha_inicio_id ON sesiones_conduccion (fecha_inicio, id)'
+    ))
+    for nombre, tabla, columna in (
+        ('ix_usuarios_nombre_lower', 'usuarios', 'nombre'),
+        ('ix_usuarios_username_lower', 'usuarios', 'username'),
+        ('ix_vehiculos_codigo_lower', 'vehiculos', 'codigo'),
+        ('ix_vehiculos_placa_lower', 'vehiculos', 'placa'),
+    ):
+        conn.execute(sa.text(f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} (lower({columna}){ops})'))
+
+
+def poblar_resumenes():
+    """Llena resumen_sesiones la primera vez, si ya hay sesiones registradas."""
+    from app.models import ResumenSesion, SesionConduccion
+    from app.utils.resumen_sesion import reconstruir_resumenes
+    if (db.session.query(ResumenSesion).first() is None
+            and db.session.query(SesionConduccion.id).first() is not None):
+        reconstruir_resumenes()
+
+
+def poblar_agregados():
+    """La primera vez que existen las tablas de agregados, se llenan desde los datos crudos."""
+    from app.models import AgregadoAlertasHora, AgregadoConduccionDia, Alerta, SesionConduccion
+    from app.utils.agregados import reconstruir_agregados
+    vacias = (db.session.query(AgregadoAlertasHora).first() is None
+              and db.session.query(AgregadoConduccionDia).first() is None)
+    hay_datos = (db.session.query(Alerta.id).first() is not None
+                 or db.session.query(SesionConduccion.id).first() is not None)
+    if vacias and hay_datos:
+        reconstruir_agregados()
+
+
+def inicializar_base():
+    """db.create_all() + migraciones pendientes. Requiere app context."""
+    db.create_all()
+    aplicar_migraciones()
+
+
+def aplicar_migraciones():
+    """Ejecuta todas las migraciones pendientes. Requiere app context."""
+    with db.engine.begin() as conn:
+        agregar_alertas_timestamp(conn)
+    # Fuera de la transacción del esquema: un commit por lote
+    rellenar_alertas_timestamp(db.engine)
+    with db.engine.begin() as conn:
+        indexar_alertas_timestamp(conn)
+        migrar_alertas_agrupacion(conn)
+        # Solo PostgreSQL; en SQLite la tabla queda plana
+        convertir_a_particionada(conn)
+        asegurar_particiones(conn)
+        crear_indices_sesiones(conn)
+        crear_indices_listados(conn)
+    poblar_agregados()
+    poblar_resumenes()
@@ -0,0 +1,248 @@
+# database/particiones.py
+"""
+Particionado mensual de la tabla alertas y archivo histórico en Parquet.
+
+- PostgreSQL: alertas se particiona por RANGE("timestamp"), una partición por mes
+  (alertas_YYYY_MM) más una partición DEFAULT para valores fuera de rango.
+- SQLite: la tabla queda plana; el archivado borra las filas por mes.
+
+Las particiones más antiguas que ALERTAS_RETENCION_MESES se exportan a
+<ARCHIVO_ALERTAS_DIR>/alertas_YYYY_MM.parquet (zstd) y luego se eliminan.
+"""
+import logging
+import os
+import glob
+from datetime import date, datetime
+import sqlalchemy as sa
+
+log = logging.getLogger(__name__)
+
+FILAS_POR_GRUPO = 10000
+
+
+# ==========================
+# UTILIDADES DE MESES
+# ==========================
+def inicio_mes(d):
+    return date(d.year, d.month, 1)
+
+def sumar_meses(d, n):
+    total = d.year * 12 + (d.month - 1) + n
+    return date(total // 12, total % 12 + 1, 1)
+
+def nombre_particion(mes):
+    return f"alertas_{mes:%Y_%m}"
+
+def _ruta_archivo(directorio, mes):
+    return os.path.join(directorio, f"{nombre_particion(mes)}.parquet")
+
+
+# ==========================
+# POSTGRESQL: PARTICIONES
+# ==========================
+def es_particionada(conn):
+    if conn.dialect.name != 'postgresql':
+        return False
+    return conn.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'alertas'"
+    )).first() is not None
+
+def _particiones_existentes(conn):
+    filas = conn.execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'alertas'"
+    )).scalars().all()
+    return set(filas)
+
+def crear_particion_mes(conn, mes):
+    """
+    Crea la partición del mes si no existe. Si la partición DEFAULT ya tiene filas
+    de ese mes, se mueven antes de adjuntarla (ATTACH falla si no).
+    """
+    nombre = nombre_particion(mes)
+    if nombre in _particiones_existentes(conn):
+        return False
+    desde, hasta = mes, sumar_meses(mes, 1)
+    rango = {'desde': datetime.combine(desde, datetime.min.time()),
+             'hasta': datetime.combine(hasta, datetime.min.time())}
+    conn.execute(sa.text(f'CREATE TABLE {nombre} (LIKE alertas INCLUDING DEFAULTS)'))
+    conn.execute(sa.text(
+        f'INSERT INTO {nombre} SELECT * FROM alertas_default '
+        'WHERE "timestamp" >= :desde AND "timestamp" < :hasta'
+    ), rango)
+    conn.execute(sa.text(
+        'DELETE FROM alertas_default WHERE "timestamp" >= :desde AND "timestamp" < :hasta'
+    ), rango)
+    conn.execute(sa.text(
+        f"ALTER TABLE alertas ATTACH PARTITION {nombre} "
+        f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+    ))
+    return True
+
+def asegurar_particiones(conn, meses_adelante=2):
+    """Garantiza particiones desde el mes actual hasta `meses_adelante` meses después."""
+    if not es_particionada(conn):
+        return
+    actual = inicio_mes(date.today())
+    for n in range(meses_adelante + 1):
+        crear_particion_mes(conn, sumar_meses(actual, n))
+
+def convertir_a_particionada(conn, meses_adelante=2):
+    """
+    Migración (solo PostgreSQL): convierte la tabla plana alertas en una tabla
+    particionada por mes y copia los datos existentes.
+    """
+    if conn.dialect.name != 'postgresql' or es_particionada(conn):
+        return
+
+    # La clave de partición debe formar parte de la PK, por eso no puede ser NULL
+    conn.execute(sa.text(
+        'UPDATE alertas SET "timestamp" = COALESCE(fecha::timestamp, NOW()) WHERE "timestamp" IS NULL'
+    ))
+    conn.execute(sa.text('ALTER TABLE alertas RENAME TO alertas_legacy'))
+    conn.execute(sa.text('DROP INDEX IF EXISTS ix_alertas_timestamp'))
+    conn.execute(sa.text('DROP INDEX IF EXISTS ix_alertas_usuario_timestamp'))
+    conn.execute(sa.text(
+        'CREATE TABLE alertas (LIKE alertas_legacy INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE ("timestamp")'
+    ))
+    conn.execute(sa.text('ALTER TABLE alertas ALTER COLUMN "timestamp" SET NOT NULL'))
+    conn.execute(sa.text('ALTER TABLE alertas ADD PRIMARY KEY (id, "timestamp")'))
+    conn.execute(sa.text('ALTER TABLE alertas ADD FOREIGN KEY (id_usuario) REFERENCES usuarios (id)'))
+    conn.execute(sa.text('ALTER TABLE alertas ADD FOREIGN KEY (id_vehiculo) REFERENCES vehiculos (id)'))
+    conn.execute(sa.text('ALTER TABLE alertas ADD FOREIGN KEY (id_sesion) REFERENCES sesiones_conduccion (id)'))
+    conn.execute(sa.text('CREATE TABLE alertas_default PARTITION OF alertas DEFAULT'))
+
+    # El serial sigue apuntando a la secuencia original; la reasignamos antes de borrar la tabla vieja
+    conn.execute(sa.text('ALTER SEQUENCE alertas_id_seq OWNED BY alertas.id'))
+
+    minimo = conn.execute(sa.text('SELECT MIN("timestamp") FROM alertas_legacy')).scalar()
+    mes = inicio_mes(minimo) if minimo else inicio_mes(date.today())
+    ultimo = sumar_meses(inicio_mes(date.today()), meses_adelante)
+    while mes <= ultimo:
+        crear_particion_mes(conn, mes)
+        mes = sumar_meses(mes, 1)
+
+    columnas = ', '.join(f'"{c}"' for c in _columnas_tabla(conn, 'alertas_legacy'))
+    conn.execute(sa.text(f'INSERT INTO alertas ({columnas}) SELECT {columnas} FROM alertas_legacy'))
+    conn.execute(sa.text('DROP TABLE alertas_legacy'))
+    conn.execute(sa.text('CREATE INDEX IF NOT EXISTS ix_alertas_timestamp ON alertas ("timestamp")'))
+    conn.execute(sa.text(
+        'CREATE INDEX IF NOT EXISTS ix_alertas_usuario_timestamp ON alertas (id_usuario, "timestamp")'
+    ))
+    log.info("Tabla alertas convertida a particionado mensual.")
+
+def _columnas_tabla(conn, tabla):
+    return [c['name'] for c in sa.inspect(conn).get_columns(tabla)]
+
+
+# ==========================
+# RETENCIÓN / ARCHIVO PARQUET
+# ==========================
+def archivar_alertas(conn, directorio, antiguedad_meses):
+    """
+    Exporta a Parquet cada mes anterior a (mes actual - antiguedad_meses) y
+    lo elimina de la base de datos. Devuelve la lista de meses archivados.
+    """
+    import pandas as pd
+
+    corte = sumar_meses(inicio_mes(date.today()), -antiguedad_meses)
+    minimo = conn.execute(sa.text('SELECT MIN("timestamp") FROM alertas')).scalar()
+    if minimo is None:
+        return []
+    if isinstance(minimo, str):  # SQLite devuelve texto en consultas crudas
+        minimo = datetime.fromisoformat(minimo)
+
+    os.makedirs(directorio, exist_ok=True)
+    particionada = es_particionada(conn)
+    existentes = _particiones_existentes(conn) if particionada else set()
+    archivados = []
+
+    mes = inicio_mes(minimo)
+    while mes < corte:
+        siguiente = sumar_meses(mes, 1)
+        rango = {'desde': datetime.combine(mes, datetime.min.time()),
+                 'hasta': datetime.combine(siguiente, datetime.min.time())}
+        df = pd.read_sql(
+            sa.text('SELECT * FROM alertas WHERE "timestamp" >= :desde AND "timestamp" < :hasta ORDER BY id'),
+            conn, params=rango, parse_dates=['timestamp']
+        )
+        if not df.empty:
+            df['fecha'] = df['fecha'].map(_como_texto)
+            df['hora'] = df['hora'].map(_como_texto)
+            ruta = _ruta_archivo(directorio, mes)
+            if os.path.exists(ruta):
+                # Una corrida anterior ya exportó parte del mes (o llegaron filas tardías)
+                df = pd.concat([pd.read_parquet(ruta), df]).drop_duplicates('id', keep='last').sort_values('id')
+            tmp = ruta + '.tmp'
+            # Ordenado por id y en grupos de filas chicos: la lectura recorre los grupos
+            # del último al primero y corta al juntar las filas pedidas
+            df.to_parquet(tmp, compression='zstd', index=False, row_group_size=FILAS_POR_GRUPO)
+            os.replace(tmp, ruta)
+            archivados.append(mes)
+
+        nombre = nombre_particion(mes)
+        if particionada and nombre in existentes:
+            conn.execute(sa.text(f'DROP TABLE {nombre}'))
+        else:
+            conn.execute(sa.text(
+                'DELETE FROM alertas WHERE "timestamp" >= :desde AND "timestamp" < :hasta'
+            ), rango)
+        mes = siguiente
+
+    if archivados:
+        log.info("Archivados %s meses de alertas en %s", len(archivados), directorio)
+    return archivados
+
+def leer_alertas_archivadas(directorio, desde=None, hasta=None, antes_de_id=None, **iguales):
+    """
+    Genera alertas archivadas en Parquet, de la más nueva a la más antigua (mes
+    más reciente primero, id desc dentro del mes). Solo abre los archivos de los
+    meses que tocan el rango pedido y los lee por grupos de filas, así que la
+    memoria no depende del tamaño del archivo y quien consume puede cortar
+    (islice) sin leer el resto. `iguales` filtra por columna (id_usuario=3, ...).
+    Cada elemento es un dict con las columnas de la tabla.
+    """
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    rutas = sorted(glob.glob(os.path.join(directorio, 'alertas_*.parquet')), reverse=True)
+    if desde is not None:
+        rutas = [r for r in rutas if _mes_de_ruta(r) >= inicio_mes(desde)]
+    if hasta is not None:
+        rutas = [r for r in rutas if _mes_de_ruta(r) <= inicio_mes(hasta)]
+    iguales = {c: v for c, v in iguales.items() if v is not None}
+
+    for ruta in rutas:
+        archivo = pq.ParquetFile(ruta)
+        for grupo in reversed(range(archivo.num_row_groups)):
+            df = archivo.read_row_group(grupo).to_pandas()
+            filtro = pd.Series(True, index=df.index)
+            if desde is not None:
+                filtro &= df['timestamp'] >= pd.Timestamp(desde)
+            if hasta is not None:
+                filtro &= df['timestamp'] <= pd.Timestamp(hasta)
+            if antes_de_id is not None:
+                filtro &= df['id'] < antes_de_id
+            for columna, valor in iguales.items():
+                filtro &= df[columna] == valor
+            df = df[filtro].sort_values('id', ascending=False)
+            df = df.astype(object).where(df.notna(), None)
+            for fila in df.to_dict('records'):
+                if fila.get('timestamp') is not None:
+                    fila['timestamp'] = fila['timestamp'].to_pydatetime()
+                # Las columnas enteras con NULL llegan como float desde Parquet
+                for col in ('id', 'id_usuario', 'id_vehiculo', 'id_sesion'):
+                    if fila.get(col) is not None:
+                        fila[col] = int(fila[col])
+                yield fila
+
+def _como_texto(valor):
+    return None if valor is None or valor != valor else str(valor)
+
+def _mes_de_ruta(ruta):
+    base = os.path.basename(ruta)[len('alertas_'):-len('.parquet')]
+    anio, mes = base.split('_')
+    return date(int(anio), int(mes), 1)
@@ -0,0 +1,164 @@
+# ia_module/backends_rostro.py
+"""
+Backends de detección de rostro para el detector de somnolencia.
+
+Todos exponen la misma interfaz:
+    resultado = backend.procesar(frame_rgb)        # inferencia
+    izq, der = backend.ojos(frame_bgr, resultado)   # señal de apertura de cada ojo, o (None, None)
+    backend.close()
+
+La señal de apertura es "más baja = más cerrado", como el EAR: la calibración
+(base * threshold_ratio), PERCLOS, telemetría y trazas funcionan igual con
+cualquier backend.
+
+- 'face_mesh': API clásica mp.solutions.face_mesh (refine_landmarks) + EAR.
+- 'face_landmarker': MediaPipe Tasks FaceLandmarker en modo VIDEO (usa el
+  tracking entre frames; exige timestamps crecientes). Necesita el modelo
+  .task (DetectorConfig.landmarker_model_path). Con senal='blendshapes' la
+  apertura es 1 - eyeBlinkLeft/eyeBlinkRight, sin geometría en Python; con
+  senal='ear' calcula el EAR sobre sus landmarks.
+
+mediapipe se importa al crear el backend, no al importar este módulo.
+"""
+import logging
+import os
+import time
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+LEFT_EYE_IDX = [33, 160, 158, 133, 153, 144]
+RIGHT_EYE_IDX = [263, 387, 385, 362, 380, 373]
+BLENDSHAPES_OJOS = ('eyeBlinkLeft', 'eyeBlinkRight')
+MODELO_POR_DEFECTO = os.path.join(os.path.dirname(__file__), 'modelos', 'face_landmarker.task')
+
+
+def _euclidean(p1: np.ndarray, p2: np.ndarray) -> float:
+    return float(np.linalg.norm(p1 - p2))
+
+# Calculo EAR
+def _ear_from_landmarks(landmarks: np.ndarray, eye_idx: list) -> float:
+    # Extrae los landmarks del ojo.
+    p1, p2, p3, p4, p5, p6 = [landmarks[i] for i in eye_idx]
+    vert1 = _euclidean(p2, p6)  # Primera distancia vertical
+    vert2 = _euclidean(p3, p5)  # Segunda distancia vertical
+
+    # Ancho del ojo
+    horiz = _euclidean(p1, p4)
+
+    # EAR = (vert1 + vert2) / (2 * horiz)
+    return (vert1 + vert2) / (2.0 * horiz + 1e-8) # epsilon (1e-8) para evitar división por cero
+
+
+def ears_de_landmarks(landmarks, w, h):
+    """EAR (izq, der) de una lista de landmarks normalizados (x, y en 0-1)."""
+    # Solo los 12 puntos de los ojos, no los 478 de la malla
+    pts = {i: np.array([landmarks[i].x * w, landmarks[i].y * h], dtype=np.float32)
+           for i in LEFT_EYE_IDX + RIGHT_EYE_IDX}
+    return _ear_from_landmarks(pts, LEFT_EYE_IDX), _ear_from_landmarks(pts, RIGHT_EYE_IDX)
+
+
+class BackendFaceMesh:
+    nombre = 'face_mesh'
+
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        import mediapipe as mp
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+        )
+
+    def procesar(self, frame_rgb):
+        return self.face_mesh.process(frame_rgb)
+
+    def ojos(self, frame_bgr, resultado):
+        if not resultado.multi_face_landmarks:
+            return None, None
+        h, w = frame_bgr.shape[:2]
+        return ears_de_landmarks(resultado.multi_face_landmarks[0].landmark, w, h)
+
+    def close(self):
+        self.face_mesh.close()
+
+
+class BackendFaceLandmarker:
+    nombre = 'face_landmarker'
+
+    def __init__(self, modelo=None, senal='blendshapes', min_detection_confidence=0.5,
+                 min_tracking_confidence=0.5):
+        if senal not in ('blendshapes', 'ear'):
+            raise ValueError(f"Señal de ojos desconocida: {senal} (blendshapes o ear)")
+        modelo = modelo or MODELO_POR_DEFECTO
+        if not os.path.exists(modelo):
+            raise FileNotFoundError(
+                f"No existe el modelo de FaceLandmarker: {modelo} "
+                "(descargar face_landmarker.task de MediaPipe y configurar su ruta)")
+        import mediapipe as mp
+        from mediapipe.tasks.python import BaseOptions, vision
+
+        self._mp = mp
+        self.senal = senal
+        opciones = vision.FaceLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=modelo),
+            running_mode=vision.RunningMode.VIDEO,
+            num_faces=1,
+            min_face_detection_confidence=min_detection_confidence,
+            min_face_presence_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            output_face_blendshapes=senal == 'blendshapes',
+        )
+        self.landmarker = vision.FaceLandmarker.create_from_options(opciones)
+        self._ultimo_ts = -1
+        self._indices_blendshapes = None
+        log.info("FaceLandmarker (VIDEO, señal %s) con modelo %s", senal, modelo)
+
+    def _timestamp_ms(self, ts_ms=None):
+        # El modo VIDEO rechaza timestamps repetidos o que retroceden
+        ts = int(time.monotonic() * 1000) if ts_ms is None else int(ts_ms)
+        ts = max(ts, self._ultimo_ts + 1)
+        self._ultimo_ts = ts
+        return ts
+
+    def procesar(self, frame_rgb, ts_ms=None):
+        imagen = self._mp.Image(image_format=self._mp.ImageFormat.SRGB, data=np.ascontiguousarray(frame_rgb))
+        return self.landmarker.detect_for_video(imagen, self._timestamp_ms(ts_ms))
+
+    def ojos(self, frame_bgr, resultado):
+        if not resultado.face_landmarks:
+            return None, None
+        if self.senal == 'ear':
+            h, w = frame_bgr.shape[:2]
+            return ears_de_landmarks(resultado.face_landmarks[0], w, h)
+        return self._apertura_blendshapes(resultado.face_blendshapes[0])
+
+    def _apertura_blendshapes(self, categorias):
+        if self._indices_blendshapes is None:
+            # El orden de las categorías es fijo por modelo: se busca una sola vez
+            nombres = [c.category_name for c in categorias]
+            self._indices_blendshapes = tuple(nombres.index(n) for n in BLENDSHAPES_OJOS)
+        izq, der = (categorias[i].score for i in self._indices_blendshapes)
+        return 1.0 - izq, 1.0 - der
+
+    def close(self):
+        self.landmarker.close()
+
+
+BACKENDS = {
+    BackendFaceMesh.nombre: BackendFaceMesh,
+    BackendFaceLandmarker.nombre: BackendFaceLandmarker,
+}
+
+
+def crear_backend(cfg):
+    """Backend según DetectorConfig.backend."""
+    if cfg.backend == BackendFaceLandmarker.nombre:
+        return BackendFaceLandmarker(
+            cfg.landmarker_model_path, cfg.eye_signal,
+            cfg.min_detection_confidence, cfg.min_tracking_confidence,
+        )
+    if cfg.backend != BackendFaceMesh.nombre:
+        raise ValueError(f"Backend desconocido: {cfg.backend} ({', '.join(BACKENDS)})")
+    return BackendFaceMesh(cfg.min_detection_confidence, cfg.min_tracking_confidence)
@@ -0,0 +1,127 @@
+# ia_module/comparar_backends.py
+"""
+Compara los backends de rostro sobre el mismo video, sin tiempo real:
+
+    python -m ia_module.comparar_backends video.mp4 --modelo face_landmarker.task \
+        --cerrados 12.0-13.5,40-41.2
+
+Por backend se reporta FPS de inferencia, latencia p50/p95, fracción de frames
+con rostro y PERCLOS. Cada uno se calibra como en el detector (mediana de los
+primeros segundos * ratio). Con --cerrados (intervalos del video, en segundos,
+con los ojos cerrados) se calcula además la exactitud por frame; sin ellos,
+la concordancia entre backends.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from ia_module.backends_rostro import BackendFaceMesh, BackendFaceLandmarker
+from ia_module.fuentes import ArchivoVideo
+from ia_module.perfilador import HistogramaNs
+
+
+def medir_backend(backend, fuente, fps_video, segundos_calibracion=3.0, ratio=0.75):
+    """Procesa toda la fuente. Devuelve dict con la señal por frame (NaN sin rostro) y los tiempos."""
+    inferencia = HistogramaNs()
+    senal = []
+    i = 0
+    while True:
+        ok, frame = fuente.read()
+        if not ok:
+            break
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        t0 = time.perf_counter_ns()
+        # Timestamps del video, no del reloj: el modo VIDEO ve el mismo tiempo que la grabación
+        if isinstance(backend, BackendFaceLandmarker):
+            resultado = backend.procesar(frame_rgb, ts_ms=i * 1000.0 / fps_video)
+        else:
+            resultado = backend.procesar(frame_rgb)
+        izq, der = backend.ojos(frame, resultado)
+        inferencia.registrar(time.perf_counter_ns() - t0)
+        senal.append(np.nan if izq is None or der is None else (izq + der) / 2.0)
+        i += 1
+    senal = np.array(senal, dtype=np.float64)
+    t = np.arange(len(senal)) / fps_video
+    calibracion = senal[(t < segundos_calibracion) & ~np.isnan(senal)]
+    umbral = float(np.median(calibracion)) * ratio if len(calibracion) else np.nan
+    con_rostro = ~np.isnan(senal)
+    return {
+        't': t, 'senal': senal, 'umbral': umbral, 'inferencia': inferencia,
+        'con_rostro': con_rostro, 'cerrado': con_rostro & (senal < umbral),
+    }
+
+
+def parsear_intervalos(texto):
+    """'12-13.5,40-41' -> [(12.0, 13.5), (40.0, 41.0)]."""
+    intervalos = []
+    for parte in filter(None, (texto or '').split(',')):
+        desde, _, hasta = parte.partition('-')
+        intervalos.append((float(desde), float(hasta)))
+    return intervalos
+
+
+def cerrados_reales(t, intervalos):
+    real = np.zeros(len(t), dtype=bool)
+    for desde, hasta in intervalos:
+        real |= (t >= desde) & (t <= hasta)
+    return real
+
+
+def reporte(resultados, intervalos=None):
+    ms = lambda ns: ns / 1e6
+    lineas = [f"{'backend':<28}{'FPS inf.':>9}{'p50 ms':>8}{'p95 ms':>8}{'rostro':>8}{'umbral':>8}{'PERCLOS':>9}"
+              + (f"{'exactitud':>10}{'recall':>8}" if intervalos else '')]
+    for nombre, r in resultados.items():
+        h = r['inferencia']
+        fps = h.n * 1e9 / h.total if h.total else 0.0
+        rostro = r['con_rostro']
+        perclos = r['cerrado'][rostro].mean() if rostro.any() else 0.0
+        linea = (f"{nombre:<28}{fps:>9.1f}{ms(h.percentil(50)):>8.2f}{ms(h.percentil(95)):>8.2f}"
+                 f"{rostro.mean():>8.1%}{r['umbral']:>8.3f}{perclos:>9.1%}")
+        if intervalos:
+            real = cerrados_reales(r['t'], intervalos)
+            exactitud = (r['cerrado'] == real).mean() if len(real) else 0.0
+            recall = r['cerrado'][real].mean() if real.any() else 0.0
+            linea += f"{exactitud:>10.1%}{recall:>8.1%}"
+        lineas.append(linea)
+    nombres = list(resultados)
+    for i, a in enumerate(nombres):
+        for b in nombres[i + 1:]:
+            n = min(len(resultados[a]['cerrado']), len(resultados[b]['cerrado']))
+            acuerdo = (resultados[a]['cerrado'][:n] == resultados[b]['cerrado'][:n]).mean() if n else 0.0
+            lineas.append(f"Concordancia ojos cerrados {a} vs {b}: {acuerdo:.1%}")
+    return '\n'.join(lineas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara backends de rostro sobre un video")
+    parser.add_argument("video", help="Video de prueba")
+    parser.add_argument("--modelo", default=None, help="Modelo .task de FaceLandmarker (si no, solo face_mesh)")
+    parser.add_argument("--cerrados", default=None, help="Intervalos con ojos cerrados: 12-13.5,40-41")
+    parser.add_argument("--calib", type=float, default=3.0, help="Segundos de calibracion al inicio del video")
+    parser.add_argument("--ratio", type=float, default=0.75, help="Umbral = base * ratio")
+    args = parser.parse_args()
+
+    backends = {'face_mesh': lambda: BackendFaceMesh()}
+    if args.modelo:
+        backends['face_landmarker (blendshapes)'] = lambda: BackendFaceLandmarker(args.modelo, 'blendshapes')
+        backends['face_landmarker (ear)'] = lambda: BackendFaceLandmarker(args.modelo, 'ear')
+
+    resultados = {}
+    for nombre, crear in backends.items():
+        fuente = ArchivoVideo(args.video, tiempo_real=False)
+        if not fuente.isOpened():
+            print(f"[Comparar] No se pudo abrir {args.video}")
+            return
+        fps_video = fuente.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        backend = crear()
+        try:
+            resultados[nombre] = medir_backend(backend, fuente, fps_video, args.calib, args.ratio)
+        finally:
+            backend.close()
+            fuente.release()
+    print(reporte(resultados, parsear_intervalos(args.cerrados)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# ia_module/fatiga.py
+"""
+PERCLOS y parpadeos sobre ventanas de tiempo deslizantes.
+
+- PERCLOS: fracción del tiempo con los ojos cerrados (EAR bajo el umbral) en la
+  última ventana (60 s por defecto). Cada frame aporta su dt, así el valor no
+  depende de los FPS.
+- Parpadeos: cierres más cortos que `parpadeo_max_s` (los más largos ya son
+  episodios de somnolencia). Se reporta la frecuencia por minuto y la duración media.
+
+Las muestras viven en búferes circulares numpy de tamaño fijo con sumas
+acumuladas: agregar una muestra y quitar las vencidas cuesta O(1) amortizado por
+frame y la memoria no crece con la jornada. Las sumas se recalculan exactas cada
+vez que el búfer da una vuelta, para que el error de punto flotante no se acumule.
+"""
+import numpy as np
+
+DT_MAX = 0.5   # un frame trabado no cuenta más que esto en PERCLOS
+
+
+class VentanaTemporal:
+    """Muestras (t, valores...) de los últimos `segundos`, con la suma de cada columna."""
+
+    def __init__(self, segundos, capacidad, columnas=1):
+        self.segundos = segundos
+        self.capacidad = capacidad
+        self._t = np.zeros(capacidad)
+        self._v = np.zeros((capacidad, columnas))
+        self._inicio = 0   # índice de la muestra más antigua
+        self.n = 0
+        self.suma = np.zeros(columnas)
+        self._escrituras = 0
+
+    def agregar(self, t, *valores):
+        if self.n == self.capacidad:
+            # Más muestras que las previstas (FPS mayores a los del tamaño): se pierde la más antigua
+            self._quitar_antigua()
+        i = (self._inicio + self.n) % self.capacidad
+        self._t[i] = t
+        self._v[i] = valores
+        self.suma += self._v[i]
+        self.n += 1
+        self._escrituras += 1
+        if self._escrituras % self.capacidad == 0:
+            self._recalcular()
+        self.recortar(t)
+
+    def recortar(self, ahora):
+        """Quita las muestras más viejas que la ventana."""
+        limite = ahora - self.segundos
+        while self.n and self._t[self._inicio] < limite:
+            self._quitar_antigua()
+
+    def _quitar_antigua(self):
+        self.suma -= self._v[self._inicio]
+        self._inicio = (self._inicio + 1) % self.capacidad
+        self.n -= 1
+
+    def _recalcular(self):
+        indices = (self._inicio + np.arange(self.n)) % self.capacidad
+        self.suma = self._v[indices].sum(axis=0)
+
+    def vaciar(self):
+        self._inicio = 0
+        self.n = 0
+        self.suma[:] = 0.0
+
+
+class MedidorFatiga:
+    def __init__(self, ventana_s=60.0, fps_max=60, parpadeo_max_s=1.5, max_parpadeos_min=120):
+        self.ventana_s = ventana_s
+        self.parpadeo_max_s = parpadeo_max_s
+        # Columnas: dt del frame, dt con ojos cerrados
+        self.ojos = VentanaTemporal(ventana_s, int(ventana_s * fps_max), columnas=2)
+        # Columna: duración de cada parpadeo
+        self.parpadeos = VentanaTemporal(ventana_s, int(max_parpadeos_min * ventana_s / 60.0) + 1)
+        self._ultimo = None
+        self._cierre = None
+
+    def actualizar(self, ahora, cerrado):
+        """
+        Registra un frame con rostro detectado. Devuelve la duración del parpadeo
+        que terminó en este frame, o None.
+        """
+        dt = 0.0 if self._ultimo is None else min(max(ahora - self._ultimo, 0.0), DT_MAX)
+        self._ultimo = ahora
+        self.ojos.agregar(ahora, dt, dt if cerrado else 0.0)
+
+        parpadeo = None
+        if cerrado:
+            if self._cierre is None:
+                self._cierre = ahora
+        elif self._cierre is not None:
+            duracion = ahora - self._cierre
+            self._cierre = None
+            if duracion < self.parpadeo_max_s:
+                self.parpadeos.agregar(ahora, duracion)
+                parpadeo = duracion
+        self.parpadeos.recortar(ahora)
+        return parpadeo
+
+    def sin_rostro(self):
+        """Frame sin rostro: el hueco no cuenta como tiempo observado ni corta un parpadeo a medias."""
+        self._ultimo = None
+        self._cierre = None
+
+    def reiniciar(self):
+        self.ojos.vaciar()
+        self.parpadeos.vaciar()
+        self.sin_rostro()
+
+    @property
+    def observado_s(self):
+        """Segundos de la ventana con rostro detectado."""
+        return float(self.ojos.suma[0])
+
+    @property
+    def segundos_cerrados(self):
+        return float(self.ojos.suma[1])
+
+    @property
+    def cobertura(self):
+        """Fracción de la ventana con datos (0 al empezar, 1 tras una ventana completa con rostro)."""
+        return min(self.observado_s / self.ventana_s, 1.0)
+
+    @property
+    def perclos(self):
+        observado = self.observado_s
+        return self.segundos_cerrados / observado if observado > 0 else 0.0
+
+    @property
+    def parpadeos_por_minuto(self):
+        # Al empezar la ventana no está llena: se escala por el tiempo observado
+        observado = min(self.observado_s, self.ventana_s)
+        return self.parpadeos.n * 60.0 / observado if observado >= 1.0 else 0.0
+
+    @property
+    def duracion_media_parpadeo(self):
+        return float(self.parpadeos.suma[0]) / self.parpadeos.n if self.parpadeos.n else 0.0
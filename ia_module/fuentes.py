@@ -0,0 +1,342 @@
+# ia_module/fuentes.py
+"""
+Fuentes de frames para el detector, con la misma interfaz que cv2.VideoCapture
+(`read() -> (ok, frame)`, `isOpened()`, `release()`), así calibrate() y el
+bucle del detector no cambian:
+
+- CamaraLocal: cámara por índice o /dev/videoN. En Linux usa V4L2 y pide MJPG
+  (el YUYV por defecto no da 30 FPS a 640x480 en muchas webcams USB), la
+  resolución/FPS configurados y un búfer de 1 frame para no procesar frames
+  viejos. En Windows usa DirectShow, como antes.
+- ArchivoVideo: un video grabado, a su velocidad real (o lo más rápido posible).
+- StreamURL: RTSP/HTTP. Un hilo lee continuamente y el detector toma siempre el
+  último frame (los viejos se descartan); se reconecta si el stream se corta.
+  Mientras reconecta, read() devuelve (False, None) cada `espera_frame_s` con
+  `reconectando` en True: el bucle del detector lo salta en lugar de terminar.
+- FuenteSintetica: frames generados (sin cámara), para pruebas y benchmarks.
+
+Cada fuente mide el tiempo bloqueado en read(), la edad del frame entregado
+cuando se puede saber (timestamp del búfer V4L2, hilo lector de StreamURL) y
+los FPS entregados; `reporte()` los resume. Se elige con crear_fuente(spec).
+"""
+import logging
+import os
+import platform
+import threading
+import time
+import cv2
+import numpy as np
+from ia_module.perfilador import HistogramaNs
+
+log = logging.getLogger(__name__)
+
+ESQUEMAS_URL = ('rtsp://', 'rtsps://', 'http://', 'https://', 'rtmp://')
+NOMBRES_SINTETICA = ('sintetica', 'sintética', 'synthetic')
+
+
+def _fourcc_texto(valor):
+    valor = int(valor)
+    return ''.join(chr((valor >> 8 * i) & 0xFF) for i in range(4)).strip('\x00') or '?'
+
+
+class FuenteFrames:
+    """Base: mide cada read() y arma el reporte. Las subclases implementan _leer()."""
+    descripcion = 'fuente'
+
+    def __init__(self):
+        self.espera = HistogramaNs()   # tiempo bloqueado en read()
+        self.edad = HistogramaNs()     # del frame al entregarlo (si la fuente lo sabe)
+        self.frames = 0
+        self._inicio = None
+        self._ultimo = None
+
+    def read(self):
+        t0 = time.perf_counter_ns()
+        ok, frame = self._leer()
+        ahora = time.perf_counter_ns()
+        self.espera.registrar(ahora - t0)
+        if ok:
+            self.frames += 1
+            if self._inicio is None:
+                self._inicio = ahora
+            self._ultimo = ahora
+        return ok, frame
+
+    def _leer(self):
+        raise NotImplementedError
+
+    def _registrar_edad(self, segundos):
+        # Descarta relojes que no cuadran (timestamps de otra base de tiempo)
+        if 0.0 <= segundos < 5.0:
+            self.edad.registrar(int(segundos * 1e9))
+
+    def isOpened(self):
+        return True
+
+    @property
+    def reconectando(self):
+        """True si un read() fallido no es el fin del stream: la fuente sigue intentando."""
+        return False
+
+    def release(self):
+        pass
+
+    @property
+    def fps(self):
+        if self.frames < 2 or self._ultimo == self._inicio:
+            return 0.0
+        return (self.frames - 1) * 1e9 / (self._ultimo - self._inicio)
+
+    def reporte(self):
+        ms = lambda ns: ns / 1e6
+        h = self.espera
+        linea = (f"[Fuente] {self.descripcion}: {self.frames} frames | {self.fps:.1f} FPS"
+                 f" | espera en read() media {ms(h.total / max(h.n, 1)):.2f} ms"
+                 f" p95 {ms(h.percentil(95)):.2f} ms máx {ms(h.maximo):.2f} ms")
+        if self.edad.n:
+            e = self.edad
+            linea += (f" | edad del frame media {ms(e.total / e.n):.1f} ms"
+                      f" p95 {ms(e.percentil(95)):.1f} ms")
+        return linea
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _FuenteCV(FuenteFrames):
+    """Envuelve un cv2.VideoCapture ya abierto."""
+
+    def __init__(self, cap):
+        super().__init__()
+        self.cap = cap
+
+    def _leer(self):
+        return self.cap.read()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+class CamaraLocal(_FuenteCV):
+    def __init__(self, dispositivo=0, ancho=640, alto=480, fps=30, fourcc='MJPG', buffer=1):
+        if platform.system() == 'Linux':
+            backend = cv2.CAP_V4L2
+        elif platform.system() == 'Windows':
+            backend = cv2.CAP_DSHOW
+        else:
+            backend = cv2.CAP_ANY
+        super().__init__(cv2.VideoCapture(dispositivo, backend))
+        self._v4l2 = backend == cv2.CAP_V4L2
+        self.descripcion = f'cámara {dispositivo}'
+        if not self.cap.isOpened():
+            return
+        # FOURCC antes que la resolución: algunos drivers solo ofrecen ciertos tamaños en MJPG
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if ancho and alto:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, ancho)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, alto)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer)
+        # Lo que el driver aceptó realmente (puede diferir de lo pedido)
+        self.descripcion = (
+            f"cámara {dispositivo} {int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x"
+            f"{int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))} "
+            f"{_fourcc_texto(self.cap.get(cv2.CAP_PROP_FOURCC))} "
+            f"@{self.cap.get(cv2.CAP_PROP_FPS):.0f} (búfer {int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE))})"
+        )
+        log.info("Fuente: %s", self.descripcion)
+
+    def _leer(self):
+        ok, frame = self.cap.read()
+        if ok and self._v4l2:
+            # V4L2 entrega el timestamp del búfer del kernel (CLOCK_MONOTONIC, ms)
+            marca = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            if marca > 0:
+                self._registrar_edad(time.monotonic() - marca / 1000.0)
+        return ok, frame
+
+
+class ArchivoVideo(_FuenteCV):
+    def __init__(self, ruta, tiempo_real=True, repetir=False):
+        super().__init__(cv2.VideoCapture(ruta))
+        self.ruta = ruta
+        self.repetir = repetir
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.isOpened() else 0
+        self._periodo = 1.0 / fps if tiempo_real and fps > 0 else 0.0
+        self._siguiente = None
+        self.descripcion = f"archivo {os.path.basename(ruta)} @{fps:.0f}"
+
+    def _leer(self):
+        ok, frame = self.cap.read()
+        if not ok and self.repetir and self.frames:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        if ok and self._periodo:
+            # Se entrega al ritmo del video, no al del disco
+            ahora = time.perf_counter()
+            if self._siguiente is None or self._siguiente < ahora - self._periodo:
+                self._siguiente = ahora
+            elif self._siguiente > ahora:
+                time.sleep(self._siguiente - ahora)
+            self._siguiente += self._periodo
+        return ok, frame
+
+
+class StreamURL(FuenteFrames):
+    def __init__(self, url, reintento_s=2.0, max_reintentos=None, espera_frame_s=5.0):
+        super().__init__()
+        self.url = url
+        self.reintento_s = reintento_s
+        self.max_reintentos = max_reintentos
+        self.espera_frame_s = espera_frame_s
+        # El usuario/clave de la URL no va a los logs
+        self.descripcion = 'stream ' + url.split('@')[-1] if '@' in url else f'stream {url}'
+        self.descartados = 0
+        self._frame = None
+        self._t_frame = None
+        self._nuevo = threading.Condition()
+        self._fin = threading.Event()
+        self._abierto = False
+        self.cap = self._abrir()
+        if self.cap is not None:
+            self._hilo = threading.Thread(target=self._bucle, daemon=True, name='fuente-stream')
+            self._hilo.start()
+
+    def _abrir(self):
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._abierto = True
+        return cap
+
+    def _bucle(self):
+        fallos = 0
+        while not self._fin.is_set():
+            ok, frame = self.cap.read() if self.cap is not None else (False, None)
+            if ok:
+                fallos = 0
+                with self._nuevo:
+                    if self._frame is not None:
+                        self.descartados += 1   # el detector no alcanzó a tomarlo
+                    self._frame, self._t_frame = frame, time.perf_counter()
+                    self._nuevo.notify()
+                continue
+            fallos += 1
+            if self.max_reintentos is not None and fallos > self.max_reintentos:
+                log.error("Fuente: %s cortado, sin más reintentos.", self.descripcion)
+                break
+            log.warning("Fuente: %s cortado, reconectando en %.0fs...", self.descripcion, self.reintento_s)
+            if self.cap is not None:
+                self.cap.release()
+            if self._fin.wait(self.reintento_s):
+                break
+            self.cap = self._abrir()
+        self._abierto = False
+        with self._nuevo:
+            self._nuevo.notify_all()
+
+    def _leer(self):
+        with self._nuevo:
+            if self._frame is None:
+                self._nuevo.wait_for(lambda: self._frame is not None or not self._abierto,
+                                     self.espera_frame_s)
+            frame, self._frame = self._frame, None
+            if frame is None:
+                if self._abierto:
+                    log.warning("Fuente: %s sin frames hace %.0fs, esperando la reconexión...",
+                                self.descripcion, self.espera_frame_s)
+                return False, None
+            self._registrar_edad(time.perf_counter() - self._t_frame)
+            return True, frame
+
+    def isOpened(self):
+        return self._abierto
+
+    @property
+    def reconectando(self):
+        # El hilo lector sigue vivo: se corta solo al agotar max_reintentos o con release()
+        return self._abierto
+
+    def release(self):
+        self._fin.set()
+        hilo = getattr(self, '_hilo', None)
+        if hilo is not None:
+            hilo.join(timeout=2.0)
+        if self.cap is not None:
+            self.cap.release()
+
+    def reporte(self):
+        return super().reporte() + f" | descartados {self.descartados}"
+
+
+class FuenteSintetica(FuenteFrames):
+    """
+    Frames generados: por defecto un fondo gris con una barra que se mueve (no
+    hay rostro, el detector ve "sin rostro"). `generador(i) -> frame` permite
+    otro contenido. `frames_max` corta el stream como un archivo que termina.
+    """
+
+    def __init__(self, ancho=640, alto=480, fps=30, frames_max=None, generador=None, tiempo_real=True):
+        super().__init__()
+        self.ancho, self.alto = ancho, alto
+        self.frames_max = frames_max
+        self.generador = generador or self._barra
+        self._periodo = 1.0 / fps if tiempo_real and fps else 0.0
+        self._siguiente = None
+        self._i = 0
+        self._base = np.full((alto, ancho, 3), 96, dtype=np.uint8)
+        self.descripcion = f"sintética {ancho}x{alto} @{fps}"
+
+    def _barra(self, i):
+        frame = self._base.copy()
+        x = (i * 8) % self.ancho
+        frame[:, x:x + 16] = 255
+        return frame
+
+    def _leer(self):
+        if self.frames_max is not None and self._i >= self.frames_max:
+            return False, None
+        if self._periodo:
+            ahora = time.perf_counter()
+            if self._siguiente is None:
+                self._siguiente = ahora
+            elif self._siguiente > ahora:
+                time.sleep(self._siguiente - ahora)
+            self._siguiente = max(self._siguiente + self._periodo, ahora)
+        frame = self.generador(self._i)
+        self._i += 1
+        return True, frame
+
+
+def crear_fuente(spec='0', ancho=640, alto=480, fps=30, fourcc='MJPG'):
+    """
+    Fuente según `spec`: índice o /dev/videoN -> cámara; rtsp/http(s) -> stream;
+    'sintetica' -> generada; cualquier otra cosa, ruta de un video.
+    """
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return CamaraLocal(int(spec), ancho, alto, fps, fourcc)
+    if spec.startswith('/dev/video'):
+        return CamaraLocal(spec, ancho, alto, fps, fourcc)
+    if spec.lower().startswith(ESQUEMAS_URL):
+        return StreamURL(spec)
+    if spec.lower() in NOMBRES_SINTETICA:
+        return FuenteSintetica(ancho, alto, fps)
+    return ArchivoVideo(spec)
+
+
+def parsear_resolucion(texto):
+    """'1280x720' -> (1280, 720)."""
+    ancho, _, alto = texto.lower().partition('x')
+    return int(ancho), int(alto)
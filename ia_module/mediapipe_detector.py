@@ -1,3 +1,4 @@
+import logging
 import time
 import platform
 import threading
@@ -5,27 +6,13 @@ from dataclasses import dataclass, field
 from typing import Tuple, Optional
 import cv2
 import numpy as np
-import mediapipe as mp
 import os
+from ia_module.perfilador import PerfiladorEtapas, PERFIL_NULO
+from ia_module.fatiga import MedidorFatiga
+from ia_module.backends_rostro import crear_backend, MODELO_POR_DEFECTO
 
-LEFT_EYE_IDX = [33, 160, 158, 133, 153, 144]
-RIGHT_EYE_IDX = [263, 387, 385, 362, 380, 373]
+log = logging.getLogger(__name__)
 
-def _euclidean(p1: np.ndarray, p2: np.ndarray) -> float:
-    return float(np.linalg.norm(p1 - p2))
-
-# Calculo EAR
-def _ear_from_landmarks(landmarks: np.ndarray, eye_idx: list) -> float:
-    # Extrae los landmarks del ojo.
-    p1, p2, p3, p4, p5, p6 = [landmarks[i] for i in eye_idx]
-    vert1 = _euclidean(p2, p6)  # Primera distancia vertical
-    vert2 = _euclidean(p3, p5)  # Segunda distancia vertical
-
-    # Ancho del ojo
-    horiz = _euclidean(p1, p4)
-
-    # EAR = (vert1 + vert2) / (2 * horiz)
-    return (vert1 + vert2) / (2.0 * horiz + 1e-8) # epsilon (1e-8) para evitar división por cero
 @dataclass
 class DetectorConfig:
     min_detection_confidence: float = 0.5
@@ -34,6 +21,20 @@ class DetectorConfig:
     threshold_ratio: float = 0.75
     min_close_seconds: float = 1.5
     draw_landmarks: bool = False
+    # Perfilador por etapas del bucle (ver ia_module/perfilador.py)
+    profile: bool = False
+    profile_slow_ms: Optional[float] = None     # frames más lentos que esto se reportan aparte
+    profile_sample_ms: Optional[float] = None   # muestreo de pilas durante frames lentos
+    # PERCLOS y parpadeos (ver ia_module/fatiga.py)
+    perclos_window_seconds: float = 60.0
+    perclos_threshold: Optional[float] = 0.15   # alerta si PERCLOS lo alcanza; None/0 = solo cierres largos
+    perclos_rearm_ratio: float = 0.8            # se rearma cuando baja de umbral * ratio
+    perclos_min_coverage: float = 0.5           # fracción mínima de la ventana con rostro para alertar
+    max_fps: int = 60                           # dimensiona los búferes circulares
+    # Backend de rostro (ver ia_module/backends_rostro.py): 'face_mesh' o 'face_landmarker'
+    backend: str = 'face_mesh'
+    landmarker_model_path: str = MODELO_POR_DEFECTO   # modelo .task de FaceLandmarker
+    eye_signal: str = 'blendshapes'                   # con face_landmarker: 'blendshapes' o 'ear'
 @dataclass
 class DetectionState:
     ear_open_baseline: Optional[float] = None
@@ -46,20 +47,25 @@ class DetectionState:
     no_face_alert_sent: bool = False
     total_alerts: int = 0
     total_somnolencia_time: float = 0.0
+    # Sobre la última ventana (perclos_window_seconds)
+    perclos: float = 0.0
+    blink_rate: float = 0.0            # parpadeos por minuto
+    blink_mean_duration: float = 0.0   # segundos
+    perclos_alert_sent: bool = False
 class SomnolenceDetector:
     def __init__(self, config: DetectorConfig):
         self.cfg = config
         self.state = DetectionState()
         self._beep_running = False
-
-        self._mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self._mp_face_mesh.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=self.cfg.min_detection_confidence,
-            min_tracking_confidence=self.cfg.min_tracking_confidence,
+        self.perfil = (
+            PerfiladorEtapas(frame_lento_ms=config.profile_slow_ms, muestreo_ms=config.profile_sample_ms)
+            if config.profile else PERFIL_NULO
+        )
+        self.fatiga = MedidorFatiga(
+            ventana_s=config.perclos_window_seconds, fps_max=config.max_fps,
+            parpadeo_max_s=config.min_close_seconds,
         )
+        self.backend = crear_backend(config)
 
     def _beep_continuous(self):
         while self._beep_running:
@@ -70,7 +76,7 @@ class SomnolenceDetector:
                 else:
                     os.system("play -nq -t alsa synth 0.3 sine 1000")
             except Exception as e:
-                print(f"[Sonido] Error beep continuo: {e}")
+                log.warning("Error beep continuo: %s", e)
             time.sleep(0.1)
 
     def _start_beep(self):
@@ -83,19 +89,11 @@ class SomnolenceDetector:
             self._beep_running = False
 
     def _calc_ears(self, frame_bgr, results) -> Tuple[Optional[float], Optional[float]]:
-        if not results.multi_face_landmarks:
-            return None, None
-
-        h, w = frame_bgr.shape[:2]
-        face = results.multi_face_landmarks[0]
-        pts = np.array([[lm.x * w, lm.y * h] for lm in face.landmark], dtype=np.float32)
-
-        left_ear = _ear_from_landmarks(pts, LEFT_EYE_IDX)
-        right_ear = _ear_from_landmarks(pts, RIGHT_EYE_IDX)
-        return left_ear, right_ear
+        # EAR o apertura por blendshapes, según el backend
+        return self.backend.ojos(frame_bgr, results)
 
     def calibrate(self, cap) -> float:
-        print("[Calibración] Mantén los ojos abiertos y mira a la cámara...")
+        log.info("Calibración: mantén los ojos abiertos y mira a la cámara...")
         ears = []
         start = time.time()
 
@@ -104,7 +102,7 @@ class SomnolenceDetector:
             if not ok:
                 continue
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.face_mesh.process(frame_rgb)
+            results = self.backend.procesar(frame_rgb)
             
             l, r = self._calc_ears(frame, results)
             if l is not None and r is not None:
@@ -130,11 +128,35 @@ class SomnolenceDetector:
         baseline = float(np.median(ears))
         self.state.ear_open_baseline = baseline
         self.state.threshold_ear = baseline * self.cfg.threshold_ratio
-        print(
-            f"[Calibración] EAR base: {baseline:.3f} | Umbral: {self.state.threshold_ear:.3f}"
-        )
+        log.info("Calibración: EAR base %.3f | umbral %.3f", baseline, self.state.threshold_ear)
         return baseline
     
+    def update_fatigue_metrics(self, now: float, ear: Optional[float]) -> bool:
+        """
+        Actualiza PERCLOS y parpadeos con el frame actual (requiere calibración).
+        Devuelve True cuando PERCLOS alcanza el umbral: una vez, hasta que baje
+        de umbral * perclos_rearm_ratio.
+        """
+        if ear is None:
+            self.fatiga.sin_rostro()
+            return False
+        self.fatiga.actualizar(now, ear < self.state.threshold_ear)
+        self.state.perclos = self.fatiga.perclos
+        self.state.blink_rate = self.fatiga.parpadeos_por_minuto
+        self.state.blink_mean_duration = self.fatiga.duracion_media_parpadeo
+
+        umbral = self.cfg.perclos_threshold
+        if not umbral:
+            return False
+        if self.state.perclos_alert_sent:
+            if self.state.perclos < umbral * self.cfg.perclos_rearm_ratio:
+                self.state.perclos_alert_sent = False
+            return False
+        if self.state.perclos >= umbral and self.fatiga.cobertura >= self.cfg.perclos_min_coverage:
+            self.state.perclos_alert_sent = True
+            return True
+        return False
+
     def consume_alert_if_ready(self) -> Optional[Tuple[float, Optional[np.ndarray]]]:
         """
         Devuelve (duracion, frame) si un episodio de alerta (Bajo o Medio) ha finalizado.
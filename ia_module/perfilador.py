@@ -0,0 +1,172 @@
+# ia_module/perfilador.py
+"""
+Perfilador por etapas del bucle del detector.
+
+Cada frame se divide en etapas (captura, color, facemesh, ear, estado, overlay,
+publicacion, envio). El bucle llama `t = perfil.etapa('nombre', t)` al terminar
+cada una; el tiempo se mide con perf_counter_ns y se acumula en un histograma de
+tamaño fijo por etapa (buckets logarítmicos, 4 por potencia de 2), así que el
+costo y la memoria no crecen con la duración de la jornada.
+
+Con `muestreo_ms` un hilo muestrea la pila del bucle cada N ms; las muestras de
+los frames que superan `frame_lento_ms` se agregan para ver DÓNDE se fue el tiempo.
+
+Deshabilitado se usa PERFIL_NULO: los mismos métodos sin trabajo (un llamado vacío por etapa).
+"""
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+ETAPAS = ('captura', 'color', 'facemesh', 'ear', 'estado', 'overlay', 'publicacion', 'envio')
+SUB_BUCKETS = 4          # buckets por potencia de 2 (error relativo < 25%)
+MAX_BITS = 40            # ~18 minutos en ns; lo demás cae en el último bucket
+N_BUCKETS = (MAX_BITS + 1) * SUB_BUCKETS
+
+
+def _bucket(ns):
+    bits = ns.bit_length()
+    if bits <= 2:
+        return ns
+    if bits > MAX_BITS:
+        return N_BUCKETS - 1
+    return bits * SUB_BUCKETS + ((ns >> (bits - 3)) & (SUB_BUCKETS - 1))
+
+def _limite_superior(indice):
+    """Cota superior (ns) de los valores que caen en el bucket `indice`."""
+    if indice < 4:
+        return indice
+    bits, sub = divmod(indice, SUB_BUCKETS)
+    return ((SUB_BUCKETS + sub + 1) << (bits - 3)) - 1
+
+
+class HistogramaNs:
+    __slots__ = ('conteos', 'n', 'total', 'maximo')
+
+    def __init__(self):
+        self.conteos = [0] * N_BUCKETS
+        self.n = 0
+        self.total = 0
+        self.maximo = 0
+
+    def registrar(self, ns):
+        self.conteos[_bucket(ns)] += 1
+        self.n += 1
+        self.total += ns
+        if ns > self.maximo:
+            self.maximo = ns
+
+    def percentil(self, p):
+        if not self.n:
+            return 0
+        objetivo = p / 100.0 * self.n
+        acumulado = 0
+        for i, c in enumerate(self.conteos):
+            acumulado += c
+            if acumulado >= objetivo:
+                return min(_limite_superior(i), self.maximo)
+        return self.maximo
+
+
+class PerfiladorEtapas:
+    activo = True
+
+    def __init__(self, frame_lento_ms=None, muestreo_ms=None, max_pilas=5):
+        self.etapas = {nombre: HistogramaNs() for nombre in ETAPAS}
+        self.frames = HistogramaNs()
+        self.frame_lento_ns = int(frame_lento_ms * 1e6) if frame_lento_ms else None
+        self.frames_lentos = 0
+        self.pilas_lentas = Counter()
+        self.max_pilas = max_pilas
+        self._muestreo_s = muestreo_ms / 1000.0 if muestreo_ms else None
+        self._muestras = []
+        self._hilo_bucle = None
+        self._detener = threading.Event()
+        self._muestreador = None
+
+    # === Medición (hilo del bucle) ===
+    def inicio_frame(self):
+        if self._muestreo_s is not None:
+            if self._muestreador is None:
+                self._iniciar_muestreo()
+            self._muestras = []
+        return time.perf_counter_ns()
+
+    def etapa(self, nombre, desde):
+        ahora = time.perf_counter_ns()
+        self.etapas[nombre].registrar(ahora - desde)
+        return ahora
+
+    def fin_frame(self, inicio):
+        total = time.perf_counter_ns() - inicio
+        self.frames.registrar(total)
+        if self.frame_lento_ns is not None and total >= self.frame_lento_ns:
+            self.frames_lentos += 1
+            for pila in self._muestras:
+                self.pilas_lentas[pila] += 1
+
+    # === Muestreo de pilas (hilo aparte) ===
+    def _iniciar_muestreo(self):
+        self._hilo_bucle = threading.get_ident()
+        self._muestreador = threading.Thread(target=self._muestrear, daemon=True, name='perfil-muestreo')
+        self._muestreador.start()
+
+    def _muestrear(self):
+        while not self._detener.wait(self._muestreo_s):
+            frame = sys._current_frames().get(self._hilo_bucle)
+            if frame is None:
+                continue
+            pila = tuple(f"{fs.name} ({fs.filename.rsplit('/', 1)[-1]}:{fs.lineno})"
+                         for fs in traceback.extract_stack(frame)[-6:])
+            self._muestras.append(pila)
+
+    def detener(self):
+        self._detener.set()
+
+    # === Reporte ===
+    def reporte(self):
+        ms = lambda ns: ns / 1e6
+        total_etapas = sum(h.total for h in self.etapas.values()) or 1
+        lineas = [
+            f"[Perfil] {self.frames.n} frames | media {ms(self.frames.total / max(self.frames.n, 1)):.2f} ms"
+            f" | p95 {ms(self.frames.percentil(95)):.2f} ms | máx {ms(self.frames.maximo):.2f} ms",
+            f"{'etapa':<12}{'n':>8}{'media ms':>10}{'p50':>8}{'p95':>8}{'p99':>8}{'máx':>9}{'%':>7}",
+        ]
+        for nombre, h in self.etapas.items():
+            if not h.n:
+                continue
+            lineas.append(
+                f"{nombre:<12}{h.n:>8}{ms(h.total / h.n):>10.3f}{ms(h.percentil(50)):>8.2f}"
+                f"{ms(h.percentil(95)):>8.2f}{ms(h.percentil(99)):>8.2f}{ms(h.maximo):>9.2f}"
+                f"{100.0 * h.total / total_etapas:>7.1f}"
+            )
+        if self.frame_lento_ns is not None:
+            lineas.append(f"[Perfil] Frames lentos (>= {ms(self.frame_lento_ns):.0f} ms): {self.frames_lentos}")
+            for pila, n in self.pilas_lentas.most_common(self.max_pilas):
+                lineas.append(f"  {n} muestras:")
+                lineas.extend(f"      {linea}" for linea in pila)
+        return '\n'.join(lineas)
+
+
+class _PerfiladorNulo:
+    """Misma interfaz que PerfiladorEtapas, sin medir nada."""
+    activo = False
+
+    def inicio_frame(self):
+        return 0
+
+    def etapa(self, nombre, desde):
+        return 0
+
+    def fin_frame(self, inicio):
+        pass
+
+    def detener(self):
+        pass
+
+    def reporte(self):
+        return "[Perfil] Perfilador deshabilitado."
+
+
+PERFIL_NULO = _PerfiladorNulo()
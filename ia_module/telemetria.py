@@ -0,0 +1,146 @@
+# ia_module/telemetria.py
+"""
+Resumen por minuto del detector para el backend.
+
+Sin telemetría el servidor solo sabe de una sesión cuando llega una alerta: un
+conductor tranquilo y una cámara rota se ven igual. Cada minuto de reloj se
+resume en un registro de pocos números (CAMPOS):
+
+    minuto     inicio del minuto (epoch, s)
+    ear_media, ear_min, ear_p10   EAR de los frames con rostro
+    rostro     fracción de frames con rostro detectado
+    cierres    ojos que pasan de abiertos a cerrados (parpadeos incluidos)
+    fps        frames procesados por segundo
+    cpu        % de CPU del proceso (todos los hilos) durante el minuto
+    perclos    PERCLOS al cierre del minuto
+
+Los EAR del minuto se guardan en un arreglo numpy de tamaño fijo (O(1) por
+frame); el percentil se calcula una vez al cerrar el minuto. Cada
+`minutos_por_lote` registros se suben juntos en un hilo aparte con la función
+`enviar(filas) -> bool`; si falla, quedan pendientes (hasta `max_pendientes`,
+se descartan los más viejos) y van en el lote siguiente.
+"""
+import gzip
+import json
+import logging
+import threading
+import time
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+CAMPOS = ('minuto', 'ear_media', 'ear_min', 'ear_p10', 'rostro', 'cierres', 'fps', 'cpu', 'perclos')
+
+
+def empaquetar(id_usuario, id_vehiculo, filas):
+    """Cuerpo del POST /api/telemetria: JSON columnar comprimido con gzip."""
+    cuerpo = json.dumps({
+        "id_usuario": id_usuario, "id_vehiculo": id_vehiculo, "campos": CAMPOS, "filas": filas,
+    }, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(cuerpo)
+
+
+def _redondear(valor, decimales=3):
+    return None if valor is None else round(float(valor), decimales)
+
+
+class TelemetriaDetector:
+    def __init__(self, enviar, minutos_por_lote=5, max_pendientes=120, fps_max=60):
+        self.enviar = enviar
+        self.minutos_por_lote = minutos_por_lote
+        self.max_pendientes = max_pendientes
+        self._ears = np.empty(fps_max * 60, dtype=np.float32)
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._minuto = None
+
+    def _iniciar(self, minuto, ahora):
+        self._minuto = minuto
+        self._inicio = ahora
+        self._ultimo = ahora
+        self._cpu_inicio = time.process_time()
+        self._n_ears = 0
+        self._frames = 0
+        self._con_rostro = 0
+        self._cierres = 0
+        self._cerrado = False
+        self._perclos = None
+
+    def frame(self, ahora, ear, cerrado, perclos=None):
+        """Registra un frame procesado. `ear` es None si no se detectó rostro."""
+        minuto = int(ahora // 60)
+        if self._minuto is None:
+            self._iniciar(minuto, ahora)
+        elif minuto != self._minuto:
+            self._cerrar_minuto()
+            self._iniciar(minuto, ahora)
+        self._frames += 1
+        self._ultimo = ahora
+        if ear is None:
+            self._cerrado = False
+            return
+        self._con_rostro += 1
+        if self._n_ears < len(self._ears):
+            self._ears[self._n_ears] = ear
+            self._n_ears += 1
+        if cerrado and not self._cerrado:
+            self._cierres += 1
+        self._cerrado = cerrado
+        if perclos is not None:
+            self._perclos = perclos
+
+    def _cerrar_minuto(self):
+        if not self._frames:
+            return
+        duracion = self._ultimo - self._inicio
+        ears = self._ears[:self._n_ears]
+        fila = [
+            self._minuto * 60,
+            _redondear(ears.mean()) if len(ears) else None,
+            _redondear(ears.min()) if len(ears) else None,
+            _redondear(np.percentile(ears, 10)) if len(ears) else None,
+            _redondear(self._con_rostro / self._frames),
+            self._cierres,
+            _redondear(self._frames / duracion, 1) if duracion > 0 else None,
+            _redondear((time.process_time() - self._cpu_inicio) / duracion * 100.0, 1) if duracion > 0 else None,
+            _redondear(self._perclos),
+        ]
+        self._frames = 0
+        with self._lock:
+            self._pendientes.append(fila)
+            if len(self._pendientes) > self.max_pendientes:
+                descartados = len(self._pendientes) - self.max_pendientes
+                del self._pendientes[:descartados]
+                log.warning("Telemetría: %s minutos sin poder enviarse fueron descartados.", descartados)
+            listos = len(self._pendientes) >= self.minutos_por_lote
+        if listos:
+            self._subir_en_segundo_plano()
+
+    def _subir_en_segundo_plano(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return   # el lote en curso; lo nuevo va en el siguiente
+        self._hilo = threading.Thread(target=self._subir, daemon=True, name='telemetria')
+        self._hilo.start()
+
+    def _subir(self):
+        with self._lock:
+            lote, self._pendientes = self._pendientes, []
+        if not lote:
+            return True
+        try:
+            ok = self.enviar(lote)
+        except Exception as e:
+            log.warning("Telemetría: error al enviar %s minutos: %s", len(lote), e)
+            ok = False
+        if not ok:
+            with self._lock:
+                self._pendientes = (lote + self._pendientes)[-self.max_pendientes:]
+        return ok
+
+    def cerrar(self, timeout=10.0):
+        """Al terminar el bucle: cierra el minuto en curso y envía lo pendiente (bloquea)."""
+        self._cerrar_minuto()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+        return self._subir()
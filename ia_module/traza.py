@@ -0,0 +1,237 @@
+# ia_module/traza.py
+"""
+Archivo de la señal EAR cruda por sesión (timestamps, EAR y rostro sí/no).
+
+Escritura (GrabadorTraza), sin costo apreciable para el bucle del detector:
+- Cada frame se copia a un búfer numpy preasignado (O(1), sin asignaciones).
+- Al llenarse el bloque (o pasar `segundos_bloque`) el búfer se entrega a un
+  hilo escritor y el bucle sigue con otro de un pool fijo. Si el disco se atrasa
+  y no hay búfer libre, se descarta ese bloque (se cuenta y se avisa): nunca se espera.
+- El hilo codifica por deltas (tiempo en µs, EAR cuantizado a 1e-4) y guarda
+  cada bloque comprimido como bloque_NNNNN.npz, más un índice indice.npy
+  (inicio, fin, muestras por bloque). Una jornada de 10 h a 30 FPS ocupa pocos MB.
+
+Lectura (LectorTraza): los .npz comprimidos no se pueden mapear a memoria, así
+que se mapea el índice y solo se descomprimen los bloques que tocan el rango
+pedido (con un LRU pequeño de bloques decodificados).
+
+Estructura: <base>/usuario_<id>/<AAAAMMDD_HHMMSS>/{meta.json, indice.npy, bloque_*.npz}
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+ESCALA_EAR = 10000   # EAR guardado como entero: resolución 1e-4
+FORMATO_DIR = '%Y%m%d_%H%M%S'
+
+
+def _vacia():
+    return np.empty(0), np.empty(0, dtype=np.float32), np.empty(0, dtype=bool)
+
+def _epoch(valor):
+    if valor is None:
+        return None
+    return valor.timestamp() if isinstance(valor, datetime) else float(valor)
+
+
+# ==========================
+# CODIFICACIÓN
+# ==========================
+def codificar_bloque(t, ear, rostro):
+    """Arrays de un bloque -> dict listo para np.savez_compressed."""
+    t0 = float(t[0])
+    us = np.round((t - t0) * 1e6).astype(np.int64)
+    q = np.where(rostro, np.round(np.nan_to_num(ear) * ESCALA_EAR), 0).astype(np.int32)
+    return {
+        't0': np.float64(t0),
+        'dt_us': np.clip(np.diff(us), 0, np.iinfo(np.uint32).max).astype(np.uint32),
+        'ear_delta': np.diff(q, prepend=0).astype(np.int16),
+        'rostro': np.packbits(rostro),
+        'n': np.int64(len(t)),
+    }
+
+def decodificar_bloque(datos):
+    """Inverso de codificar_bloque: (t float64, ear float32 con NaN sin rostro, rostro bool)."""
+    n = int(datos['n'])
+    us = np.concatenate(([0], np.cumsum(datos['dt_us'], dtype=np.int64)))
+    t = float(datos['t0']) + us / 1e6
+    ear = (np.cumsum(datos['ear_delta'], dtype=np.int32) / ESCALA_EAR).astype(np.float32)
+    rostro = np.unpackbits(datos['rostro'], count=n).astype(bool)
+    ear[~rostro] = np.nan
+    return t, ear, rostro
+
+
+# ==========================
+# ESCRITURA
+# ==========================
+class GrabadorTraza:
+    def __init__(self, directorio, muestras_bloque=4096, segundos_bloque=60.0, buferes=3, meta=None):
+        self.directorio = directorio
+        self.muestras_bloque = muestras_bloque
+        self.segundos_bloque = segundos_bloque
+        self.bloques_descartados = 0
+        os.makedirs(directorio, exist_ok=True)
+        with open(os.path.join(directorio, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'escala_ear': ESCALA_EAR, **(meta or {})}, f)
+
+        self._libres = queue.Queue()
+        for _ in range(buferes):
+            self._libres.put(self._nuevo_bufer())
+        self._pendientes = queue.Queue()
+        self._actual = self._libres.get_nowait()
+        self._n = 0
+        self._siguiente_bloque = 0
+        self._indice = []
+        self._hilo = threading.Thread(target=self._escribir, daemon=True, name='traza-ear')
+        self._hilo.start()
+
+    def _nuevo_bufer(self):
+        return (np.empty(self.muestras_bloque, dtype=np.float64),
+                np.empty(self.muestras_bloque, dtype=np.float32),
+                np.empty(self.muestras_bloque, dtype=bool))
+
+    def agregar(self, t, ear):
+        """Un frame: `ear` es None si no se detectó rostro."""
+        tiempos, ears, rostros = self._actual
+        i = self._n
+        tiempos[i] = t
+        if ear is None:
+            ears[i] = np.nan
+            rostros[i] = False
+        else:
+            ears[i] = ear
+            rostros[i] = True
+        self._n = i + 1
+        if self._n == self.muestras_bloque or t - tiempos[0] >= self.segundos_bloque:
+            self._rotar()
+
+    def _rotar(self):
+        if not self._n:
+            return
+        try:
+            libre = self._libres.get_nowait()
+        except queue.Empty:
+            # El escritor va atrasado: se pierde este bloque antes que frenar el bucle
+            self.bloques_descartados += 1
+            log.warning("Traza EAR: escritura atrasada, bloque descartado (%s en total).", self.bloques_descartados)
+            self._n = 0
+            return
+        self._pendientes.put((self._siguiente_bloque, self._actual, self._n))
+        self._siguiente_bloque += 1
+        self._actual = libre
+        self._n = 0
+
+    def _escribir(self):
+        while True:
+            item = self._pendientes.get()
+            if item is None:
+                return
+            numero, bufer, n = item
+            try:
+                tiempos, ears, rostros = bufer
+                datos = codificar_bloque(tiempos[:n], ears[:n], rostros[:n])
+                ruta = os.path.join(self.directorio, f'bloque_{numero:05d}.npz')
+                with open(ruta + '.tmp', 'wb') as f:
+                    np.savez_compressed(f, **datos)
+                os.replace(ruta + '.tmp', ruta)
+                self._indice.append((tiempos[0], tiempos[n - 1], n, numero))
+                indice = os.path.join(self.directorio, 'indice.npy')
+                with open(indice + '.tmp', 'wb') as f:
+                    np.save(f, np.array(self._indice, dtype=np.float64))
+                os.replace(indice + '.tmp', indice)
+            except Exception as e:
+                log.error("Traza EAR: no se pudo escribir el bloque %s: %s", numero, e)
+            finally:
+                self._libres.put(bufer)
+
+    def cerrar(self, timeout=10.0):
+        """Guarda el bloque en curso y espera al escritor."""
+        if self._n:
+            # Ya no se escribe más: el búfer actual va al escritor sin pedir uno libre
+            self._pendientes.put((self._siguiente_bloque, self._actual, self._n))
+            self._n = 0
+        self._pendientes.put(None)
+        self._hilo.join(timeout)
+
+
+def directorio_sesion(base, id_usuario, inicio=None):
+    inicio = inicio or datetime.now()
+    return os.path.join(base, f'usuario_{id_usuario}', inicio.strftime(FORMATO_DIR))
+
+
+# ==========================
+# LECTURA
+# ==========================
+class LectorTraza:
+    # Columnas de indice.npy
+    INICIO, FIN, MUESTRAS, BLOQUE = range(4)
+
+    def __init__(self, directorio, cache_bloques=8):
+        self.directorio = directorio
+        ruta = os.path.join(directorio, 'indice.npy')
+        self.indice = np.load(ruta, mmap_mode='r') if os.path.exists(ruta) else np.empty((0, 4))
+        self._cache = OrderedDict()
+        self._cache_max = cache_bloques
+
+    @property
+    def inicio(self):
+        return float(self.indice[0, self.INICIO]) if len(self.indice) else None
+
+    @property
+    def fin(self):
+        return float(self.indice[-1, self.FIN]) if len(self.indice) else None
+
+    @property
+    def muestras(self):
+        return int(np.sum(self.indice[:, self.MUESTRAS]))
+
+    def _bloque(self, numero):
+        datos = self._cache.get(numero)
+        if datos is None:
+            with np.load(os.path.join(self.directorio, f'bloque_{numero:05d}.npz')) as npz:
+                datos = decodificar_bloque(npz)
+            self._cache[numero] = datos
+            if len(self._cache) > self._cache_max:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(numero)
+        return datos
+
+    def rango(self, desde=None, hasta=None):
+        """(t, ear, rostro) con desde <= t <= hasta (epoch o datetime; None = sin límite)."""
+        desde, hasta = _epoch(desde), _epoch(hasta)
+        primero = 0 if desde is None else int(np.searchsorted(self.indice[:, self.FIN], desde, 'left'))
+        ultimo = len(self.indice) if hasta is None else int(np.searchsorted(self.indice[:, self.INICIO], hasta, 'right'))
+        partes = []
+        for fila in range(primero, ultimo):
+            t, ear, rostro = self._bloque(int(self.indice[fila, self.BLOQUE]))
+            a = 0 if desde is None else np.searchsorted(t, desde, 'left')
+            b = len(t) if hasta is None else np.searchsorted(t, hasta, 'right')
+            partes.append((t[a:b], ear[a:b], rostro[a:b]))
+        if not partes:
+            return _vacia()
+        return tuple(np.concatenate(col) for col in zip(*partes))
+
+
+def leer_traza(base, id_usuario, desde=None, hasta=None):
+    """Une las trazas del usuario (una por jornada del detector) que se solapan con el rango."""
+    carpeta = os.path.join(base, f'usuario_{id_usuario}')
+    if not os.path.isdir(carpeta):
+        return _vacia()
+    d, h = _epoch(desde), _epoch(hasta)
+    partes = []
+    for nombre in sorted(os.listdir(carpeta)):
+        lector = LectorTraza(os.path.join(carpeta, nombre))
+        if lector.inicio is None or (h is not None and lector.inicio > h) or (d is not None and lector.fin < d):
+            continue
+        partes.append(lector.rango(d, h))
+    if not partes:
+        return _vacia()
+    return tuple(np.concatenate(col) for col in zip(*partes))
@@ -1,16 +1,17 @@
 from app import create_app
-from database.conexion import db
+from database.migraciones import inicializar_base
 import webbrowser
 from threading import Timer
 
 app = create_app()
-
-with app.app_context():
-    db.create_all()
     
 def open_browser():
     webbrowser.open_new("http://127.0.0.1:5000/login")
     
 if __name__ == "__main__":
+    # Tablas y migraciones al lanzar el servidor, no al importar `main`
+    # (flask CLI, pruebas y servidores WSGI no pagan este costo al cargar la app)
+    with app.app_context():
+        inicializar_base()
     Timer(1, open_browser).start()
-    app.run(host="0.0.0.0", port=5000, debug=False)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5000, debug=False)
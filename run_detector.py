@@ -1,54 +1,10 @@
 import argparse
-import time
-from datetime import datetime
-import requests
-import cv2
 import threading
 
 from ia_module.mediapipe_detector import SomnolenceDetector, DetectorConfig
-
-
-def nivel_por_duracion(seg: float) -> str:
-    if seg < 2.0:
-        return "bajo"
-    elif seg < 4.0:
-        return "medio"
-    return "critico"
-
-
-def post_alerta(server: str, id_usuario: int, id_vehiculo: int, duracion: float, frame):
-    url = f"{server.rstrip('/')}/api/alertas"
-    
-    data = {
-        "id_usuario": str(id_usuario),
-        "id_vehiculo": str(id_vehiculo),
-        "duracion": str(round(duracion, 2)),
-        "nota": f"EAR por debajo de umbral (auto) @ {datetime.now().isoformat(timespec='seconds')}",
-        "nivel_somnolencia": nivel_por_duracion(duracion)
-    }
-
-    files = None
-    if frame is not None:
-        try:
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = buffer.tobytes()
-            
-            files = {
-                'evidencia_img': ('evidencia.jpg', frame_bytes, 'image/jpeg')
-            }
-            print("[API] Adjuntando imagen de evidencia.")
-        except Exception as e:
-            print(f"[API] Error al codificar la imagen: {e}")
-
-    try:
-        r = requests.post(url, data=data, files=files, timeout=5)
-        
-        if r.status_code >= 400:
-            print(f"[API] Error {r.status_code}: {r.text}")
-        else:
-            print(f"[API] Alerta enviada: {data['nivel_somnolencia']} ({data['duracion']}s)")
-    except requests.RequestException as e:
-        print(f"[API] Error de red: {e}")
+from ia_module.fuentes import crear_fuente, parsear_resolucion
+from app.utils.detector_launcher import ejecutar_bucle
+from app.utils.logs import configurar_logging
 
 
 def main():
@@ -57,42 +13,76 @@ def main():
     parser.add_argument("--user", type=int, required=True, help="ID de usuario (conductOR)")
     parser.add_argument("--vehiculo", type=int, required=True, help="ID de vehiculo")
     parser.add_argument("--camera", type=int, default=0, help="Indice de camara (0 por defecto)")
+    parser.add_argument("--fuente", default=None,
+                        help="Fuente de video: indice o /dev/videoN, URL rtsp/http, ruta de video o 'sintetica' "
+                             "(por defecto --camera)")
+    parser.add_argument("--resolucion", default="640x480", help="Resolucion pedida a la camara (ANCHOxALTO)")
+    parser.add_argument("--fps", type=int, default=30, help="FPS pedidos a la camara")
+    parser.add_argument("--fourcc", default="MJPG", help="Formato pedido a la camara (MJPG, YUYV...)")
     parser.add_argument("--minclose", type=float, default=1.5, help="Segundos min. ojos cerrados para alerta")
     parser.add_argument("--calib", type=float, default=3.0, help="Segundos de calibracion inicial")
     parser.add_argument("--ratio", type=float, default=0.75, help="Umbral = EAR_base * ratio (0-1)")
+    parser.add_argument("--perclos", type=float, default=0.15,
+                        help="Alerta si PERCLOS (fracción del último minuto con ojos cerrados) lo alcanza; 0 = desactivada")
+    parser.add_argument("--profile", action="store_true", help="Medir cada etapa del bucle e imprimir el reporte al salir")
+    parser.add_argument("--profile-slow-ms", type=float, default=None,
+                        help="Con --profile: frames más lentos que esto (ms) se cuentan aparte")
+    parser.add_argument("--profile-sample-ms", type=float, default=None,
+                        help="Con --profile-slow-ms: muestrea la pila cada N ms y reporta dónde se fue el tiempo")
+    parser.add_argument("--backend", default="face_mesh", choices=("face_mesh", "face_landmarker"),
+                        help="Backend de rostro: API clasica FaceMesh o MediaPipe Tasks FaceLandmarker")
+    parser.add_argument("--modelo", default=None, help="Con face_landmarker: ruta del modelo .task")
+    parser.add_argument("--senal-ojos", default="blendshapes", choices=("blendshapes", "ear"),
+                        help="Con face_landmarker: blendshapes eyeBlink* o EAR sobre los landmarks")
+    parser.add_argument("--log-level", default="INFO", help="Nivel de log (DEBUG, INFO, WARNING...)")
     args = parser.parse_args()
+    configurar_logging(args.log_level)
 
     cfg = DetectorConfig(
         calibration_seconds=args.calib,
         threshold_ratio=args.ratio,
         min_close_seconds=args.minclose,
-        draw_landmarks=True
+        perclos_threshold=args.perclos,
+        draw_landmarks=True,
+        profile=args.profile,
+        profile_slow_ms=args.profile_slow_ms,
+        profile_sample_ms=args.profile_sample_ms,
+        backend=args.backend,
+        eye_signal=args.senal_ojos,
     )
+    if args.modelo:
+        cfg.landmarker_model_path = args.modelo
 
     det = SomnolenceDetector(cfg)
 
-    def loop_detector():
-        det.run(camera_index=args.camera)
-
-    t = threading.Thread(target=loop_detector, daemon=True)
-    t.start()
-
-    print("[Main] Enviará alertas a:", args.server)
+    ancho, alto = parsear_resolucion(args.resolucion)
+    fuente = args.fuente if args.fuente is not None else str(args.camera)
+    cap = None
+    stop_flag = threading.Event()
     try:
-        while t.is_alive():
-            
-            result = det.consume_alert_if_ready() 
-            
-            if result is not None:
-                duracion, frame = result 
-                post_alerta(args.server, args.user, args.vehiculo, duracion, frame)
-                
-            time.sleep(0.1)
+        cap = crear_fuente(fuente, ancho, alto, fps=args.fps, fourcc=args.fourcc)
+        if not cap.isOpened():
+            print(f"[Main] Error: no se pudo abrir la fuente de video ({cap.descripcion}).")
+            return
+        det.calibrate(cap)
+
+        print("[Main] Enviará alertas a:", args.server)
+        ejecutar_bucle(det, cap, args.user, args.vehiculo, stop_flag, server=args.server)
     except KeyboardInterrupt:
-        pass
-
+        stop_flag.set()
+    finally:
+        det._stop_beep()
+        if cap is not None:
+            cap.release()
+        det.backend.close()
+        det.perfil.detener()
+
+    if cap is not None:
+        print(cap.reporte())
+    if det.perfil.activo:
+        print(det.perfil.reporte())
     print("[Main] Saliendo...")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,150 @@
+# tests/carga_servidor.py
+"""
+Prueba de carga local: servidor de desarrollo (app.run) vs. waitress (wsgi.py).
+
+    python tests/carga_servidor.py [--concurrencia 16] [--segundos 10] [--hilos 8]
+
+Levanta cada servidor en un subproceso sobre una base SQLite temporal con datos
+de ejemplo, lo carga con N clientes concurrentes (keep-alive) contra un endpoint
+trivial y uno con consulta a la base, e imprime peticiones/s y latencias.
+No la recoge pytest (no empieza con test_): tarda y depende de puertos libres.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+RUTAS = ('/', '/api/alertas?limite=50')
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _preparar_base(env, alertas=2000):
+    os.environ.update(env)
+    from app import create_app
+    from app.models import Usuario, Vehiculo, Alerta
+    from database.conexion import db
+    from database.migraciones import inicializar_base
+
+    app = create_app()
+    with app.app_context():
+        inicializar_base()
+        u = Usuario(nombre="Carga", username="carga", password_hash="x", rol="conductor")
+        v = Vehiculo(codigo="CARGA-1")
+        db.session.add_all([u, v])
+        db.session.commit()
+        inicio = datetime.now() - timedelta(days=30)
+        for i in range(alertas):
+            ts = inicio + timedelta(minutes=i * 7)
+            db.session.add(Alerta(id_usuario=u.id, id_vehiculo=v.id, fecha=ts.date(), hora=ts.time(),
+                                  timestamp=ts, duracion=2.0, nivel_somnolencia='bajo'))
+        db.session.commit()
+
+
+def _levantar(modo, puerto, hilos, env):
+    if modo == 'app.run':
+        codigo = (f"from app import create_app; "
+                  f"create_app().run(host='127.0.0.1', port={puerto}, debug=False)")
+        cmd = [sys.executable, '-c', codigo]
+    else:
+        cmd = [sys.executable, 'wsgi.py', '--host', '127.0.0.1', '--port', str(puerto), '--hilos', str(hilos)]
+    proc = subprocess.Popen(cmd, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=0.5).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{modo} no respondió en el puerto {puerto}")
+
+
+def _cargar(base, ruta, concurrencia, segundos):
+    import requests
+
+    latencias, errores = [], [0]
+    lock = threading.Lock()
+    fin = time.perf_counter() + segundos
+
+    def cliente():
+        sesion = requests.Session()
+        propias, fallos = [], 0
+        while time.perf_counter() < fin:
+            t = time.perf_counter()
+            try:
+                r = sesion.get(base + ruta, timeout=10)
+                if r.status_code != 200:
+                    fallos += 1
+            except requests.RequestException:
+                fallos += 1
+            propias.append(time.perf_counter() - t)
+        with lock:
+            latencias.extend(propias)
+            errores[0] += fallos
+
+    hilos = [threading.Thread(target=cliente) for _ in range(concurrencia)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    latencias.sort()
+    n = len(latencias)
+    return {
+        'rps': n / segundos,
+        'p50': latencias[n // 2] * 1000 if n else 0.0,
+        'p95': latencias[int(n * 0.95)] * 1000 if n else 0.0,
+        'errores': errores[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--segundos', type=float, default=10.0)
+    parser.add_argument('--hilos', type=int, default=8, help='Hilos de waitress')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'carga.db')}",
+                   SECRET_KEY='carga', APP_DISABLE_DETECTOR='1', LOG_NIVEL='WARNING',
+                   SQL_SERVER_TIMING='False')
+        _preparar_base(env)
+
+        resultados = {}
+        for modo in ('app.run', 'waitress'):
+            puerto = _puerto_libre()
+            proc = _levantar(modo, puerto, args.hilos, env)
+            try:
+                for ruta in RUTAS:
+                    _cargar(f"http://127.0.0.1:{puerto}", ruta, 2, 1.0)   # calentamiento
+                    resultados[(modo, ruta)] = _cargar(f"http://127.0.0.1:{puerto}", ruta,
+                                                       args.concurrencia, args.segundos)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    print(f"\n{args.concurrencia} clientes, {args.segundos:.0f}s por ruta, waitress con {args.hilos} hilos\n")
+    print(f"{'servidor':<10}{'ruta':<26}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errores':>9}")
+    for (modo, ruta), r in resultados.items():
+        print(f"{modo:<10}{ruta:<26}{r['rps']:>9.1f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['errores']:>9}")
+    for ruta in RUTAS:
+        base = resultados[('app.run', ruta)]['rps'] or 1.0
+        print(f"waitress / app.run en {ruta}: {resultados[('waitress', ruta)]['rps'] / base:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,8 @@ import sys
 import pytest
 import sqlalchemy as sa
 os.environ["APP_DISABLE_DETECTOR"] = "1"
+# Cada POST /api/alertas crea su fila; tests/test_agrupacion_alertas.py activa la ventana
+os.environ["ALERTAS_VENTANA_AGRUPACION"] = "0"
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if PROJECT_ROOT not in sys.path:
@@ -51,5 +53,61 @@ def _clean_db(app):
         for table in reversed(db.metadata.sorted_tables):
             db.session.execute(table.delete())
         db.session.commit()
+        # Las respuestas en caché de un test no deben verse en el siguiente
+        from app.utils.cache import cache
+        cache.backend.clear()
+        from app.utils.usuarios_sesion import usuarios_sesion
+        usuarios_sesion.backend.clear()
         if db.engine.dialect.name == "sqlite":
             db.session.execute(sa.text("PRAGMA foreign_keys=ON;"))
+    # Las peticiones reutilizan el app context de la sesión (su `g` y su sesión de
+    # SQLAlchemy): sin esto se verían el usuario y los objetos del test anterior
+    from flask import g
+    g.pop('_login_user', None)
+    db.session.remove()
+
+
+# === Detector falso para probar el bucle (app/utils/detector_launcher.ejecutar_bucle) ===
+class _CamaraFalsa:
+    """`n` frames negros y luego fin de stream. Con `fallar_en`, read() lanza en ese frame."""
+
+    def __init__(self, n, fallar_en=None):
+        self.n = n
+        self.leidos = 0
+        self.fallar_en = fallar_en
+
+    def read(self):
+        import numpy as np
+        if self.leidos == self.fallar_en:
+            raise RuntimeError("cámara desconectada")
+        if self.leidos == self.n:
+            return False, None
+        self.leidos += 1
+        return True, np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+def _nuevo_detector_falso():
+    from types import SimpleNamespace
+    from ia_module.fatiga import MedidorFatiga
+    from ia_module.perfilador import PerfiladorEtapas
+    estado = SimpleNamespace(threshold_ear=0.2, no_face_start_ts=None, no_face_alert_sent=False,
+                             closed_start_ts=None, critical_alert_sent=False, alert_start_frame=None,
+                             last_alert_duration=0.0, total_somnolencia_time=0.0,
+                             perclos=0.0, blink_rate=0.0, blink_mean_duration=0.0)
+    return SimpleNamespace(
+        perfil=PerfiladorEtapas(), state=estado, cfg=SimpleNamespace(min_close_seconds=1.5),
+        backend=SimpleNamespace(procesar=lambda frame: None),
+        _calc_ears=lambda frame, results: (0.3, 0.3),
+        _start_beep=lambda: None, _stop_beep=lambda: None,
+        consume_alert_if_ready=lambda: None,
+        fatiga=MedidorFatiga(), update_fatigue_metrics=lambda now, ear: False,
+    )
+
+@pytest.fixture()
+def detector_falso():
+    """Detector ya calibrado que ve siempre ojos abiertos (EAR 0.3)."""
+    return _nuevo_detector_falso()
+
+@pytest.fixture()
+def camara_falsa():
+    return _CamaraFalsa
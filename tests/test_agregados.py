@@ -0,0 +1,32 @@
+# tests/test_agregados.py
+from datetime import datetime, timedelta
+from database.conexion import db
+from app.models import Usuario, Vehiculo, Alerta, SesionConduccion, AgregadoAlertasHora
+from app.utils import agregados
+
+def test_agregados_incrementales_igual_a_reconstruccion(app):
+    with app.app_context():
+        u = Usuario(nombre="C", username="c1", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="T01")
+        db.session.add_all([u, v]); db.session.commit()
+
+        fin = datetime.now().replace(hour=1, minute=0, second=0, microsecond=0)
+        s = SesionConduccion(id_usuario=u.id, id_vehiculo=v.id,
+                             fecha_inicio=fin - timedelta(hours=3), fecha_fin=fin, estado='finalizada')
+        db.session.add(s)
+        for minutos in (10, 20, 70):
+            ts = fin - timedelta(minutes=minutos)
+            a = Alerta(id_usuario=u.id, id_vehiculo=v.id, timestamp=ts, fecha=ts.date(),
+                       hora=ts.time(), duracion=2.0, nivel_somnolencia='bajo')
+            db.session.add(a)
+            agregados.registrar_alerta(a)
+        agregados.registrar_sesion_finalizada(s)
+        db.session.commit()
+
+        incremental = (agregados.alertas_por_hora_del_dia(), agregados.horas_por_usuario())
+        assert incremental[0][0] == 2 and incremental[0][23] == 1
+        assert round(incremental[1][u.id], 2) == 3.0
+
+        agregados.reconstruir_agregados()
+        assert AgregadoAlertasHora.query.count() == 2
+        assert (agregados.alertas_por_hora_del_dia(), agregados.horas_por_usuario()) == incremental
@@ -0,0 +1,90 @@
+# tests/test_agrupacion_alertas.py
+import time
+import pytest
+from database.conexion import db
+from app.models import Usuario, Vehiculo, Alerta, ResumenSesion
+from app.utils import agregados, resumen_sesion
+from app.utils.agrupacion_alertas import agrupador_alertas
+
+@pytest.fixture()
+def ventana(monkeypatch):
+    def activar(segundos):
+        monkeypatch.setattr(agrupador_alertas, 'ventana', segundos)
+    yield activar
+    agrupador_alertas.vaciar()
+
+def _conductor(app):
+    with app.app_context():
+        u = Usuario(nombre="Conductor A", username="ca", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="A01")
+        db.session.add_all([u, v]); db.session.commit()
+        return u.id, v.id
+
+def _alerta(client, uid, vid, duracion, nivel="medio"):
+    r = client.post("/api/alertas", data={"id_usuario": uid, "id_vehiculo": vid,
+                                          "duracion": duracion, "nivel_somnolencia": nivel})
+    assert r.status_code == 201
+    return r.get_json()
+
+def test_rafaga_se_fusiona_en_una_alerta(client, app, ventana):
+    ventana(30)
+    uid, vid = _conductor(app)
+    assert "agrupada_en" not in _alerta(client, uid, vid, 1.0)
+    id_agrupada = _alerta(client, uid, vid, 3.0)["agrupada_en"]
+    assert _alerta(client, uid, vid, 2.0)["agrupada_en"] == id_agrupada
+    _alerta(client, uid, vid, 4.0, nivel="alto")
+
+    alertas = client.get("/api/alertas").get_json()["alertas"]
+    assert len(alertas) == 2
+    assert next(a for a in alertas if a["id"] == id_agrupada)["ocurrencias"] == 1   # aún en memoria
+
+    agrupador_alertas.vaciar()
+    db.session.expire_all()
+    a = db.session.get(Alerta, id_agrupada)
+    assert (a.ocurrencias, a.duracion, a.duracion_max) == (3, 6.0, 3.0)
+    assert a.ultima_ocurrencia >= a.timestamp
+
+    resumen = db.session.get(ResumenSesion, a.id_sesion)
+    incremental = (resumen.alertas_total, resumen.alertas_medio, resumen.segundos_somnolencia,
+                   resumen.episodio_mas_largo)
+    assert incremental == (4, 3, 10.0, 4.0)
+    assert sum(agregados.alertas_por_hora_del_dia()) == 4
+
+    resumen_sesion.reconstruir_resumenes()
+    agregados.reconstruir_agregados()
+    resumen = db.session.get(ResumenSesion, a.id_sesion)
+    assert (resumen.alertas_total, resumen.alertas_medio, resumen.segundos_somnolencia,
+            resumen.episodio_mas_largo) == incremental
+    assert sum(agregados.alertas_por_hora_del_dia()) == 4
+
+def test_cierre_de_ventana_aplica_y_abre_otra(client, app, ventana):
+    ventana(0.2)
+    uid, vid = _conductor(app)
+    primera = _alerta(client, uid, vid, 1.0)
+    id_agrupada = _alerta(client, uid, vid, 2.0)["agrupada_en"]
+    time.sleep(0.5)   # el hilo aplica el grupo al cerrar la ventana
+
+    assert "agrupada_en" not in _alerta(client, uid, vid, 1.5)
+    db.session.expire_all()
+    assert db.session.get(Alerta, id_agrupada).ocurrencias == 2
+    assert Alerta.query.count() == 2
+    assert "agrupada_en" not in primera
+
+def test_no_se_fusionan_evidencias_ni_otros_tipos(client, app, ventana, tmp_path, monkeypatch):
+    import io
+    ventana(30)
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    uid, vid = _conductor(app)
+    datos = {"id_usuario": uid, "id_vehiculo": vid, "duracion": 12.0, "nivel_somnolencia": "critico",
+             "nota": "Alerta automática del detector"}
+    assert "agrupada_en" not in client.post("/api/alertas", data=datos).get_json()
+    # Misma sesión y nivel, pero con foto: se inserta aparte y la foto se guarda
+    con_foto = dict(datos, evidencia_img=(io.BytesIO(b"jpg"), "evidencia.jpg"))
+    r = client.post("/api/alertas", data=con_foto, content_type="multipart/form-data")
+    assert r.status_code == 201 and "agrupada_en" not in r.get_json()
+    # Otro tipo de alerta (obstrucción) con el mismo nivel: tampoco se mezcla
+    obstruccion = dict(datos, nota="ALERTA DE OBSTRUCCION: No se detecta rostro/camara tapada.")
+    assert "agrupada_en" not in client.post("/api/alertas", data=obstruccion).get_json()
+    assert Alerta.query.count() == 3
+    assert Alerta.query.filter(Alerta.evidencia_url.isnot(None)).count() == 1
+    assert len(list(tmp_path.iterdir())) == 1
@@ -22,4 +22,39 @@ def test_crear_alerta_201(client, app):
 
 def test_crear_alerta_400(client):
     r = client.post("/api/alertas", json={"id_usuario": 1})
-    assert r.status_code == 400
\ No newline at end of file
+    assert r.status_code == 400
+
+def _crear_alertas(app, n, nivel="bajo"):
+    from app.models import Alerta
+    with app.app_context():
+        u = Usuario(nombre="Conductor P", username="cp", password_hash="h")
+        v = Vehiculo(codigo="P01")
+        db.session.add_all([u, v]); db.session.commit()
+        for _ in range(n):
+            db.session.add(Alerta(id_usuario=u.id, id_vehiculo=v.id, duracion=1.0,
+                                  nivel_somnolencia=nivel))
+        db.session.commit()
+        return u.id
+
+def test_obtener_alertas_paginado_por_cursor(client, app):
+    _crear_alertas(app, 5)
+    r = client.get("/api/alertas?limite=2")
+    pagina = r.get_json()
+    assert len(pagina["alertas"]) == 2
+    ids = [a["id"] for a in pagina["alertas"]]
+
+    while pagina["siguiente_cursor"]:
+        pagina = client.get(f"/api/alertas?limite=2&cursor={pagina['siguiente_cursor']}").get_json()
+        ids.extend(a["id"] for a in pagina["alertas"])
+    assert ids == sorted(ids, reverse=True)
+    assert len(set(ids)) == 5
+
+def test_obtener_alertas_ndjson_filtrado(client, app):
+    import json
+    uid = _crear_alertas(app, 3, nivel="medio")
+    r = client.get(f"/api/alertas?formato=ndjson&id_usuario={uid}&nivel=MEDIO")
+    assert r.mimetype == "application/x-ndjson"
+    lineas = [json.loads(l) for l in r.data.decode().splitlines()]
+    assert len(lineas) == 3
+    assert all(l["nivel_somnolencia"] == "medio" for l in lineas)
+    assert client.get("/api/alertas?desde=ayer").status_code == 400
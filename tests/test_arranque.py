@@ -0,0 +1,53 @@
+# tests/test_arranque.py
+"""
+Presupuesto de arranque: create_app() en un proceso nuevo, con -X importtime.
+Falla si se carga alguna librería pesada al arrancar (deben importarse en la
+primera petición que las usa) o si se excede el presupuesto de tiempo.
+Los presupuestos son holgados; se ajustan con ARRANQUE_PRESUPUESTO_S y
+ARRANQUE_PRESUPUESTO_IMPORTS_S. Con `pytest -s` se imprimen las mediciones.
+"""
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PESADOS = ('pandas', 'numpy', 'cv2', 'requests', 'openpyxl', 'pyarrow', 'mediapipe')
+PRESUPUESTO_S = float(os.getenv('ARRANQUE_PRESUPUESTO_S', 2.0))
+PRESUPUESTO_IMPORTS_S = float(os.getenv('ARRANQUE_PRESUPUESTO_IMPORTS_S', 1.5))
+
+SCRIPT = """
+import json, sys, time
+inicio = time.perf_counter()
+from app import create_app
+create_app()
+print(json.dumps({'segundos': time.perf_counter() - inicio, 'modulos': sorted(sys.modules)}))
+"""
+
+
+def _medir():
+    env = dict(os.environ, DATABASE_URL='sqlite:///:memory:', SECRET_KEY='x', APP_DISABLE_DETECTOR='1')
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', SCRIPT], cwd=RAIZ, env=env,
+                         capture_output=True, text=True, timeout=120)
+    assert res.returncode == 0, res.stderr[-2000:]
+    datos = json.loads(res.stdout.strip().splitlines()[-1])
+    # "import time: self [us] | cumulative | paquete"; el acumulado de los módulos
+    # de primer nivel (un solo espacio de sangría) suma el tiempo total de imports
+    total_us = 0
+    for linea in res.stderr.splitlines():
+        partes = linea.split('|')
+        if linea.startswith('import time:') and len(partes) == 3 and partes[1].strip().isdigit():
+            if not partes[2].startswith('  '):
+                total_us += int(partes[1])
+    datos['imports_segundos'] = total_us / 1e6
+    return datos
+
+
+def test_arranque_sin_librerias_pesadas_y_dentro_del_presupuesto():
+    datos = _medir()
+    print(f"\n[Arranque] create_app(): {datos['segundos']:.3f}s | imports: {datos['imports_segundos']:.3f}s")
+
+    cargados = [m for m in PESADOS if m in datos['modulos']]
+    assert not cargados, f"Librerías pesadas importadas al arrancar: {cargados}"
+    assert datos['segundos'] <= PRESUPUESTO_S
+    assert datos['imports_segundos'] <= PRESUPUESTO_IMPORTS_S
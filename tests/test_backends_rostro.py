@@ -0,0 +1,101 @@
+# tests/test_backends_rostro.py
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from ia_module.backends_rostro import (BackendFaceLandmarker, crear_backend, ears_de_landmarks,
+                                      LEFT_EYE_IDX, RIGHT_EYE_IDX)
+from ia_module.comparar_backends import medir_backend, reporte, parsear_intervalos
+from ia_module.fuentes import FuenteSintetica
+
+
+def _landmarks(apertura):
+    """478 landmarks con ambos ojos de 0.2 de ancho y `apertura` de alto (normalizados)."""
+    puntos = [SimpleNamespace(x=0.0, y=0.0) for _ in range(478)]
+    for idx, x0 in ((LEFT_EYE_IDX, 0.3), (RIGHT_EYE_IDX, 0.6)):
+        p1, p2, p3, p4, p5, p6 = idx
+        puntos[p1] = SimpleNamespace(x=x0, y=0.5)
+        puntos[p4] = SimpleNamespace(x=x0 + 0.2, y=0.5)
+        for arriba, abajo, x in ((p2, p6, x0 + 0.07), (p3, p5, x0 + 0.13)):
+            puntos[arriba] = SimpleNamespace(x=x, y=0.5 - apertura / 2)
+            puntos[abajo] = SimpleNamespace(x=x, y=0.5 + apertura / 2)
+    return puntos
+
+
+def test_ear_de_landmarks():
+    izq, der = ears_de_landmarks(_landmarks(0.06), 100, 100)
+    assert izq == pytest.approx(0.3, abs=1e-4) and der == pytest.approx(0.3, abs=1e-4)
+
+
+def _landmarker_sin_modelo(senal='blendshapes'):
+    # La lógica de señal y timestamps no depende de mediapipe
+    backend = object.__new__(BackendFaceLandmarker)
+    backend.senal = senal
+    backend._ultimo_ts = -1
+    backend._indices_blendshapes = None
+    return backend
+
+
+def test_landmarker_apertura_por_blendshapes():
+    backend = _landmarker_sin_modelo()
+    categorias = [SimpleNamespace(category_name=n, score=s) for n, s in
+                  (('_neutral', 0.9), ('eyeBlinkLeft', 0.8), ('eyeBlinkRight', 1.0), ('jawOpen', 0.1))]
+    resultado = SimpleNamespace(face_landmarks=[_landmarks(0.06)], face_blendshapes=[categorias])
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    izq, der = backend.ojos(frame, resultado)
+    assert izq == pytest.approx(0.2) and der == 0.0   # ojo cerrado del todo: 0.0, no "sin rostro"
+    assert backend.ojos(frame, SimpleNamespace(face_landmarks=[], face_blendshapes=[])) == (None, None)
+
+    backend.senal = 'ear'
+    assert backend.ojos(frame, resultado)[0] == pytest.approx(0.3, abs=1e-4)
+
+
+def test_landmarker_timestamps_estrictamente_crecientes():
+    backend = _landmarker_sin_modelo()
+    assert [backend._timestamp_ms(t) for t in (0, 33.4, 33.4, 20, 100)] == [0, 33, 34, 35, 100]
+
+
+def test_configuracion_invalida():
+    cfg = SimpleNamespace(backend='face_landmarker', landmarker_model_path='/no/existe.task',
+                          eye_signal='blendshapes', min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    with pytest.raises(FileNotFoundError):
+        crear_backend(cfg)
+    with pytest.raises(ValueError):
+        crear_backend(SimpleNamespace(**{**vars(cfg), 'backend': 'otro'}))
+    with pytest.raises(ValueError):
+        BackendFaceLandmarker('/no/existe.task', senal='boca')
+
+
+def test_comparacion_de_backends():
+    """Backend falso: ojos abiertos (0.3) salvo en los frames 40-49, cerrados (0.05)."""
+    class Falso:
+        def __init__(self, desfase=0):
+            self.i = -1
+            self.desfase = desfase
+
+        def procesar(self, frame_rgb):
+            self.i += 1
+            return self.i
+
+        def ojos(self, frame, i):
+            return (0.05, 0.05) if 40 + self.desfase <= i < 50 + self.desfase else (0.3, 0.3)
+
+    resultados = {}
+    for nombre, desfase in (('a', 0), ('b', 5)):
+        fuente = FuenteSintetica(32, 24, frames_max=100, tiempo_real=False)
+        resultados[nombre] = medir_backend(Falso(desfase), fuente, fps_video=10.0, segundos_calibracion=3.0)
+    assert resultados['a']['umbral'] == pytest.approx(0.225)
+    assert resultados['a']['cerrado'].sum() == 10
+    texto = reporte(resultados, parsear_intervalos('4.0-4.9'))
+    assert 'a vs b: 90.0%' in texto
+    assert '100.0%' in texto.splitlines()[1]   # 'a' acierta todos los frames
+
+
+def test_hilo_del_detector_cierra_el_backend_si_no_abre_la_fuente(monkeypatch, detector_falso, tmp_path):
+    import ia_module.mediapipe_detector as mpd
+    from app.utils import detector_launcher
+    cerrados = []
+    detector_falso.backend.close = lambda: cerrados.append(True)
+    monkeypatch.setattr(mpd, 'SomnolenceDetector', lambda cfg: detector_falso)
+    monkeypatch.setenv('DETECTOR_FUENTE', str(tmp_path / 'no_existe.mp4'))
+    detector_launcher._detector_thread_func(1, 1)
+    assert cerrados == [True]
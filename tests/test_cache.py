@@ -0,0 +1,70 @@
+# tests/test_cache.py
+import time
+from database.conexion import db
+from app.models import Usuario
+from app.utils.cache import BackendMemoria, cache
+
+def test_backend_memoria_lru_y_ttl():
+    b = BackendMemoria(max_items=2, ttl=60)
+    b.set("a", 1); b.set("b", 2)
+    assert b.get("a") == 1          # "a" pasa a ser la más reciente
+    b.set("c", 3)                   # desaloja "b"
+    assert b.get("b") is None and b.get("c") == 3
+    b.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert b.get("d") is None
+
+def test_dashboard_se_calcula_una_vez_por_cambio(client, app, monkeypatch):
+    from app.routes import dashboard as dash
+    llamadas = []
+    original = dash._calcular_dashboard
+    monkeypatch.setattr(dash, "_calcular_dashboard", lambda rango: llamadas.append(rango) or original(rango))
+
+    with app.app_context():
+        admin = Usuario(nombre="Admin", username="adm", password_hash="h", rol="admin")
+        db.session.add(admin); db.session.commit()
+        uid = admin.id
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(uid)
+
+    assert client.get("/dashboard").status_code == 200
+    assert client.get("/dashboard").status_code == 200
+    assert len(llamadas) == 1
+
+    cache.invalidar("vehiculos")
+    r = client.get("/dashboard")
+    assert r.status_code == 200 and len(llamadas) == 2
+    assert client.get("/dashboard?rango=hoy").status_code == 200
+    assert llamadas == ["todo", "todo", "hoy"]
+
+def test_comandos_invalidan_la_cache_del_servidor(client, app, monkeypatch):
+    import requests
+    from types import SimpleNamespace
+    monkeypatch.setitem(app.config, 'CACHE_TOKEN', 'secreto')
+    monkeypatch.setattr("app.utils.agregados.reconstruir_agregados", lambda: 0)
+    assert client.post("/api/admin/cache/invalidar", json={"temas": ["alertas"]}).status_code == 403
+    assert client.post("/api/admin/cache/invalidar", json={"temas": "alertas"},
+                       headers={"Authorization": "Bearer secreto"}).status_code == 400
+
+    # El comando corre en otro proceso: su POST llega al servidor (aquí, el cliente de pruebas)
+    def post(url, json, headers, timeout):
+        r = client.post(url.split("5000", 1)[1], json=json, headers=headers)
+        def raise_for_status():
+            if r.status_code >= 400:
+                raise requests.HTTPError(r.status)
+        return SimpleNamespace(raise_for_status=raise_for_status)
+    monkeypatch.setattr(requests, "post", post)
+    antes = cache.version("alertas"), cache.version("sesiones")
+    resultado = app.test_cli_runner().invoke(args=["reconstruir-agregados"])
+    assert "Caché del servidor invalidada: alertas, sesiones." in resultado.output
+    assert (cache.version("alertas"), cache.version("sesiones")) == (antes[0] + 1, antes[1] + 1)
+
+    def caido(*a, **k):
+        raise requests.ConnectionError("servidor caído")
+    monkeypatch.setattr(requests, "post", caido)
+    resultado = app.test_cli_runner().invoke(args=["reconstruir-agregados"])
+    assert "no se pudo invalidar la caché del servidor" in resultado.output
+    monkeypatch.setitem(app.config, 'CACHE_TOKEN', None)
+    resultado = app.test_cli_runner().invoke(args=["reconstruir-agregados"])
+    assert "CACHE_TOKEN no está configurado" in resultado.output
+    assert cache.version("alertas") == antes[0] + 1
@@ -26,4 +26,35 @@ def test_iniciar_finalizar_jornada(client, app, monkeypatch):
 
     r2 = client.post("/perfil/finalizar", follow_redirects=True)
     assert r2.status_code == 200
-    assert b"Jornada finalizada" in r2.data
\ No newline at end of file
+    assert b"Jornada finalizada" in r2.data
+
+def test_historial_json_usa_resumen_de_sesion(client, app):
+    from app.models import ResumenSesion
+    from app.utils.resumen_sesion import reconstruir_resumenes
+
+    with app.app_context():
+        u = Usuario(nombre="C", username="c2", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="T02")
+        db.session.add_all([u, v]); db.session.commit()
+        uid, vid = u.id, v.id
+
+    for duracion, nivel in ((2.0, "bajo"), (7.5, "medio")):
+        r = client.post("/api/alertas", data={"id_usuario": uid, "id_vehiculo": vid,
+                                              "duracion": duracion, "nivel_somnolencia": nivel})
+        assert r.status_code == 201
+
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(uid)
+    client.post("/perfil/finalizar")
+
+    sesion = client.get("/perfil/historial_json").get_json()["sesiones"][0]
+    assert sesion["alertas"] == 2
+    assert sesion["segundos_somnolencia"] == 9.5
+    assert sesion["segundos_conducidos"] is not None
+
+    with app.app_context():
+        antes = db.session.get(ResumenSesion, sesion["id"])
+        incremental = (antes.alertas_bajo, antes.alertas_medio, antes.episodio_mas_largo)
+        reconstruir_resumenes()
+        despues = db.session.get(ResumenSesion, sesion["id"])
+        assert (despues.alertas_bajo, despues.alertas_medio, despues.episodio_mas_largo) == incremental == (1, 1, 7.5)
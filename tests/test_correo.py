@@ -0,0 +1,136 @@
+# tests/test_correo.py
+import email
+from email import policy
+import os
+import socket
+import socketserver
+import threading
+import time
+from datetime import date, time as hora
+from types import SimpleNamespace
+import pytest
+from app import mail
+from app.utils.correo import GestorCorreo
+
+
+class _ServidorSMTP(socketserver.ThreadingTCPServer):
+    """SMTP mínimo en memoria: acepta todo y guarda los mensajes recibidos."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.mensajes = []
+        self.conexiones = 0
+        super().__init__(('127.0.0.1', 0), _ManejadorSMTP)
+
+
+class _ManejadorSMTP(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.conexiones += 1
+        self.wfile.write(b"220 prueba ESMTP\r\n")
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea[:4].upper()
+            if comando == b"EHLO":
+                self.wfile.write(b"250-prueba\r\n250 OK\r\n")
+            elif comando == b"DATA":
+                self.wfile.write(b"354 fin con .\r\n")
+                datos = []
+                for l in iter(self.rfile.readline, b""):
+                    if l == b".\r\n":
+                        break
+                    datos.append(l[1:] if l.startswith(b"..") else l)
+                self.server.mensajes.append(email.message_from_bytes(b"".join(datos), policy=policy.default))
+                self.wfile.write(b"250 OK\r\n")
+            elif comando == b"QUIT":
+                self.wfile.write(b"221 adios\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+@pytest.fixture()
+def smtp():
+    servidor = _ServidorSMTP()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _configurar(app, monkeypatch, tmp_path, puerto, **extra):
+    valores = dict(MAIL_SUPPRESS_SEND=False, MAIL_SERVER='127.0.0.1', MAIL_PORT=puerto, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+                   MAIL_USERNAME='detector@flota.test', MAIL_PASSWORD=None, ADMIN_EMAIL='admin@flota.test',
+                   CORREO_PENDIENTES_DIR=str(tmp_path / 'pendientes'), CORREO_VENTANA_DIGEST=0.5,
+                   CORREO_REINTENTO=0.2, **extra)
+    for clave, valor in valores.items():
+        monkeypatch.setitem(app.config, clave, valor)
+    monkeypatch.setitem(app.extensions, 'mail', app.extensions['mail'])
+    mail.init_app(app)
+    gestor = GestorCorreo()
+    gestor.init_app(app)
+    return gestor
+
+def _alerta(i, evidencia=None):
+    return (SimpleNamespace(id=i, fecha=date(2025, 3, 1), hora=hora(3, 0, i), duracion=12.0, nota=None),
+            SimpleNamespace(id=7, nombre='Conductor Siete'),
+            SimpleNamespace(codigo='CAM-07', placa='P-007'),
+            evidencia)
+
+def _esperar(condicion, segundos=5.0):
+    limite = time.time() + segundos
+    while time.time() < limite:
+        if condicion():
+            return True
+        time.sleep(0.02)
+    return False
+
+def _puerto_cerrado():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_tormenta_de_alertas_se_resume_en_un_correo(app, smtp, monkeypatch, tmp_path):
+    gestor = _configurar(app, monkeypatch, tmp_path, smtp.server_address[1])
+    evidencias = []
+    for i in range(4):
+        ruta = tmp_path / f"ev{i}.jpg"
+        ruta.write_bytes(b"\xff\xd8jpeg" + bytes([i]))
+        evidencias.append(str(ruta))
+    try:
+        gestor.encolar_alerta(*_alerta(1, evidencias[0]))
+        assert _esperar(lambda: len(smtp.mensajes) == 1)   # la primera sale de inmediato
+        for i in (2, 3, 4):
+            gestor.encolar_alerta(*_alerta(i, evidencias[i - 1]))
+        assert _esperar(lambda: len(smtp.mensajes) == 2)
+        time.sleep(0.3)
+    finally:
+        gestor.detener()
+
+    primero, resumen = smtp.mensajes
+    assert primero['Subject'] == 'ALERTA CRÍTICA: Conductor Conductor Siete'
+    assert resumen['Subject'] == 'ALERTAS CRÍTICAS: 3 alertas (Conductor Siete)'
+    adjuntos = [p.get_filename() for p in resumen.walk() if p.get_filename()]
+    assert len(adjuntos) == 3
+    assert smtp.conexiones == 1                  # la conexión SMTP se reutiliza
+    assert os.listdir(tmp_path / 'pendientes') == []
+
+
+def test_pendientes_sobreviven_a_un_reinicio(app, smtp, monkeypatch, tmp_path):
+    caido = _configurar(app, monkeypatch, tmp_path, _puerto_cerrado())
+    caido.encolar_alerta(*_alerta(1))
+    time.sleep(0.3)
+    caido.detener()
+    assert len(os.listdir(tmp_path / 'pendientes')) == 1
+    assert smtp.mensajes == []
+
+    # "Reinicio" con el servidor de correo disponible: se envía lo pendiente al arrancar
+    gestor = _configurar(app, monkeypatch, tmp_path, smtp.server_address[1])
+    try:
+        assert _esperar(lambda: len(smtp.mensajes) == 1)
+        assert _esperar(lambda: os.listdir(tmp_path / 'pendientes') == [])
+    finally:
+        gestor.detener()
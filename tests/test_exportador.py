@@ -0,0 +1,69 @@
+# tests/test_exportador.py
+from datetime import datetime
+from database.conexion import db
+from app.models import Usuario, Vehiculo, Alerta
+
+def _admin_con_conductor(app, client, alertas=3):
+    with app.app_context():
+        admin = Usuario(nombre="A", username="adm", password_hash="h", rol="admin")
+        u = Usuario(nombre="C", username="c5", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="T05")
+        db.session.add_all([admin, u, v]); db.session.commit()
+        ahora = datetime.now()
+        for i in range(alertas):
+            db.session.add(Alerta(id_usuario=u.id, id_vehiculo=v.id, timestamp=ahora, fecha=ahora.date(),
+                                  hora=ahora.time(), duracion=1.0 + i, nivel_somnolencia='alto'))
+        db.session.commit()
+        admin_id, uid = admin.id, u.id
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin_id)
+    return uid
+
+def test_csv_se_transmite_por_lineas(client, app):
+    uid = _admin_con_conductor(app, client)
+    r = client.get(f"/dashboard/usuarios/{uid}/exportar_csv")
+    assert r.status_code == 200 and r.is_streamed
+    lineas = r.get_data(as_text=True).lstrip('\ufeff').splitlines()
+    assert lineas[0].startswith("ID,Fecha,Hora,Nivel")
+    assert len(lineas) == 4
+
+def test_exportacion_en_segundo_plano_y_reutilizada(client, app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'EXPORTACIONES_DIR', str(tmp_path))
+    uid = _admin_con_conductor(app, client, alertas=5)
+
+    r = client.post(f"/api/usuario/{uid}/exportaciones")
+    assert r.status_code == 202
+    id_trabajo = r.get_json()["id"]
+    from app.utils.trabajos import trabajos
+    assert trabajos.obtener(id_trabajo).evento.wait(10)
+
+    estado = client.get(f"/api/exportaciones/{id_trabajo}").get_json()
+    assert estado["estado"] == "terminado" and estado["progreso"] == 5
+    descarga = client.get(estado["url_descarga"])
+    assert descarga.status_code == 200 and descarga.data[:2] == b"PK"
+
+    # Mismos datos y rango: el mismo archivo, sin volver a generarlo
+    assert len(list(tmp_path.iterdir())) == 1
+    r = client.get(f"/dashboard/usuarios/{uid}/exportar_excel")
+    assert r.status_code == 200 and r.data == descarga.data
+
+def test_version_nueva_reemplaza_a_la_anterior(client, app, tmp_path, monkeypatch):
+    import os
+    monkeypatch.setitem(app.config, 'EXPORTACIONES_DIR', str(tmp_path))
+    uid = _admin_con_conductor(app, client, alertas=2)
+    vencido = tmp_path / "reporte_usuario_999_todo_todo_abc.xlsx"
+    vencido.write_bytes(b"PK")
+    os.utime(vencido, (0, 0))
+
+    assert client.get(f"/dashboard/usuarios/{uid}/exportar_excel").status_code == 200
+    primero = list(tmp_path.iterdir())
+    assert len(primero) == 1   # el vencido se borró
+
+    with app.app_context():
+        a = Alerta.query.filter_by(id_usuario=uid).first()
+        db.session.add(Alerta(id_usuario=uid, id_vehiculo=a.id_vehiculo, timestamp=a.timestamp, fecha=a.fecha,
+                              hora=a.hora, duracion=9.0, nivel_somnolencia='alto'))
+        db.session.commit()
+    assert client.get(f"/dashboard/usuarios/{uid}/exportar_excel").status_code == 200
+    segundo = list(tmp_path.iterdir())
+    assert len(segundo) == 1 and segundo != primero
@@ -0,0 +1,64 @@
+# tests/test_fatiga.py
+import numpy as np
+from ia_module.fatiga import MedidorFatiga, VentanaTemporal
+
+FPS = 30.0
+
+
+def _simular(medidor, desde, segundos, cerrado):
+    """Frames a FPS constantes; cerrado(t) indica si los ojos están cerrados en t."""
+    n = int(segundos * FPS)
+    for i in range(n):
+        t = desde + i / FPS
+        medidor.actualizar(t, cerrado(t - desde))
+    return desde + n / FPS
+
+
+def test_perclos_sobre_la_ventana():
+    m = MedidorFatiga(ventana_s=60.0, fps_max=30)
+    # 1 s cerrado cada 5 s: 20 % del tiempo
+    fin = _simular(m, 0.0, 60.0, lambda t: t % 5.0 >= 4.0)
+    assert abs(m.perclos - 0.2) < 0.01
+    assert m.cobertura > 0.99
+    assert m.parpadeos.n == 11   # cierres de 1 s < parpadeo_max_s; el último sigue abierto
+
+    # Un minuto con los ojos abiertos saca todo de la ventana
+    _simular(m, fin, 61.0, lambda t: False)
+    assert m.perclos == 0.0
+    assert m.parpadeos.n == 0
+    assert m.ojos.n <= m.ojos.capacidad
+
+
+def test_frecuencia_y_duracion_de_parpadeos():
+    m = MedidorFatiga(ventana_s=60.0, fps_max=30, parpadeo_max_s=1.5)
+    # 15 parpadeos de 0.2 s por minuto
+    fin = _simular(m, 0.0, 60.0, lambda t: t % 4.0 < 0.2)
+    assert m.parpadeos.n == 15
+    assert abs(m.parpadeos_por_minuto - 15) < 1
+    assert abs(m.duracion_media_parpadeo - 0.2) < 1 / FPS + 1e-9
+
+    # Un cierre de 2 s ya es un episodio, no un parpadeo
+    terminados = [m.actualizar(fin + i / FPS, i / FPS < 2.0) for i in range(int(2.5 * FPS))]
+    assert [d for d in terminados if d is not None] == []
+
+
+def test_sin_rostro_no_cuenta_como_tiempo_observado():
+    m = MedidorFatiga(ventana_s=60.0)
+    m.actualizar(0.0, False)
+    m.actualizar(0.1, True)
+    m.sin_rostro()
+    m.actualizar(10.0, False)   # el hueco de 10 s no suma
+    assert abs(m.observado_s - 0.1) < 1e-9
+    assert m.parpadeos.n == 0
+
+
+def test_sumas_acumuladas_sin_deriva():
+    v = VentanaTemporal(segundos=1.0, capacidad=64, columnas=2)
+    rng = np.random.default_rng(0)
+    t = 0.0
+    for x in rng.random(10_000):
+        t += 0.01
+        v.agregar(t, x, x * 1e6)
+    indices = (v._inicio + np.arange(v.n)) % v.capacidad
+    assert v.n == 64   # más muestras por segundo que la capacidad: se descartan las viejas
+    assert np.allclose(v.suma, v._v[indices].sum(axis=0), rtol=0, atol=1e-6)
@@ -0,0 +1,58 @@
+# tests/test_listados_admin.py
+import re
+from datetime import datetime, timedelta
+from database.conexion import db
+from app.models import Usuario, Vehiculo, SesionConduccion
+
+def _admin(app, client):
+    with app.app_context():
+        admin = Usuario(nombre="Zeta Admin", username="adm", password_hash="h", rol="admin")
+        db.session.add(admin); db.session.commit()
+        admin_id = admin.id
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin_id)
+
+def _siguiente(html):
+    m = re.search(r'href="([^"]*cursor=[^"]*)"', html)
+    return m.group(1).replace('&amp;', '&') if m else None
+
+def test_usuarios_paginados_por_cursor_y_ordenados(client, app):
+    _admin(app, client)
+    with app.app_context():
+        for nombre in ("Carlos", "Ana", "Beto", "Diana"):
+            db.session.add(Usuario(nombre=nombre, username=nombre.lower(), password_hash="h"))
+        db.session.commit()
+
+    vistos = []
+    url = "/dashboard/usuarios?orden=nombre&dir=asc&limite=2"
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        vistos += re.findall(r'<td>\d+</td>\s*<td>([\w ]+)</td>', html)
+        url = _siguiente(html)
+        assert url is None or "limite=2" in url         # el tamaño de página se conserva
+    assert vistos == ["Ana", "Beto", "Carlos", "Diana", "Zeta Admin"]
+
+    html = client.get("/dashboard/usuarios?q=AN").get_data(as_text=True)
+    assert "<td>Ana</td>" in html and "Diana" not in html     # prefijo, no subcadena
+
+def test_sesiones_muestran_usuario_y_vehiculo(client, app):
+    _admin(app, client)
+    with app.app_context():
+        u = Usuario(nombre="Conductor Uno", username="c1", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="TX9", placa="P-1")
+        db.session.add_all([u, v]); db.session.commit()
+        inicio = datetime(2026, 1, 1, 8, 0)
+        for i in range(3):
+            db.session.add(SesionConduccion(id_usuario=u.id, id_vehiculo=v.id,
+                                            fecha_inicio=inicio + timedelta(days=i), estado='finalizada'))
+        db.session.commit()
+
+    html = client.get("/dashboard/sesiones?limite=2").get_data(as_text=True)
+    assert html.count("Conductor Uno") == 2 and "TX9" in html
+    assert "03/01/2026" in html and _siguiente(html)
+    html = client.get(_siguiente(html)).get_data(as_text=True)
+    assert "01/01/2026 08:00" in html and not _siguiente(html)
+
+    assert "TX9" in client.get("/dashboard/sesiones?q=tx").get_data(as_text=True)
+    assert "No hay sesiones" in client.get("/dashboard/sesiones?q=zz").get_data(as_text=True)
+    assert "TX9" in client.get("/dashboard/vehiculos?q=p-").get_data(as_text=True)
@@ -0,0 +1,53 @@
+import logging
+import queue
+from app.utils.logs import FiltroRepeticiones, ManejadorCola, configurar_logging
+from app.utils.metricas import logs_descartados
+
+
+def _registro(nombre, msg, *args, nivel=logging.WARNING):
+    return logging.LogRecord(nombre, nivel, __file__, 1, msg, args, None)
+
+
+def test_filtro_suprime_repeticiones_dentro_de_la_ventana(monkeypatch):
+    reloj = [100.0]
+    monkeypatch.setattr('app.utils.logs.time.monotonic', lambda: reloj[0])
+    filtro = FiltroRepeticiones(ventana=60)
+
+    assert filtro.filter(_registro('app.utils.detector_launcher', 'Error de red: %s', 'timeout'))
+    for _ in range(5):
+        assert not filtro.filter(_registro('app.utils.detector_launcher', 'Error de red: %s', 'timeout'))
+    # Misma plantilla con otros argumentos es otro evento (p. ej. otro conductor)
+    assert filtro.filter(_registro('app.routes.alertas', 'Alerta registrada correctamente (sesión %s)', 1))
+    assert filtro.filter(_registro('app.routes.alertas', 'Alerta registrada correctamente (sesión %s)', 2))
+    assert filtro.filter(_registro('app.utils.detector_launcher', 'Error de red: %s', 'refused'))
+    # Otro mensaje u otro nivel no se ven afectados
+    assert filtro.filter(_registro('app.utils.detector_launcher', 'Ya hay un detector activo.'))
+    assert filtro.filter(_registro('app.utils.detector_launcher', 'Error de red: %s', 'x', nivel=logging.ERROR))
+
+    reloj[0] += 61
+    r = _registro('app.utils.detector_launcher', 'Error de red: %s', 'timeout')
+    assert filtro.filter(r)
+    assert r.getMessage() == 'Error de red: timeout (+5 repeticiones suprimidas)'
+
+
+def test_filtro_ignora_loggers_ajenos():
+    filtro = FiltroRepeticiones(ventana=60)
+    for _ in range(3):
+        assert filtro.filter(_registro('werkzeug', '%s - - %s', '127.0.0.1', 'GET /', nivel=logging.INFO))
+
+
+def test_cola_llena_descarta_sin_bloquear():
+    manejador = ManejadorCola(queue.Queue(maxsize=1))
+    antes = logs_descartados.valor()
+    for i in range(3):
+        manejador.handle(_registro('app.prueba', 'mensaje %s', i))
+    assert manejador.queue.qsize() == 1
+    assert manejador.descartados == 2
+    assert logs_descartados.valor() == antes + 2
+
+
+def test_niveles_por_modulo():
+    configurar_logging('INFO', niveles='app.prueba_niveles=ERROR, ia_module.prueba=DEBUG')
+    assert logging.getLogger('app.prueba_niveles').getEffectiveLevel() == logging.ERROR
+    assert logging.getLogger('ia_module.prueba').getEffectiveLevel() == logging.DEBUG
+    assert logging.getLogger('app.otro').getEffectiveLevel() == logging.INFO
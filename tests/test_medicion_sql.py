@@ -0,0 +1,47 @@
+# tests/test_medicion_sql.py
+import pytest
+from database.conexion import db
+from app.models import Usuario, Vehiculo, SesionConduccion
+from app.utils.medicion_sql import limite_consultas
+
+def _conductor_con_sesiones(app, client, n):
+    with app.app_context():
+        u = Usuario(nombre="C", username="c9", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="T09")
+        db.session.add_all([u, v]); db.session.commit()
+        uid, vid = u.id, v.id
+    _agregar_sesiones(app, uid, vid, n)
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(uid)
+    return uid, vid
+
+def _agregar_sesiones(app, uid, vid, n):
+    with app.app_context():
+        for _ in range(n):
+            db.session.add(SesionConduccion(id_usuario=uid, id_vehiculo=vid, estado='finalizada'))
+        db.session.commit()
+    from app.utils.cache import cache
+    cache.invalidar('sesiones', f'conductor:{uid}')
+
+def test_historial_json_no_crece_con_las_sesiones(client, app):
+    uid, vid = _conductor_con_sesiones(app, client, 1)
+    with limite_consultas(10) as pocas:
+        client.get("/perfil/historial_json")
+
+    _agregar_sesiones(app, uid, vid, 20)
+    with limite_consultas(len(pocas)):
+        r = client.get("/perfil/historial_json")
+    assert len(r.get_json()["sesiones"]) == 21
+
+def test_server_timing_y_limite_por_peticion(client, app, monkeypatch):
+    _conductor_con_sesiones(app, client, 1)
+    r = client.get("/perfil/historial_json")
+    timing = r.headers.getlist("Server-Timing")
+    assert timing[0].startswith("db;dur=") and "consultas" in timing[0]
+
+    monkeypatch.setitem(app.config, "SQL_MAX_CONSULTAS", 0)
+    with pytest.raises(AssertionError, match="máximo 0"):
+        client.get("/perfil/historial_json", headers={"Cache-Control": "no-cache"})
+    with pytest.raises(AssertionError, match="máximo 0"):
+        with limite_consultas(0):
+            db.session.query(Usuario).count()
@@ -0,0 +1,43 @@
+# tests/test_metricas.py
+from database.conexion import db
+from app.models import Usuario, Vehiculo
+from app.utils.metricas import Registro, alertas_recibidas
+
+def test_histograma_en_formato_prometheus():
+    r = Registro()
+    h = r.histograma('lat_seconds', 'Latencia.', ('ruta',), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 3.0):
+        h.observar(v, ruta='a"b')
+    texto = r.exponer()
+    assert '# TYPE lat_seconds histogram' in texto
+    assert 'lat_seconds_bucket{ruta="a\\"b",le="0.1"} 1' in texto
+    assert 'lat_seconds_bucket{ruta="a\\"b",le="1"} 2' in texto
+    assert 'lat_seconds_bucket{ruta="a\\"b",le="+Inf"} 3' in texto
+    assert 'lat_seconds_count{ruta="a\\"b"} 3' in texto
+    assert 'lat_seconds_sum{ruta="a\\"b"} 3.55' in texto
+    h.observar(0.2, ruta='x\ny')
+    assert 'lat_seconds_count{ruta="x\\ny"} 1' in r.exponer()
+
+def test_endpoint_metrics(client, app, monkeypatch):
+    with app.app_context():
+        u = Usuario(nombre="C", username="c11", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="T11")
+        db.session.add_all([u, v]); db.session.commit()
+        uid, vid = u.id, v.id
+    antes = alertas_recibidas.valor(nivel='medio')
+    client.post("/api/alertas", data={"id_usuario": uid, "id_vehiculo": vid, "duracion": 6.0,
+                                      "nivel_somnolencia": "medio"})
+    assert alertas_recibidas.valor(nivel='medio') == antes + 1
+    # Un nivel fuera de la lista no llega a ser etiqueta
+    r = client.post("/api/alertas", data={"id_usuario": uid, "id_vehiculo": vid, "duracion": 6.0,
+                                          "nivel_somnolencia": "medio\n# basura"})
+    assert r.status_code == 400
+
+    texto = client.get("/metrics").get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="alertas.crear_alerta",method="POST",status="201"}' in texto
+    assert '# TYPE detector_inference_seconds histogram' in texto
+    assert '# TYPE mjpeg_viewers gauge' in texto
+
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'secreto')
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secreto"}).status_code == 200
@@ -0,0 +1,49 @@
+# tests/test_migraciones.py
+from datetime import date, time, datetime
+import sqlalchemy as sa
+from database.conexion import db
+from database.migraciones import aplicar_migraciones
+from database.funciones import truncar_fecha
+from app.models import Usuario, Vehiculo, Alerta
+
+def test_backfill_timestamp_alertas(app):
+    with app.app_context():
+        u = Usuario(nombre="C", username="c1", password_hash="h")
+        v = Vehiculo(codigo="T01")
+        db.session.add_all([u, v]); db.session.commit()
+        a = Alerta(id_usuario=u.id, id_vehiculo=v.id, fecha=date(2025, 3, 4),
+                   hora=time(22, 15, 30), duracion=2.0)
+        db.session.add(a); db.session.commit()
+        db.session.execute(sa.text('UPDATE alertas SET "timestamp" = NULL'))
+        db.session.commit()
+
+        aplicar_migraciones()
+        db.session.expire_all()
+
+        assert db.session.get(Alerta, a.id).timestamp == datetime(2025, 3, 4, 22, 15, 30)
+        bucket = db.session.query(truncar_fecha('hour', Alerta.timestamp)).scalar()
+        assert bucket == datetime(2025, 3, 4, 22, 0, 0)
+
+def test_backfill_un_commit_por_lote(app, monkeypatch):
+    from database.migraciones import rellenar_alertas_timestamp
+    monkeypatch.setattr('database.migraciones.LOTE_BACKFILL', 1)
+    with app.app_context():
+        u = Usuario(nombre="C", username="c2", password_hash="h")
+        v = Vehiculo(codigo="T02")
+        db.session.add_all([u, v]); db.session.commit()
+        db.session.add_all([Alerta(id_usuario=u.id, id_vehiculo=v.id, fecha=date(2025, 3, d),
+                                   hora=time(8, 0), duracion=1.0) for d in (1, 2, 3)])
+        db.session.commit()
+        db.session.execute(sa.text('UPDATE alertas SET "timestamp" = NULL'))
+        db.session.commit()
+
+        commits = []
+        def contar(conn):
+            commits.append(conn)
+        sa.event.listen(db.engine, 'commit', contar)
+        try:
+            rellenar_alertas_timestamp(db.engine)
+        finally:
+            sa.event.remove(db.engine, 'commit', contar)
+        assert len(commits) == 3
+        assert db.session.query(Alerta).filter(Alerta.timestamp.is_(None)).count() == 0
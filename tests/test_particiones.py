@@ -0,0 +1,44 @@
+# tests/test_particiones.py
+from datetime import datetime, timedelta
+from database.conexion import db
+from database.particiones import archivar_alertas, leer_alertas_archivadas
+from app.models import Usuario, Vehiculo, Alerta
+
+def test_archivar_alertas_antiguas(app, tmp_path):
+    with app.app_context():
+        u = Usuario(nombre="C", username="c1", password_hash="h")
+        v = Vehiculo(codigo="T01")
+        db.session.add_all([u, v]); db.session.commit()
+        viejo = datetime.now() - timedelta(days=800)
+        reciente = datetime.now()
+        for ts in (viejo, reciente):
+            db.session.add(Alerta(id_usuario=u.id, id_vehiculo=v.id, fecha=ts.date(),
+                                  hora=ts.time(), timestamp=ts, duracion=3.0,
+                                  nivel_somnolencia='medio'))
+        db.session.commit()
+
+        with db.engine.begin() as conn:
+            archivados = archivar_alertas(conn, str(tmp_path), antiguedad_meses=12)
+
+        assert len(archivados) == 1
+        assert Alerta.query.count() == 1
+        registros = list(leer_alertas_archivadas(str(tmp_path), id_usuario=u.id))
+        assert len(registros) == 1
+        assert registros[0]['nivel_somnolencia'] == 'medio'
+        assert registros[0]['timestamp'].date() == viejo.date()
+
+def test_lectura_por_grupos_del_mes_mas_nuevo(tmp_path):
+    import pandas as pd
+    from itertools import islice
+
+    for mes, ids in ((1, range(1, 51)), (2, range(51, 101))):
+        pd.DataFrame({
+            'id': list(ids), 'id_usuario': [1 + i % 2 for i in ids], 'id_vehiculo': 1, 'id_sesion': None,
+            'timestamp': [datetime(2023, mes, 1 + i % 28) for i in ids], 'duracion': 1.0,
+            'nivel_somnolencia': 'bajo', 'nota': None, 'evidencia_url': None,
+        }).to_parquet(tmp_path / f'alertas_2023_{mes:02d}.parquet', index=False, row_group_size=10)
+
+    lector = leer_alertas_archivadas(str(tmp_path), id_usuario=2)
+    assert [r['id'] for r in islice(lector, 3)] == [99, 97, 95]
+    assert [r['id'] for r in islice(leer_alertas_archivadas(str(tmp_path), antes_de_id=52), 3)] == [51, 50, 49]
+    assert len(list(leer_alertas_archivadas(str(tmp_path), desde=datetime(2023, 2, 1)))) == 50
@@ -0,0 +1,67 @@
+import threading
+import time
+from ia_module.perfilador import (PerfiladorEtapas, PERFIL_NULO, HistogramaNs, ETAPAS,
+                                  _bucket, _limite_superior)
+
+
+def test_buckets_acotan_el_valor():
+    for ns in (0, 1, 3, 7, 100, 999, 12345, 1_000_000, 16_666_667, 2_000_000_000):
+        i = _bucket(ns)
+        assert ns <= _limite_superior(i)
+        if i > 0:
+            assert ns > _limite_superior(i - 1)
+
+
+def test_percentiles_aproximados():
+    h = HistogramaNs()
+    for ms in range(1, 101):
+        h.registrar(ms * 1_000_000)
+    assert h.n == 100 and h.maximo == 100_000_000
+    p50 = h.percentil(50) / 1e6
+    assert 50 <= p50 <= 50 * 1.25
+    assert h.percentil(100) == h.maximo
+
+
+def test_perfil_nulo_no_mide():
+    t = PERFIL_NULO.inicio_frame()
+    assert PERFIL_NULO.etapa('captura', t) == 0
+    PERFIL_NULO.fin_frame(t)
+    assert PERFIL_NULO.activo is False
+
+
+def test_frames_lentos_con_muestreo_de_pila():
+    perfil = PerfiladorEtapas(frame_lento_ms=20, muestreo_ms=2)
+
+    def etapa_lenta():
+        time.sleep(0.05)
+
+    try:
+        for lento in (False, True):
+            t0 = t = perfil.inicio_frame()
+            if lento:
+                etapa_lenta()
+            t = perfil.etapa('facemesh', t)
+            perfil.fin_frame(t0)
+    finally:
+        perfil.detener()
+
+    assert perfil.frames.n == 2
+    assert perfil.frames_lentos == 1
+    assert any('etapa_lenta' in linea for pila in perfil.pilas_lentas for linea in pila)
+    reporte = perfil.reporte()
+    assert 'facemesh' in reporte and 'Frames lentos' in reporte
+
+
+def test_bucle_del_detector_mide_cada_etapa(detector_falso, camara_falsa, monkeypatch):
+    from app.utils.detector_launcher import ejecutar_bucle
+    monkeypatch.setenv('DETECTOR_TELEMETRIA', '0')
+    monkeypatch.setenv('DETECTOR_TRAZA', '0')
+
+    publicados = []
+    ejecutar_bucle(detector_falso, camara_falsa(3), 1, 1, threading.Event(), publicar=publicados.append)
+
+    assert len(publicados) == 3
+    assert detector_falso.perfil.frames.n == 3
+    for etapa in ETAPAS:
+        # Sin alertas no hay etapa de envío
+        assert detector_falso.perfil.etapas[etapa].n == (0 if etapa == 'envio' else 3)
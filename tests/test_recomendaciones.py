@@ -0,0 +1,46 @@
+# tests/test_recomendaciones.py
+from datetime import datetime
+from database.conexion import db
+from app.models import Usuario, Alerta
+from app.utils import agregados
+from app.utils.recomendaciones import recomendaciones, BackendLocal
+from app.utils.trabajos import trabajos
+
+def _admin_y_conductor(app, client):
+    with app.app_context():
+        admin = Usuario(nombre="A", username="adm", password_hash="h", rol="admin")
+        u = Usuario(nombre="C", username="c7", password_hash="h", rol="conductor")
+        db.session.add_all([admin, u]); db.session.commit()
+        admin_id, uid = admin.id, u.id
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin_id)
+    return uid
+
+def test_recomendacion_asincrona_coalescida_y_en_cache(client, app, monkeypatch):
+    backend = BackendLocal(latencia=0.2)
+    monkeypatch.setattr(recomendaciones, "backend", backend)
+    monkeypatch.setattr(recomendaciones, "cache", type(recomendaciones.cache)())
+    uid = _admin_y_conductor(app, client)
+
+    r1 = client.get(f"/api/usuario/{uid}/generar_recomendacion")
+    r2 = client.get(f"/api/usuario/{uid}/generar_recomendacion")
+    assert r1.status_code == r2.status_code == 202
+    assert r1.get_json()["id"] == r2.get_json()["id"]        # una sola llamada en curso
+    assert trabajos.obtener(r1.get_json()["id"]).evento.wait(10)
+
+    estado = client.get(r1.get_json()["url_estado"]).get_json()
+    assert estado["estado"] == "terminado" and "Diagnóstico" in estado["recomendacion"]
+    r3 = client.get(f"/api/usuario/{uid}/generar_recomendacion")
+    assert r3.status_code == 200 and r3.get_json()["recomendacion"] == estado["recomendacion"]
+    assert backend.llamadas == 1
+
+    # Cambian las métricas: nueva foto, nueva generación
+    with app.app_context():
+        ahora = datetime.now()
+        a = Alerta(id_usuario=uid, timestamp=ahora, fecha=ahora.date(), hora=ahora.time(),
+                   duracion=2.0, nivel_somnolencia='alto')
+        db.session.add(a); agregados.registrar_alerta(a); db.session.commit()
+    r4 = client.get(f"/api/usuario/{uid}/generar_recomendacion")
+    assert r4.status_code == 202
+    assert trabajos.obtener(r4.get_json()["id"]).evento.wait(10)
+    assert backend.llamadas == 2
@@ -0,0 +1,73 @@
+# tests/test_reporte_flota.py
+from datetime import datetime, timedelta
+from database.conexion import db
+from app.models import Usuario, Vehiculo, Alerta, SesionConduccion
+from app.utils import agregados, resumen_sesion
+
+def _flota(app, client):
+    with app.app_context():
+        admin = Usuario(nombre="A", username="adm", password_hash="h", rol="admin")
+        c1 = Usuario(nombre="Uno", username="f1", password_hash="h", rol="conductor")
+        c2 = Usuario(nombre="Dos", username="f2", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="F01")
+        db.session.add_all([admin, c1, c2, v]); db.session.commit()
+
+        inicio = datetime(2026, 3, 2, 8, 0)   # lunes
+        s = SesionConduccion(id_usuario=c1.id, id_vehiculo=v.id, fecha_inicio=inicio,
+                             fecha_fin=inicio + timedelta(hours=2), estado='finalizada')
+        db.session.add(s); db.session.flush()
+        for minutos, nivel in ((10, 'alto'), (20, 'alto'), (70, 'critico')):
+            ts = inicio + timedelta(minutes=minutos)
+            a = Alerta(id_usuario=c1.id, id_vehiculo=v.id, id_sesion=s.id, timestamp=ts, fecha=ts.date(),
+                       hora=ts.time(), duracion=2.0, nivel_somnolencia=nivel)
+            db.session.add(a)
+            agregados.registrar_alerta(a)
+            resumen_sesion.registrar_alerta(a)
+        agregados.registrar_sesion_finalizada(s)
+        resumen_sesion.cerrar_sesion(s)
+        db.session.commit()
+        admin_id, c1_id = admin.id, c1.id
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin_id)
+    return c1_id
+
+def test_datos_reporte_flota(client, app):
+    c1_id = _flota(app, client)
+    datos = client.get("/api/reportes/flota?desde=2026-03-01&hasta=2026-03-31").get_json()
+    assert datos["total_alertas"] == 3 and datos["total_sesiones"] == 1
+    primero = datos["conductores"][0]
+    assert primero["id"] == c1_id and primero["alto"] == 2 and primero["critico"] == 1
+    assert primero["horas"] == 2.0 and primero["tasa"] == 1.5
+    assert primero["por_hora"][8] == 2 and primero["por_hora"][9] == 1
+    assert datos["mapa_flota"][0][8] == 2           # lunes 08:00
+    assert datos["vehiculos"][0]["codigo"] == "F01" and datos["vehiculos"][0]["horas"] == 2.0
+
+    fuera = client.get("/api/reportes/flota?desde=2026-04-01&hasta=2026-04-30").get_json()
+    assert fuera["total_alertas"] == 0
+
+def test_conductor_dado_de_baja_conserva_su_nombre(client, app):
+    c1_id = _flota(app, client)
+    with app.app_context():
+        db.session.get(Usuario, c1_id).rol = 'inactivo'
+        db.session.commit()
+    datos = client.get("/api/reportes/flota?desde=2026-03-01&hasta=2026-03-31").get_json()
+    primero = datos["conductores"][0]
+    assert (primero["id"], primero["nombre"], primero["total"]) == (c1_id, "Uno", 3)
+
+def test_excel_flota_en_segundo_plano(client, app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'EXPORTACIONES_DIR', str(tmp_path))
+    _flota(app, client)
+    r = client.post("/api/reportes/flota", data={"desde": "2026-03-01", "hasta": "2026-03-31"})
+    assert r.status_code == 202
+    from app.utils.trabajos import trabajos
+    assert trabajos.obtener(r.get_json()["id"]).evento.wait(10)
+
+    estado = client.get(r.get_json()["url_estado"]).get_json()
+    assert estado["estado"] == "terminado"
+    from openpyxl import load_workbook
+    wb = load_workbook(trabajos.obtener(estado["id"]).resultado, read_only=True)
+    assert wb.sheetnames == ['Resumen', 'Conductores', 'Mapa de Calor', 'Horas por Conductor', 'Vehículos']
+
+    # El mismo rango se sirve desde disco
+    r = client.get("/dashboard/reporte_flota?desde=2026-03-01&hasta=2026-03-31")
+    assert r.status_code == 200 and r.data[:2] == b"PK"
@@ -0,0 +1,43 @@
+# tests/test_respuestas_http.py
+import gzip
+import json
+from database.conexion import db
+from app.models import Usuario, Vehiculo
+
+def _conductor(app, client):
+    with app.app_context():
+        u = Usuario(nombre="C", username="c3", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="T03")
+        db.session.add_all([u, v]); db.session.commit()
+        uid, vid = u.id, v.id
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(uid)
+    return uid, vid
+
+def test_historial_json_responde_304_hasta_que_cambia(client, app, monkeypatch):
+    uid, vid = _conductor(app, client)
+    r1 = client.get("/perfil/historial_json")
+    etag = r1.headers["ETag"]
+
+    # Con el mismo ETag no se ejecuta la vista
+    from app.routes import conductor
+    monkeypatch.setattr(conductor.db.session, "query", lambda *a, **k: (_ for _ in ()).throw(AssertionError("consulta")))
+    r2 = client.get("/perfil/historial_json", headers={"If-None-Match": etag})
+    assert r2.status_code == 304 and r2.data == b""
+    monkeypatch.undo()
+
+    client.post("/api/alertas", data={"id_usuario": uid, "id_vehiculo": vid, "duracion": 2.0})
+    r3 = client.get("/perfil/historial_json", headers={"If-None-Match": etag})
+    assert r3.status_code == 200
+    assert r3.headers["ETag"] != etag
+    assert r3.get_json()["sesiones"][0]["alertas"] == 1
+
+def test_json_grande_se_comprime(client, app):
+    uid, vid = _conductor(app, client)
+    for _ in range(30):
+        client.post("/api/alertas", data={"id_usuario": uid, "id_vehiculo": vid, "duracion": 2.0,
+                                          "nota": "x" * 40})
+    r = client.get("/api/alertas", headers={"Accept-Encoding": "gzip"})
+    assert r.headers.get("Content-Encoding") == "gzip"
+    assert len(json.loads(gzip.decompress(r.data))["alertas"]) == 30
+    assert "Content-Encoding" not in client.get("/api/alertas").headers
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+from database.conexion import opciones_engine
+from app.utils import detector_launcher
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_pool_dimensionado_con_los_hilos():
+    config = {'SQLALCHEMY_DATABASE_URI': 'postgresql://u:p@localhost/db', 'WSGI_HILOS': 12,
+              'TRABAJOS_MAX_WORKERS': 3, 'DB_MAX_OVERFLOW': 4}
+    opciones = opciones_engine(config)
+    assert opciones['pool_size'] == 16
+    assert opciones['max_overflow'] == 4
+    assert opciones['pool_pre_ping'] is True
+
+    assert opciones_engine(dict(config, DB_POOL_SIZE=30))['pool_size'] == 30
+    assert opciones_engine({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}) == {}
+
+
+def test_un_solo_proceso_es_dueno_del_detector(tmp_path, monkeypatch):
+    ruta = str(tmp_path / 'detector.lock')
+    monkeypatch.setenv('DETECTOR_LOCK', ruta)
+    monkeypatch.setattr(detector_launcher, '_candado_propietario', None)
+    try:
+        assert detector_launcher._adquirir_propiedad()
+        assert detector_launcher._adquirir_propiedad()   # el dueño lo conserva
+
+        otro = subprocess.run(
+            [sys.executable, '-c', 'from app.utils import detector_launcher as d; print(d._adquirir_propiedad())'],
+            cwd=RAIZ, env=dict(os.environ, DETECTOR_LOCK=ruta), capture_output=True, text=True, timeout=60)
+        assert otro.stdout.strip().splitlines()[-1] == 'False'
+    finally:
+        detector_launcher._candado_propietario.close()
@@ -0,0 +1,129 @@
+# tests/test_telemetria.py
+import gzip
+import json
+from datetime import datetime
+from database.conexion import db
+from app.models import Usuario, Vehiculo, SesionConduccion, TelemetriaMinuto
+from ia_module.telemetria import TelemetriaDetector, empaquetar, CAMPOS
+
+FPS = 30
+
+
+def _simular_minutos(telemetria, minutos, desde=1_700_000_040.0):
+    """Cada minuto: 10 s sin rostro, el resto con EAR 0.3 y un cierre (EAR 0.1) de 2 s cada 10 s."""
+    for i in range(minutos * 60 * FPS):
+        t = desde + i / FPS
+        s = (t - desde) % 60
+        if s < 10:
+            telemetria.frame(t, None, False)
+        else:
+            cerrado = s % 10 < 2
+            telemetria.frame(t, 0.1 if cerrado else 0.3, cerrado, perclos=0.1)
+
+
+def test_resumen_por_minuto_y_lotes():
+    lotes = []
+    telemetria = TelemetriaDetector(lambda filas: lotes.append(filas) or True, minutos_por_lote=2)
+    _simular_minutos(telemetria, 3, desde=1_700_000_040.0)   # inicio de minuto exacto
+    telemetria.cerrar()
+
+    assert [len(l) for l in lotes] == [2, 1]
+    fila = dict(zip(CAMPOS, lotes[0][0]))
+    assert fila['minuto'] == 1_700_000_040
+    assert abs(fila['rostro'] - 50 / 60) < 0.01
+    assert fila['cierres'] == 5
+    assert fila['ear_min'] == 0.1 and fila['ear_p10'] == 0.1
+    assert abs(fila['ear_media'] - (0.3 * 40 + 0.1 * 10) / 50) < 0.005
+    assert abs(fila['fps'] - FPS) < 1
+    assert fila['perclos'] == 0.1
+
+
+def test_envio_fallido_queda_pendiente():
+    intentos = []
+    def enviar(filas):
+        intentos.append(len(filas))
+        return len(intentos) > 1
+    telemetria = TelemetriaDetector(enviar, minutos_por_lote=1)
+    _simular_minutos(telemetria, 1)
+    assert telemetria.cerrar() is True
+    assert intentos[-1] == 1
+
+
+def test_bucle_sube_el_minuto_en_curso_al_terminar(detector_falso, camara_falsa, monkeypatch):
+    import threading
+    from app.utils.detector_launcher import ejecutar_bucle
+    monkeypatch.setenv('DETECTOR_TRAZA', '0')
+    enviados = []
+    telemetria = TelemetriaDetector(lambda filas: enviados.extend(filas) or True)
+    ejecutar_bucle(detector_falso, camara_falsa(3), 1, 1, threading.Event(), publicar=lambda f: None,
+                   telemetria=telemetria)
+    assert enviados and all(dict(zip(CAMPOS, fila))['cierres'] == 0 for fila in enviados)
+
+
+def _sesion(app):
+    with app.app_context():
+        u = Usuario(nombre="Conductor T", username="ct", password_hash="h", rol="conductor")
+        v = Vehiculo(codigo="T01")
+        db.session.add_all([u, v]); db.session.commit()
+        s = SesionConduccion(id_usuario=u.id, id_vehiculo=v.id, estado='activa')
+        admin = Usuario(nombre="Admin", username="adm", password_hash="h", rol="admin")
+        db.session.add_all([s, admin]); db.session.commit()
+        return u.id, v.id, s.id, admin.id
+
+def test_endpoint_inserta_en_bloque_sin_duplicar(client, app):
+    uid, vid, sid, admin_id = _sesion(app)
+    filas = [[1_700_000_040 + 60 * i, 0.29, 0.1, 0.12, 0.9, 4, 29.5, 35.0, 0.08] for i in range(5)]
+    cuerpo = empaquetar(uid, vid, filas)
+    assert len(cuerpo) < 300
+    cabeceras = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+    r = client.post("/api/telemetria", data=cuerpo, headers=cabeceras)
+    assert r.status_code == 201 and r.get_json() == {"recibidos": 5}
+    # Un reintento del mismo lote no duplica minutos
+    assert client.post("/api/telemetria", data=cuerpo, headers=cabeceras).status_code == 201
+    assert TelemetriaMinuto.query.count() == 5
+    t = TelemetriaMinuto.query.order_by(TelemetriaMinuto.minuto).first()
+    assert (t.id_sesion, t.cierres, t.fps) == (sid, 4, 29.5)
+    assert t.minuto == datetime.fromtimestamp(1_700_000_040)
+
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin_id)
+    datos = client.get(f"/api/telemetria?id_sesion={sid}&limite=3").get_json()["telemetria"]
+    assert len(datos) == 3 and datos[0]["minuto"] < datos[-1]["minuto"]
+
+def test_endpoint_rechaza_cuerpos_invalidos(client, app, monkeypatch):
+    uid, vid, _, _ = _sesion(app)
+    monkeypatch.setitem(app.config, 'TELEMETRIA_MAX_BYTES', 1024)
+    bomba = gzip.compress(b" " * 100_000)
+    assert client.post("/api/telemetria", data=bomba, headers={"Content-Encoding": "gzip"}).status_code == 400
+    otro = json.dumps({"id_usuario": uid, "campos": ["minuto", "temperatura"], "filas": [[0, 1]]})
+    assert client.post("/api/telemetria", data=otro).status_code == 400
+    assert client.post("/api/telemetria", data=b"no es json").status_code == 400
+    for basura in ("alto", [1], {"a": 1}, True):
+        fila = json.dumps({"id_usuario": uid, "campos": ["minuto", "fps", "cierres"],
+                           "filas": [[1_700_000_040, basura, 3]]})
+        assert client.post("/api/telemetria", data=fila).status_code == 400
+    nulos = json.dumps({"id_usuario": uid, "campos": ["minuto", "fps", "cierres"],
+                        "filas": [[1_700_000_040, None, "4"]]})
+    assert client.post("/api/telemetria", data=nulos).status_code == 201
+    assert TelemetriaMinuto.query.one().cierres == 4
+    sin_usuario = empaquetar(99999, vid, [])
+    assert client.post("/api/telemetria", data=sin_usuario,
+                       headers={"Content-Encoding": "gzip"}).status_code == 404
+
+
+def test_vehiculo_inexistente_404_y_el_lote_se_descarta(client, app, monkeypatch):
+    import requests
+    from types import SimpleNamespace
+    from app.utils.detector_launcher import _post_telemetria
+    uid, _, _, _ = _sesion(app)
+    cuerpo = empaquetar(uid, 999, [[1_700_000_040, 0.29, 0.1, 0.12, 0.9, 4, 29.5, 35.0, 0.08]])
+    r = client.post("/api/telemetria", data=cuerpo, headers={"Content-Encoding": "gzip"})
+    assert r.status_code == 404 and TelemetriaMinuto.query.count() == 0
+
+    estado = {}
+    monkeypatch.setattr(requests, "post",
+                        lambda *a, **k: SimpleNamespace(status_code=estado['codigo'], text="error"))
+    for codigo, ok in ((404, True), (400, True), (429, False), (503, False)):
+        estado['codigo'] = codigo
+        assert _post_telemetria("http://servidor", uid, 999, [[1_700_000_040]]) is ok
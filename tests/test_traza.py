@@ -0,0 +1,116 @@
+# tests/test_traza.py
+import os
+from datetime import datetime
+import numpy as np
+import pytest
+from database.conexion import db
+from app.models import Usuario, Vehiculo, SesionConduccion
+from ia_module.traza import (GrabadorTraza, LectorTraza, codificar_bloque, decodificar_bloque,
+                             directorio_sesion, leer_traza)
+
+FPS = 30
+T0 = 1_700_000_000.0
+
+
+def _grabar(directorio, segundos, desde=T0, **kw):
+    """EAR 0.3 con un cierre (0.1) de 1 s cada 5 s y 2 s sin rostro cada minuto."""
+    # Sin pausas entre frames el escritor va atrás: búferes de sobra para no descartar
+    kw.setdefault('buferes', 64)
+    grabador = GrabadorTraza(directorio, **kw)
+    for i in range(int(segundos * FPS)):
+        t = desde + i / FPS
+        s = i / FPS
+        if s % 60 < 2:
+            grabador.agregar(t, None)
+        else:
+            grabador.agregar(t, 0.1 if s % 5 < 1 else 0.3 + 0.01 * np.sin(s))
+    grabador.cerrar()
+    assert grabador.bloques_descartados == 0
+    return grabador
+
+
+def test_codificacion_ida_y_vuelta():
+    t = T0 + np.cumsum(np.full(100, 1 / FPS))
+    ear = np.linspace(0.05, 0.4, 100).astype(np.float32)
+    rostro = np.ones(100, dtype=bool)
+    rostro[10:20] = False
+    t2, ear2, rostro2 = decodificar_bloque(codificar_bloque(t, ear, rostro))
+    assert np.allclose(t2, t, atol=1e-6)
+    assert (rostro2 == rostro).all()
+    assert np.isnan(ear2[10:20]).all()
+    assert np.allclose(ear2[rostro], ear[rostro], atol=1e-4)
+
+
+def test_rango_entre_bloques(tmp_path):
+    _grabar(str(tmp_path), 120, muestras_bloque=500)
+    lector = LectorTraza(str(tmp_path))
+    assert len(lector.indice) == 8 and lector.muestras == 120 * FPS
+    assert lector.inicio == T0
+
+    t, ear, rostro = lector.rango(T0 + 10, T0 + 50)
+    assert t[0] >= T0 + 10 and t[-1] <= T0 + 50
+    assert abs(len(t) - 40 * FPS) <= 1
+    assert np.all(np.diff(t) > 0)
+    assert rostro.all() and np.isclose(ear.min(), 0.1, atol=1e-4)
+    # Un rango con el hueco sin rostro del minuto 1
+    _, ear, rostro = lector.rango(datetime.fromtimestamp(T0 + 59), datetime.fromtimestamp(T0 + 63))
+    assert (~rostro).sum() == 2 * FPS and np.isnan(ear[~rostro]).all()
+
+
+def test_una_hora_ocupa_poco(tmp_path):
+    _grabar(str(tmp_path), 3600)
+    bytes_totales = sum(os.path.getsize(os.path.join(tmp_path, f)) for f in os.listdir(tmp_path))
+    # Sin compresión serían 3600*30*13 ≈ 1.4 MB por hora; 10 h tienen que quedar en pocos MB
+    assert bytes_totales * 10 < 5 * 1024 * 1024
+
+
+def test_leer_traza_une_jornadas(tmp_path):
+    base = str(tmp_path)
+    _grabar(directorio_sesion(base, 3, datetime.fromtimestamp(T0)), 30)
+    _grabar(directorio_sesion(base, 3, datetime.fromtimestamp(T0 + 3600)), 30, desde=T0 + 3600)
+    t, _, _ = leer_traza(base, 3, T0 + 20, T0 + 3610)
+    assert abs(len(t) - 20 * FPS) <= 2
+    assert len(leer_traza(base, 4)[0]) == 0
+
+
+def test_bucle_graba_la_traza(detector_falso, camara_falsa, monkeypatch, tmp_path):
+    import threading
+    from app.utils.detector_launcher import ejecutar_bucle
+    monkeypatch.setenv('DETECTOR_TELEMETRIA', '0')
+    ejecutar_bucle(detector_falso, camara_falsa(3), 1, 1, threading.Event(), publicar=lambda f: None,
+                   traza=GrabadorTraza(str(tmp_path)))
+    lector = LectorTraza(str(tmp_path))
+    assert lector.muestras == 3
+    assert np.allclose(lector.rango()[1], 0.3)
+
+
+def test_endpoint_traza_reducida(client, app, monkeypatch, tmp_path):
+    with app.app_context():
+        u = Usuario(nombre="Conductor Traza", username="ctr", password_hash="h", rol="conductor")
+        admin = Usuario(nombre="Admin", username="adm", password_hash="h", rol="admin")
+        v = Vehiculo(codigo="TR1")
+        db.session.add_all([u, admin, v]); db.session.commit()
+        s = SesionConduccion(id_usuario=u.id, id_vehiculo=v.id, estado='finalizada',
+                             fecha_inicio=datetime.fromtimestamp(T0),
+                             fecha_fin=datetime.fromtimestamp(T0 + 120))
+        db.session.add(s); db.session.commit()
+        uid, sid, admin_id = u.id, s.id, admin.id
+    monkeypatch.setitem(app.config, 'TRAZAS_DIR', str(tmp_path))
+    _grabar(directorio_sesion(str(tmp_path), uid, datetime.fromtimestamp(T0)), 120)
+
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(admin_id)
+    datos = client.get(f"/dashboard/sesiones/{sid}/traza?max_puntos=100").get_json()
+    assert datos["muestras"] == 100 and len(datos["ear"]) == 100
+    # El mínimo de cada tramo conserva los cierres
+    assert min(e for e in datos["ear"] if e is not None) == 0.1
+
+
+def test_excepcion_en_el_bucle_no_pierde_el_ultimo_bloque(detector_falso, camara_falsa, monkeypatch, tmp_path):
+    import threading
+    from app.utils.detector_launcher import ejecutar_bucle
+    monkeypatch.setenv('DETECTOR_TELEMETRIA', '0')
+    with pytest.raises(RuntimeError):
+        ejecutar_bucle(detector_falso, camara_falsa(10, fallar_en=4), 1, 1, threading.Event(),
+                       publicar=lambda f: None, traza=GrabadorTraza(str(tmp_path)))
+    assert LectorTraza(str(tmp_path)).muestras == 4
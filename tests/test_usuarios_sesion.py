@@ -0,0 +1,54 @@
+from flask import g
+from database.conexion import db
+from app.models import Usuario
+from app.utils.medicion_sql import limite_consultas
+
+
+def _crear(app, **kw):
+    with app.app_context():
+        u = Usuario(password_hash="h", **kw)
+        db.session.add(u); db.session.commit()
+        return u.id
+
+def _login(client, id_usuario):
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(id_usuario)
+
+def _get(cliente, url):
+    # Las peticiones de prueba comparten el app context (y su `g`) de la sesión de
+    # pytest: se descarta el usuario cargado por la petición anterior
+    g.pop('_login_user', None)
+    db.session.remove()
+    return cliente.get(url)
+
+def _post(cliente, url, **kw):
+    g.pop('_login_user', None)
+    return cliente.post(url, **kw)
+
+
+def test_user_loader_no_consulta_la_base_en_cada_peticion(client, app):
+    uid = _crear(app, nombre="Conductor", username="cond", rol="conductor")
+    _login(client, uid)
+
+    with limite_consultas(1) as primera:
+        assert _get(client, "/perfil_redirect").headers["Location"].endswith("/perfil")
+    assert len(primera) == 1
+    with limite_consultas(0):
+        assert _get(client, "/perfil_redirect").headers["Location"].endswith("/perfil")
+
+
+def test_cambio_de_rol_y_desactivacion_aplican_de_inmediato(client, app):
+    admin_id = _crear(app, nombre="Admin", username="adm", rol="admin")
+    uid = _crear(app, nombre="Conductor", username="cond", rol="conductor")
+    conductor = app.test_client()
+    _login(conductor, uid)
+    _login(client, admin_id)
+    assert _get(conductor, "/perfil_redirect").headers["Location"].endswith("/perfil")   # queda en caché
+
+    _post(client, f"/dashboard/usuarios/{uid}/rol", data={"rol": "admin"})
+    assert _get(conductor, "/perfil_redirect").headers["Location"].endswith("/dashboard")
+
+    _post(client, f"/dashboard/usuarios/{uid}/rol", data={"rol": "conductor"})
+    _post(client, f"/dashboard/usuarios/{uid}/toggle")
+    # Rol 'inactivo': perfil_redirect lo manda a cerrar sesión
+    assert _get(conductor, "/perfil_redirect").headers["Location"].endswith("/logout")
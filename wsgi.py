@@ -0,0 +1,49 @@
+# wsgi.py
+"""
+Punto de entrada de producción.
+
+    python wsgi.py [--host 0.0.0.0] [--port 5000] [--hilos 8]
+
+Sirve la app con waitress: WSGI multihilo, sin el servidor de desarrollo de
+Flask y compatible con Windows. Es un solo proceso con WSGI_HILOS hilos, de modo
+que el detector, el búfer de cámara y el stream /video_feed comparten memoria.
+El pool de PostgreSQL se dimensiona con el número de hilos (database.conexion).
+
+Con varios procesos (p. ej. `gunicorn -w 4 --threads 8 wsgi:app` en Linux) los
+workers deben correr con APP_DISABLE_DETECTOR=1 y el detector aparte con
+run_detector.py: un candado de archivo impide que dos procesos se adueñen de la cámara.
+"""
+import argparse
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de producción (waitress)")
+    parser.add_argument("--host", default=os.getenv("WSGI_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WSGI_PORT", 5000)))
+    parser.add_argument("--hilos", type=int, default=None, help="Hilos de trabajo (por defecto WSGI_HILOS)")
+    args = parser.parse_args()
+    if args.hilos:
+        # Antes de crear la app: la configuración y el tamaño del pool se leen de aquí
+        os.environ["WSGI_HILOS"] = str(args.hilos)
+
+    from waitress import serve
+    from app import create_app
+    from database.migraciones import inicializar_base
+
+    app = create_app()
+    with app.app_context():
+        inicializar_base()
+    hilos = app.config['WSGI_HILOS']
+    print(f"[Servidor] waitress en http://{args.host}:{args.port} con {hilos} hilos "
+          f"(pool BD: {app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_size', 'sin pool')})")
+    serve(app, host=args.host, port=args.port, threads=hilos,
+          connection_limit=app.config['WSGI_CONEXIONES_MAX'], ident=None)
+
+
+if __name__ == "__main__":
+    main()
+else:
+    # Importado por un servidor WSGI externo (gunicorn, waitress-serve wsgi:app)
+    from app import create_app
+    app = create_app()